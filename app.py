@@ -1,19 +1,41 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, Request, Response, current_app, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import pytesseract
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 from dateutil import parser
 import re
 from dotenv import load_dotenv
 from openai import OpenAI
 import json
 from flask_pymongo import PyMongo
+import click
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import base64
+import tempfile
+import time
+import receipt_cache
+import receipt_images
+import receipt_jobs
+import recipe_cache
+import recipe_parser
+import recipe_prefetch
+import db_indexes
+import prompt_builder
+import llm_gateway
+import cooperative
+import single_flight
+import user_cache
+import pagination
+import inventory_version
+import inventory_merge
+import units
+from keyword_index import KeywordIndex
 
 # Common grocery item categories and their patterns
 GROCERY_CATEGORIES = {
@@ -23,54 +45,73 @@ GROCERY_CATEGORIES = {
     'produce': ['apple', 'banana', 'orange', 'lettuce', 'tomato', 'potato', 'lemon'],
     'beverages': ['juice', 'soda', 'water', 'tea'],
     'snacks': ['chips', 'cookies', 'crackers', 'nuts'],
-    'cleaning': ['soap', 'detergent', 'cleaner', 'wipes', 'nitril'],
+    'cleaning': ['soap', 'detergent', 'cleaner', 'wipes', 'nitril', 'nitrile'],
     'pantry': ['pasta', 'rice', 'flour', 'sugar', 'salt', 'bread', 'pnt buttr', 'peanut butter', 'butter']
 }
 
-# Common units mapping
-UNIT_PATTERNS = {
-    'kg': ['kg', 'kilo', 'kilos', 'kilogram'],
-    'g': ['g', 'gram', 'grams'],
-    'l': ['l', 'liter', 'liters'],
-    'ml': ['ml', 'milliliter'],
-    'pcs': ['pc', 'pcs', 'piece', 'pieces', 'count', 'ct', 'pack', 'pkg'],
-    'oz': ['oz', 'ounce', 'ounces'],
-    'lb': ['lb', 'lbs', 'pound', 'pounds']
+# Units recognized in receipt item names, spelled as in the units registry.
+# Kitchen measures ('cup', 'can') are left out: on a receipt they are
+# usually part of a product name
+UNIT_PATTERNS = units.REGISTRY.patterns(['kg', 'g', 'l', 'ml', 'pcs', 'pack', 'oz', 'lb'])
+
+# Token-level keyword automata built once from the tables above
+CATEGORY_INDEX = KeywordIndex(GROCERY_CATEGORIES)
+UNIT_INDEX = KeywordIndex(UNIT_PATTERNS)
+
+# Patterns for receipt lines that are not items, grouped by what they are
+RECEIPT_LINE_PATTERNS = {
+    'total': [
+        r'^total\b',  # Totals
+        r'^subtotal\b',  # Subtotals
+        r'^tax\b',  # Tax lines
+        r'^change\b',  # Change due
+        r'^items\s+sold',  # Items sold count
+        r'^balance',  # Balance
+    ],
+    'payment': [
+        r'^ref #',  # Reference numbers
+        r'^account\s*:',  # Account information
+        r'^debit\b',  # Debit card info
+        r'^credit\b',  # Credit card info
+        r'^card\b',  # Card info
+        r'^auth\b',  # Authorization
+        r'^approved\b',  # Approval
+        r'^network\b',  # Network ID
+        r'^tender',  # Tender type
+        r'^payment',  # Payment
+        r'^appr code',  # Approval code
+        r'^eft\b',  # Electronic funds transfer
+    ],
+    'address': [
+        r'^tel:?\s*\+?\d[\d\-\(\) ]+$',  # Phone numbers
+        r'^manager\b',  # Manager info
+        r'^store\b',  # Store info
+        r'^\d+ [NSEW]\.?\s+\w+\s+(?:st|ave|road|rd|drive|dr|lane|ln|circle|cir|boulevard|blvd)',  # Addresses
+        r'^[a-z\s]+,\s*[a-z]{2}\s+\d{5}',  # City, State ZIP
+    ],
+    'ignore': [
+        r'^st#.*te#.*tr#',  # Store transaction details
+        r'^[\d\-]+$',  # Just numbers or dashes
+        r'^\d{2}/\d{2}/\d{2}',  # Dates
+        r'^\$?\d+\.\d{2}$',  # Just prices
+        r'^save money',  # Store slogans
+        r'^live better',  # Store slogans
+        r'©',  # Copyright symbols
+    ],
 }
 
 # Patterns to ignore in receipt processing
-IGNORE_PATTERNS = [
-    r'^tel:?\s*\+?\d[\d\-\(\) ]+$',  # Phone numbers
-    r'^st#.*te#.*tr#',  # Store transaction details
-    r'^[\d\-]+$',  # Just numbers or dashes
-    r'^\d{2}/\d{2}/\d{2}',  # Dates
-    r'^total\b',  # Totals
-    r'^subtotal\b',  # Subtotals
-    r'^tax\b',  # Tax lines
-    r'^change\b',  # Change due
-    r'^\$?\d+\.\d{2}$',  # Just prices
-    r'^ref #',  # Reference numbers
-    r'^account\s*:',  # Account information
-    r'^debit\b',  # Debit card info
-    r'^credit\b',  # Credit card info
-    r'^card\b',  # Card info
-    r'^auth\b',  # Authorization
-    r'^approved\b',  # Approval
-    r'^network\b',  # Network ID
-    r'^manager\b',  # Manager info
-    r'^store\b',  # Store info
-    r'^save money',  # Store slogans
-    r'^live better',  # Store slogans
-    r'^\d+ [NSEW]\.?\s+\w+\s+(?:st|ave|road|rd|drive|dr|lane|ln|circle|cir|boulevard|blvd)',  # Addresses
-    r'^[a-z\s]+,\s*[a-z]{2}\s+\d{5}',  # City, State ZIP
-    r'©',  # Copyright symbols
-    r'^items\s+sold',  # Items sold count
-    r'^tender',  # Tender type
-    r'^balance',  # Balance
-    r'^payment',  # Payment
-    r'^appr code',  # Approval code
-    r'^eft\b',  # Electronic funds transfer
-]
+IGNORE_PATTERNS = [pattern for patterns in RECEIPT_LINE_PATTERNS.values() for pattern in patterns]
+
+# All line patterns combined into one regex, so a line is labelled in a
+# single scan; the name of the matching group is the label
+RECEIPT_LINE_REGEX = re.compile(
+    '|'.join(
+        f"(?P<{label}>{'|'.join(f'(?:{pattern})' for pattern in patterns)})"
+        for label, patterns in RECEIPT_LINE_PATTERNS.items()
+    ),
+    re.IGNORECASE
+)
 
 # Known product codes and their proper names
 PRODUCT_NAMES = {
@@ -153,14 +194,56 @@ print("MONGO_URI:", os.getenv('MONGO_URI'))
 print("FLASK_APP:", os.getenv('FLASK_APP'))
 print("SECRET_KEY:", os.getenv('SECRET_KEY'))
 
+class SpooledUploadRequest(Request):
+    """Request that keeps small file uploads in memory and spills larger
+    ones to a private temporary file, so concurrent uploads cannot grow a
+    worker's memory without bound. The batch upload route gets a larger
+    request size limit than the rest of the app."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_SIZE'], mode='w+b')
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'upload_receipts':
+            return current_app.config['RECEIPT_BATCH_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['RECEIPT_BATCH_MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024  # room for a batch of receipt photos
+app.config['UPLOAD_SPOOL_SIZE'] = int(os.getenv('UPLOAD_SPOOL_SIZE', 1024 * 1024))  # bytes kept in memory per upload
 app.config["MONGO_URI"] = os.getenv("MONGO_URI")
-
-# Ensure upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+app.config['RECEIPT_IMAGE_LONG_EDGE'] = int(os.getenv('RECEIPT_IMAGE_LONG_EDGE', receipt_images.DEFAULT_LONG_EDGE))
+app.config['RECEIPT_IMAGE_FORMAT'] = os.getenv('RECEIPT_IMAGE_FORMAT', receipt_images.DEFAULT_FORMAT)
+app.config['RECEIPT_IMAGE_QUALITY'] = int(os.getenv('RECEIPT_IMAGE_QUALITY', receipt_images.DEFAULT_QUALITY))
+app.config['RECEIPT_JOB_WORKERS'] = int(os.getenv('RECEIPT_JOB_WORKERS', 4))
+app.config['RECEIPT_JOB_MAX_PENDING'] = int(os.getenv('RECEIPT_JOB_MAX_PENDING', 32))
+app.config['RECEIPT_BATCH_CONCURRENCY'] = int(os.getenv('RECEIPT_BATCH_CONCURRENCY', 4))
+app.config['RECEIPT_BATCH_MAX_FILES'] = int(os.getenv('RECEIPT_BATCH_MAX_FILES', 10))
+app.config['RECEIPT_OCR_ENABLED'] = os.getenv('RECEIPT_OCR_ENABLED', 'true').lower() == 'true'
+app.config['RECEIPT_OCR_CONFIDENCE'] = float(os.getenv('RECEIPT_OCR_CONFIDENCE', 0.8))
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', user_cache.DEFAULT_MAX_ENTRIES))
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', user_cache.DEFAULT_TTL))  # seconds
+app.config['RECIPE_CACHE_SIZE'] = int(os.getenv('RECIPE_CACHE_SIZE', recipe_cache.DEFAULT_MAX_ENTRIES))
+app.config['RECIPE_CACHE_TTL'] = int(os.getenv('RECIPE_CACHE_TTL', recipe_cache.DEFAULT_TTL))
+app.config['PROMPT_INVENTORY_TOKENS'] = int(os.getenv('PROMPT_INVENTORY_TOKENS', prompt_builder.DEFAULT_TOKEN_BUDGET))
+app.config['RECIPE_PREFETCH_ENABLED'] = os.getenv('RECIPE_PREFETCH_ENABLED', 'true').lower() == 'true'
+app.config['RECIPE_PREFETCH_DELAY'] = float(os.getenv('RECIPE_PREFETCH_DELAY', recipe_prefetch.DEFAULT_DELAY))  # seconds
+app.config['RECIPE_PREFETCH_WORKERS'] = int(os.getenv('RECIPE_PREFETCH_WORKERS', recipe_prefetch.DEFAULT_WORKERS))
+app.config['RECIPE_PREFETCH_DAILY_TOKENS'] = int(os.getenv('RECIPE_PREFETCH_DAILY_TOKENS', recipe_prefetch.DEFAULT_DAILY_TOKENS))
+app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv(
+    'LLM_MAX_CONCURRENCY',
+    cooperative.COOPERATIVE_LLM_CONCURRENCY if cooperative.cooperative() else llm_gateway.DEFAULT_MAX_CONCURRENCY
+))
+app.config['LLM_QUEUE_TIMEOUT'] = float(os.getenv('LLM_QUEUE_TIMEOUT', llm_gateway.DEFAULT_QUEUE_TIMEOUT))  # seconds
+app.config['LLM_MAX_RETRIES'] = int(os.getenv('LLM_MAX_RETRIES', llm_gateway.DEFAULT_MAX_RETRIES))
+app.config['LLM_BREAKER_THRESHOLD'] = int(os.getenv('LLM_BREAKER_THRESHOLD', llm_gateway.DEFAULT_FAILURE_THRESHOLD))
+app.config['LLM_BREAKER_RESET'] = float(os.getenv('LLM_BREAKER_RESET', llm_gateway.DEFAULT_RESET_TIMEOUT))  # seconds
+app.config['SINGLE_FLIGHT_LEASE_TTL'] = float(os.getenv('SINGLE_FLIGHT_LEASE_TTL', single_flight.DEFAULT_LEASE_TTL))  # seconds
+app.config['SINGLE_FLIGHT_RESULT_TTL'] = float(os.getenv('SINGLE_FLIGHT_RESULT_TTL', single_flight.DEFAULT_RESULT_TTL))  # seconds
+app.config['SINGLE_FLIGHT_WAIT_TIMEOUT'] = float(os.getenv('SINGLE_FLIGHT_WAIT_TIMEOUT', single_flight.DEFAULT_WAIT_TIMEOUT))  # seconds
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'heic', 'heif'}
 
@@ -170,6 +253,16 @@ login_manager.login_view = 'login'
 # Initialize OpenAI client
 client = OpenAI()  # This will automatically use OPENAI_API_KEY from environment
 
+# Every OpenAI call goes through the gateway for timeouts, retries and limits
+llm = llm_gateway.LLMGateway(
+    client,
+    max_concurrency=app.config['LLM_MAX_CONCURRENCY'],
+    queue_timeout=app.config['LLM_QUEUE_TIMEOUT'],
+    max_retries=app.config['LLM_MAX_RETRIES'],
+    failure_threshold=app.config['LLM_BREAKER_THRESHOLD'],
+    reset_timeout=app.config['LLM_BREAKER_RESET']
+)
+
 # Initialize MongoDB
 mongo = PyMongo(app)
 
@@ -179,20 +272,32 @@ class User(UserMixin):
         self.id = str(user_data.get('_id'))
         self.username = user_data.get('username')
         self.email = user_data.get('email')
-        self.password_hash = user_data.get('password_hash')
         self.cooking_methods = user_data.get('cooking_methods', [])
         self.kitchen_tools = user_data.get('kitchen_tools', [])
         self.preferences = user_data.get('preferences', {})
+        self.version = user_cache.user_version(user_data)
 
     def get_id(self):
         return self.id
 
+users_cache = user_cache.UserCache(
+    max_entries=app.config['USER_CACHE_SIZE'],
+    ttl=app.config['USER_CACHE_TTL']
+)
+
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    if user_data:
-        return User(user_data)
-    return None
+    # The session holds the version this browser last saw, so preference
+    # changes made through another worker are picked up immediately
+    user_data = users_cache.get(user_id, session.get('user_version'))
+    if user_data is None:
+        user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)}, user_cache.USER_FIELDS)
+        if not user_data:
+            return None
+        users_cache.put(user_id, user_data)
+        if session.get('user_version') != user_cache.user_version(user_data):
+            session['user_version'] = user_cache.user_version(user_data)
+    return User(user_data)
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -200,45 +305,84 @@ def allowed_file(filename):
 
 def identify_category(item_name):
     """Identify the category of a grocery item based on keywords."""
-    item_name = item_name.lower()
-    for category, keywords in GROCERY_CATEGORIES.items():
-        if any(keyword in item_name for keyword in keywords):
-            return category
-    return 'other'
+    return CATEGORY_INDEX.match(item_name, default='other')
+
+def identify_categories(item_names):
+    """Identify the categories of a batch of grocery items."""
+    return CATEGORY_INDEX.match_many(item_names, default='other')
 
 def identify_unit(text):
     """Identify the unit from text based on common patterns."""
-    text = text.lower()
-    for unit, patterns in UNIT_PATTERNS.items():
-        if any(pattern in text for pattern in patterns):
-            return unit
-    return 'pcs'  # default unit
+    return UNIT_INDEX.match(text, default='pcs')  # default unit
+
+def identify_units(texts):
+    """Identify the units of a batch of texts."""
+    return UNIT_INDEX.match_many(texts, default='pcs')
+
+# A quantity is a short number, never part of a longer digit run such as
+# a product code
+QUANTITY_NUMBER = r'(?<![\d.])(\d{1,4}(?:\.\d+)?)(?![\d.])'
+
+# Quantity patterns, tried in order of priority
+QUANTITY_PATTERNS = [
+    re.compile(QUANTITY_NUMBER + r'\s*(?:x|\*)(?![a-z])', re.IGNORECASE),  # matches "2 x" or "2.5 X"
+    re.compile(QUANTITY_NUMBER + r'\s*(?:pc|pcs|piece|pieces|count|ct)\b', re.IGNORECASE),  # matches quantity with units
+    re.compile(QUANTITY_NUMBER + r'\s*(?:kg|g|l|ml|oz|lb|lbs)\b', re.IGNORECASE),  # matches quantity with weight/volume units
+    re.compile(r'^' + QUANTITY_NUMBER + r'\s')  # matches number at start of string
+]
 
-def extract_quantity(text):
-    """Extract quantity from text."""
-    # Look for common quantity patterns
-    qty_patterns = [
-        r'(\d+(?:\.\d+)?)\s*(?:x|X|\*)',  # matches "2 x" or "2.5 X"
-        r'(\d+(?:\.\d+)?)\s*(?:pc|pcs|piece|pieces|count|ct)',  # matches quantity with units
-        r'(\d+(?:\.\d+)?)\s*(?:kg|g|l|ml|oz|lb|lbs)',  # matches quantity with weight/volume units
-        r'^(\d+(?:\.\d+)?)\s'  # matches number at start of string
-    ]
-    
-    for pattern in qty_patterns:
-        match = re.search(pattern, text)
+# Most of one receipt line that is plausible: pieces (and other counted
+# units) must also be whole; mass and volume are in base units (g, ml)
+RECEIPT_MAX_COUNT = 100
+RECEIPT_MAX_BASE = {units.MASS: 25000, units.VOLUME: 25000}
+
+# Receipt artifacts stripped from item names, applied in order
+ITEM_NAME_ARTIFACTS = [
+    re.compile(r'\d{12,}'),  # Remove product codes
+    re.compile(r'\d+\s*[xX]\s*'),  # Remove quantity markers
+    re.compile(r'\$\d+\.\d{2}'),  # Remove prices
+    # Remove single letter flags and unit indicators; these are whole
+    # words, so removing one never changes whether another matches
+    re.compile(r'\b(?:F|N|pc|pcs|piece|pieces|count|ct|kg|g|l|ml|oz|lb|lbs)\b', re.IGNORECASE),
+]
+
+PRODUCT_CODE_REGEX = re.compile(r'(\d{12})')
+PRICE_REGEX = re.compile(r'\$?(\d+\.\d{2})')
+
+def split_quantity(text):
+    """Return ``(quantity, rest)``: the quantity in text and the text with
+    the quantity (and its unit) removed."""
+    for pattern in QUANTITY_PATTERNS:
+        match = pattern.search(text)
         if match:
-            return float(match.group(1))
+            return float(match.group(1)), f"{text[:match.start()]} {text[match.end():]}".strip()
     
-    return 1.0  # default quantity
+    return 1.0, text  # default quantity
+
+def extract_quantity(text):
+    """Extract quantity from text."""
+    return split_quantity(text)[0]
+
+def plausible_quantity(quantity, unit):
+    """Whether a quantity read off a receipt line could be real."""
+    dimension = units.REGISTRY.dimension(unit)
+    if dimension in RECEIPT_MAX_BASE:
+        base = float(units.REGISTRY.to_base([quantity], [unit])[0][0])
+        return 0 < base <= RECEIPT_MAX_BASE[dimension]
+    return float(quantity).is_integer() and 0 < quantity <= RECEIPT_MAX_COUNT
+
+def classify_receipt_line(line):
+    """Label a receipt line as 'item', 'total', 'payment', 'address' or 'ignore'."""
+    match = RECEIPT_LINE_REGEX.search(line.strip())
+    return match.lastgroup if match else 'item'
 
 def should_ignore_line(line):
     """Check if a line should be ignored based on patterns."""
-    line = line.lower().strip()
-    return any(re.search(pattern, line, re.IGNORECASE) for pattern in IGNORE_PATTERNS)
+    return RECEIPT_LINE_REGEX.search(line.strip()) is not None
 
 def extract_product_code(text):
     """Extract product code from text and return proper name if known."""
-    code_match = re.search(r'(\d{12})', text)
+    code_match = PRODUCT_CODE_REGEX.search(text)
     if code_match:
         code = code_match.group(1)
         return PRODUCT_NAMES.get(code)
@@ -252,18 +396,9 @@ def clean_item_name(text):
         return proper_name
 
     # Remove common receipt artifacts
-    artifacts = [
-        r'\d{12,}',  # Remove product codes
-        r'\d+\s*[xX]\s*',  # Remove quantity markers
-        r'\$\d+\.\d{2}',  # Remove prices
-        r'\b(?:F|N)\b',  # Remove single letter flags
-        r'\b(?:pc|pcs|piece|pieces|count|ct)\b',  # Remove unit indicators
-        r'\b(?:kg|g|l|ml|oz|lb|lbs)\b',  # Remove weight/volume units
-    ]
-    
     cleaned = text
-    for pattern in artifacts:
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    for pattern in ITEM_NAME_ARTIFACTS:
+        cleaned = pattern.sub('', cleaned)
     
     # Remove multiple spaces and trim
     cleaned = ' '.join(cleaned.split())
@@ -272,7 +407,7 @@ def clean_item_name(text):
 
 def extract_price(text):
     """Extract price from text."""
-    price_match = re.search(r'\$?(\d+\.\d{2})', text)
+    price_match = PRICE_REGEX.search(text)
     return float(price_match.group(1)) if price_match else 0.0
 
 def clean_quantity(quantity):
@@ -305,23 +440,155 @@ def clean_price(price):
     except (ValueError, TypeError):
         return 0.0  # Default to 0 if conversion fails
 
-def process_receipt(receipt_path):
-    """Process receipt image using OpenAI Vision API"""
+TOTAL_LINE_REGEX = re.compile(r'^\s*(?:sub\s*)?total\b', re.IGNORECASE)
+
+def ocr_receipt_lines(image):
+    """Run Tesseract on a receipt image.
+
+    Returns a list of ``(text, confidence)`` tuples, one per printed line in
+    reading order, where confidence is the mean word confidence (0-100).
+    """
+    data = pytesseract.image_to_data(image, config='--psm 6', output_type=pytesseract.Output.DICT)
+    lines = {}
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        confidence = float(data['conf'][i])
+        if not word or confidence < 0:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append((word, confidence))
+    
+    return [
+        (' '.join(word for word, _ in words), sum(conf for _, conf in words) / len(words))
+        for words in lines.values()
+    ]
+
+def parse_receipt_lines(lines):
+    """Parse OCR'd receipt lines into items and a confidence score.
+
+    The score (0-1) is the mean OCR confidence of the item lines, halved
+    unless the item prices add up to the receipt's subtotal or total, and
+    halved again if any item has an implausible quantity for its unit, so
+    misread receipts go to Vision.
+    """
+    items = []
+    item_confidences = []
+    totals = []
+    
+    for text, confidence in lines:
+        label = classify_receipt_line(text)
+        if label == 'total' and TOTAL_LINE_REGEX.match(text):
+            totals.append(extract_price(text))
+        if label != 'item':
+            continue
+        
+        price = extract_price(text)
+        if not price:
+            continue
+        
+        # Drop the price and any trailing tax flags (e.g. "2.78 X")
+        description = re.sub(r'\$?\d+\.\d{2}.*$', '', text)
+        quantity, rest = split_quantity(description)
+        name = clean_item_name(rest)
+        if not name:
+            continue
+        
+        items.append({
+            'name': name,
+            'quantity': quantity,
+            'unit': identify_unit(description),
+            'price': price
+        })
+        item_confidences.append(confidence)
+    
+    if not items:
+        return [], 0.0
+    
+    items_total = round(sum(item['price'] for item in items), 2)
+    totals_match = any(abs(items_total - total) < 0.005 for total in totals)
+    confidence = sum(item_confidences) / len(item_confidences) / 100
+    if not totals_match:
+        confidence /= 2
+    if not all(plausible_quantity(item['quantity'], item['unit']) for item in items):
+        confidence /= 2
+    
+    return merge_receipt_items([items]), min(confidence, 1.0)
+
+def extract_items_locally(image):
+    """Extract receipt items with local OCR, returning ``(items, confidence)``."""
+    try:
+        lines = ocr_receipt_lines(image)
+    except pytesseract.TesseractNotFoundError as e:
+        # Don't retry on every receipt when the binary isn't installed
+        app.logger.warning(f"Local OCR disabled: {str(e)}")
+        app.config['RECEIPT_OCR_ENABLED'] = False
+        return [], 0.0
+    except pytesseract.TesseractError as e:
+        app.logger.warning(f"Local OCR failed: {str(e)}")
+        return [], 0.0
+    return parse_receipt_lines(lines)
+
+def process_receipt(image_bytes):
+    """Process receipt image using OpenAI Vision API
+
+    ``image_bytes`` is any bytes-like object, typically the memoryview
+    read_upload returns for the upload.
+    """
     try:
-        app.logger.info(f"Starting receipt processing for file: {receipt_path}")
+        app.logger.info(f"Starting receipt processing for {len(image_bytes)} byte image")
         
-        # Step 1: Check if file exists
-        if not os.path.exists(receipt_path):
-            app.logger.error(f"File not found: {receipt_path}")
-            raise FileNotFoundError(f"File not found: {receipt_path}")
-            
-        # Step 2: Encode image to base64
+        # Step 1: Check the upload is not empty
+        if not len(image_bytes):
+            app.logger.error("Empty receipt image")
+            raise ValueError("Empty receipt image")
+
+        # Step 2: Return cached items if this exact image was processed before
+        digest = receipt_cache.image_digest(image_bytes)
+        cached_items = receipt_cache.lookup(mongo.db, digest)
+        if cached_items is not None:
+            app.logger.info(f"Receipt cache hit for {digest}: {len(cached_items)} items")
+            return cached_items
+        started = time.perf_counter()
+
+        # Step 3: Rotate, convert to grayscale and crop to the receipt
+        app.logger.info("Preprocessing receipt image...")
+        try:
+            receipt_image = cooperative.run_blocking(receipt_images.load_receipt_image, image_bytes)
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            app.logger.warning(f"Could not decode receipt image, sending original: {str(e)}")
+            receipt_image = None
+
+        # Step 4: Try local OCR first and only escalate to Vision when unsure
+        if receipt_image is not None and app.config['RECEIPT_OCR_ENABLED']:
+            # pytesseract encodes the image to PNG in-process; keep that off the gevent hub
+            local_items, confidence = cooperative.run_blocking(extract_items_locally, receipt_image)
+            app.logger.info(f"Local OCR found {len(local_items)} items with confidence {confidence:.2f}")
+            if local_items and confidence >= app.config['RECEIPT_OCR_CONFIDENCE']:
+                receipt_cache.record_extraction(mongo.db, 'local_ocr')
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                receipt_cache.store(mongo.db, digest, local_items, elapsed_ms)
+                return local_items
+
+        # Step 5: Shrink and recompress for the Vision API
+        if receipt_image is not None:
+            api_image_bytes, mime_type = cooperative.run_blocking(
+                receipt_images.encode_receipt_image,
+                receipt_image,
+                long_edge=app.config['RECEIPT_IMAGE_LONG_EDGE'],
+                image_format=app.config['RECEIPT_IMAGE_FORMAT'],
+                quality=app.config['RECEIPT_IMAGE_QUALITY'],
+                max_tokens=receipt_images.source_tokens(image_bytes)
+            )
+        else:
+            api_image_bytes, mime_type = image_bytes, receipt_images.sniff_mime_type(image_bytes)
+        app.logger.info(f"Image preprocessed: {len(image_bytes)} -> {len(api_image_bytes)} bytes ({mime_type})")
+
+        # Step 6: Encode image to base64
         app.logger.info("Encoding image to base64...")
-        with open(receipt_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+        base64_image = base64.b64encode(api_image_bytes).decode("utf-8")
         app.logger.info(f"Image encoded successfully. Base64 length: {len(base64_image)}")
         
-        # Step 3: Prepare the API request
+        # Step 7: Prepare the API request
         app.logger.info("Preparing OpenAI API request...")
         request_data = {
             "model": "gpt-4o",
@@ -335,7 +602,7 @@ def process_receipt(receipt_path):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
+                            "url": f"data:{mime_type};base64,{base64_image}"
                         }
                     }
                 ]
@@ -344,15 +611,16 @@ def process_receipt(receipt_path):
         }
         app.logger.info("API request prepared")
         
-        # Step 4: Make the API call
+        # Step 8: Make the API call
         app.logger.info("Making OpenAI API call...")
-        response = client.chat.completions.create(**request_data)
+        receipt_cache.record_extraction(mongo.db, 'vision')
+        response = llm.chat('receipt', **request_data)
         app.logger.info("API call completed successfully")
         
-        # Step 5: Log the raw response
+        # Step 9: Log the raw response
         app.logger.info(f"Raw OpenAI API Response: {response.choices[0].message.content}")
         
-        # Step 6: Clean up the response text
+        # Step 10: Clean up the response text
         app.logger.info("Cleaning response text...")
         clean_response = response.choices[0].message.content.strip()
         
@@ -366,7 +634,7 @@ def process_receipt(receipt_path):
             
         app.logger.info(f"Cleaned response: {clean_response}")
         
-        # Step 7: Parse the response
+        # Step 11: Parse the response
         app.logger.info("Parsing response...")
         try:
             items = json.loads(clean_response)
@@ -376,7 +644,7 @@ def process_receipt(receipt_path):
             
             app.logger.info(f"Found {len(items)} items in response")
             
-            # Step 8: Clean and validate each item
+            # Step 12: Clean and validate each item
             cleaned_items = []
             for item in items:
                 try:
@@ -395,6 +663,9 @@ def process_receipt(receipt_path):
                     continue
             
             app.logger.info(f"Successfully processed {len(cleaned_items)} items from receipt")
+            if cleaned_items:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                receipt_cache.store(mongo.db, digest, cleaned_items, elapsed_ms)
             return cleaned_items
             
         except json.JSONDecodeError as e:
@@ -406,13 +677,139 @@ def process_receipt(receipt_path):
         app.logger.error(f"Error processing receipt: {str(e)}")
         app.logger.exception("Full traceback:")
         raise
-    finally:
-        # Clean up the uploaded file
+
+def merge_receipt_items(item_lists):
+    """Merge item lists from several receipts into one review list.
+
+    Items with the same merge key (see inventory_merge) are combined by
+    summing quantity and price; first-seen order is kept.
+    """
+    merged = {}
+    for items in item_lists:
+        for item in items:
+            key = (inventory_merge.name_key(item['name']), inventory_merge.unit_key(item['unit']))
+            if key in merged:
+                merged[key]['quantity'] += item['quantity']
+                merged[key]['price'] = round(merged[key]['price'] + item['price'], 2)
+            else:
+                merged[key] = dict(item)
+    return list(merged.values())
+
+def process_receipt_batch(images):
+    """Extract items from several receipt images concurrently.
+
+    Identical images are processed once. Receipts that fail are reported
+    in the summary instead of failing the whole batch. The summary has one
+    entry per uploaded image, in upload order; repeats of an earlier image
+    carry its result and ``duplicate_of`` with its index.
+    """
+    unique_images = {}
+    positions = {}
+    for index, image_bytes in enumerate(images):
+        digest = receipt_cache.image_digest(image_bytes)
+        unique_images.setdefault(digest, image_bytes)
+        positions.setdefault(digest, []).append(index)
+    app.logger.info(f"Processing batch of {len(images)} receipts ({len(unique_images)} unique)")
+
+    concurrency = max(1, min(app.config['RECEIPT_BATCH_CONCURRENCY'], len(unique_images)))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='receipt-batch') as executor:
+        futures = {digest: executor.submit(process_receipt, image_bytes) for digest, image_bytes in unique_images.items()}
+
+    item_lists = []
+    receipts = [None] * len(images)
+    for digest, future in futures.items():
+        first, *repeats = positions[digest]
         try:
-            os.remove(receipt_path)
-            app.logger.info(f"Cleaned up temporary file: {receipt_path}")
+            items = future.result()
+            item_lists.append(items)
+            summary = {'item_count': len(items)}
         except Exception as e:
-            app.logger.warning(f"Failed to remove temporary file: {str(e)}")
+            app.logger.error(f"Error processing receipt {first} in batch: {str(e)}")
+            summary = {'item_count': 0, 'error': str(e)}
+        receipts[first] = {'index': first, **summary}
+        for index in repeats:
+            receipts[index] = {'index': index, 'duplicate_of': first, **summary}
+
+    if not item_lists:
+        raise ValueError("Failed to process any receipt in the batch")
+
+    return {'items': merge_receipt_items(item_lists), 'receipts': receipts}
+
+receipt_job_queue = receipt_jobs.ReceiptJobQueue(
+    process_receipt,
+    max_workers=app.config['RECEIPT_JOB_WORKERS'],
+    max_pending=app.config['RECEIPT_JOB_MAX_PENDING']
+)
+
+recipe_results = recipe_cache.RecipeCache(
+    max_entries=app.config['RECIPE_CACHE_SIZE'],
+    ttl=app.config['RECIPE_CACHE_TTL']
+)
+
+# Duplicate recipe requests in flight share one model call, across workers
+request_flights = single_flight.SingleFlight(
+    lease_ttl=app.config['SINGLE_FLIGHT_LEASE_TTL'],
+    result_ttl=app.config['SINGLE_FLIGHT_RESULT_TTL'],
+    wait_timeout=app.config['SINGLE_FLIGHT_WAIT_TIMEOUT']
+)
+
+def prefetch_default_recipes(user_id):
+    """Return the fingerprint of a user's unfiltered recipe inputs and a
+    function that generates the set outside of a request."""
+    user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+    inventory_items = list(mongo.db.inventory.find({'user_id': ObjectId(user_id)}))
+    if not user_data or not inventory_items:
+        return None
+
+    cooking_methods, kitchen_tools = user_cooking_setup(User(user_data))
+
+    def generate():
+        messages = build_recipe_messages(inventory_items, cooking_methods, kitchen_tools, {}, RECIPE_BATCH_SIZE)
+        completion = llm.chat(
+            'recipe_prefetch',
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.8,
+            max_tokens=RECIPE_BATCH_MAX_TOKENS
+        )
+        return {
+            'recipes': parse_recipe_suggestions(completion.choices[0].message.content),
+            'tokens': completion.usage.total_tokens if completion.usage else RECIPE_BATCH_MAX_TOKENS
+        }
+
+    return recipe_cache.fingerprint(inventory_items, cooking_methods, kitchen_tools, {}), generate
+
+recipe_prefetcher = recipe_prefetch.RecipePrefetcher(
+    prefetch_default_recipes,
+    delay=app.config['RECIPE_PREFETCH_DELAY'],
+    max_workers=app.config['RECIPE_PREFETCH_WORKERS'],
+    daily_tokens=app.config['RECIPE_PREFETCH_DAILY_TOKENS'],
+    flights=request_flights,
+    enabled=app.config['RECIPE_PREFETCH_ENABLED']
+)
+
+def inventory_changed(user_id, inserted=(), updated=(), deleted=(), reset=False):
+    """Call after any change to a user's inventory, with the item ids touched."""
+    inventory_version.bump(mongo.db, user_id, inserted, updated, deleted, reset)
+    recipe_results.invalidate_user(user_id)
+    recipe_prefetcher.schedule(mongo.db, user_id)
+
+def remember_recipes(user_id, cache_key, filters, recipes):
+    """Cache generated recipes, and pool the default (unfiltered) set."""
+    recipe_results.put(user_id, cache_key, recipes)
+    if not filters:
+        recipe_prefetcher.store(mongo.db, user_id, cache_key, recipes)
+
+def add_inventory_items(documents):
+    """Merge inventory documents into the user's inventory in one bulk write.
+
+    Items the user already has (same name and unit) get their quantity
+    added to; see inventory_merge. Returns one result per document, in
+    order: ``{'index', 'status': 'inserted', 'item_id', 'merged'}`` or
+    ``{'index', 'status': 'error', 'error'}``. A failed document does not
+    stop the others from being written.
+    """
+    return inventory_merge.upsert_items(mongo.db, documents)
 
 # Routes
 @app.route('/')
@@ -444,7 +841,12 @@ def register():
             "date_created": datetime.utcnow()
         }
         
-        result = mongo.db.users.insert_one(user_data)
+        try:
+            result = mongo.db.users.insert_one(user_data)
+        except DuplicateKeyError:
+            # Lost a race with another sign-up for the same name or email
+            flash('Username or email already exists', 'error')
+            return redirect(url_for('register'))
         # Get the complete user data including the _id
         user_data['_id'] = result.inserted_id
         
@@ -470,6 +872,7 @@ def login():
         if user_data and check_password_hash(user_data.get('password_hash', ''), password):
             user = User(user_data)
             login_user(user)
+            session['user_version'] = user_cache.user_version(user_data)
             flash('Login successful!', 'success')
             return redirect(url_for('dashboard'))
         
@@ -482,20 +885,19 @@ def login():
 @login_required
 def logout():
     logout_user()
+    session.pop('user_version', None)
     return redirect(url_for('login'))
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's inventory and receipts from MongoDB
-    inventory = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
-    receipts = list(mongo.db.receipts.find({"user_id": ObjectId(current_user.id)}).sort("upload_date", -1))
-    return render_template('dashboard.html', inventory=inventory, receipts=receipts)
+    # Inventory and recipes are loaded page by page from the APIs
+    return render_template('dashboard.html', categories=sorted(GROCERY_CATEGORIES) + ['other'])
 
 @app.route('/api/upload_receipt', methods=['POST'])
 @login_required
 def upload_receipt():
-    """Handle receipt upload and processing."""
+    """Handle receipt upload by queueing it for background processing."""
     app.logger.info("Starting receipt upload process")
     app.logger.info(f"Request files: {request.files}")
     app.logger.info(f"Request form: {request.form}")
@@ -516,60 +918,110 @@ def upload_receipt():
         return jsonify({'error': 'Invalid file type'}), 400
     
     try:
-        # Create a unique filename
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        # read_upload copies the spooled upload into a buffer of its own,
+        # which outlives the request for the job
+        image_bytes = receipt_images.read_upload(file.stream)
+        app.logger.info(f"Read {len(image_bytes)} bytes from upload")
         
-        app.logger.info(f"Saving file to {filepath}")
-        file.save(filepath)
-        app.logger.info("File saved successfully")
+        job_id = receipt_job_queue.submit(mongo.db, current_user.id, image_bytes)
+        app.logger.info(f"Queued receipt job {job_id}")
         
-        app.logger.info("Processing receipt with OpenAI Vision API")
-        try:
-            # Process the receipt
-            items = process_receipt(filepath)
-            
-            if not items:
-                app.logger.warning("No items found in receipt")
-                return jsonify({'error': 'No items found in receipt'}), 400
-            
-            app.logger.info(f"Successfully processed {len(items)} items")
-            app.logger.info(f"Processed items: {items}")
-            
-            # Return the items for user confirmation
-            return jsonify({
-                'success': True,
-                'items': items,
-                'message': f'Found {len(items)} items. Please review and confirm.'
-            }), 200
-            
-        except Exception as process_error:
-            app.logger.error(f"Error processing receipt: {str(process_error)}")
-            app.logger.exception("Full traceback:")
-            return jsonify({
-                'error': 'Failed to process receipt',
-                'details': str(process_error)
-            }), 500
-            
-    except Exception as save_error:
-        app.logger.error(f"Error saving file: {str(save_error)}")
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('receipt_job_status', job_id=job_id),
+            'message': 'Receipt queued for processing'
+        }), 202
+        
+    except receipt_jobs.QueueFullError as queue_error:
+        app.logger.warning(str(queue_error))
+        return jsonify({'error': str(queue_error)}), 503
+    
+    except Exception as submit_error:
+        app.logger.error(f"Error queueing receipt: {str(submit_error)}")
         app.logger.exception("Full traceback:")
         return jsonify({
-            'error': 'Failed to save file',
-            'details': str(save_error)
+            'error': 'Failed to queue receipt',
+            'details': str(submit_error)
         }), 500
+
+@app.route('/api/upload_receipts', methods=['POST'])
+@login_required
+def upload_receipts():
+    """Handle a batch of receipt uploads as a single background job."""
+    files = [file for file in request.files.getlist('receipts') if file.filename]
+    app.logger.info(f"Starting batch receipt upload with {len(files)} files")
     
-    finally:
-        # Clean up the uploaded file
-        try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                app.logger.info(f"Cleaned up file: {filepath}")
-        except Exception as cleanup_error:
-            app.logger.error(f"Error during cleanup: {str(cleanup_error)}")
-            app.logger.exception("Full traceback:")
+    if not files:
+        app.logger.error("No receipt files in request")
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    if len(files) > app.config['RECEIPT_BATCH_MAX_FILES']:
+        return jsonify({'error': f"Upload at most {app.config['RECEIPT_BATCH_MAX_FILES']} receipts at once"}), 400
+    
+    invalid = [file.filename for file in files if not allowed_file(file.filename)]
+    if invalid:
+        app.logger.error(f"Invalid file types: {invalid}")
+        return jsonify({'error': f"Invalid file type: {', '.join(invalid)}"}), 400
+    
+    try:
+        images = [receipt_images.read_upload(file.stream) for file in files]
+        
+        job_id = receipt_job_queue.submit(mongo.db, current_user.id, images, process_fn=process_receipt_batch)
+        app.logger.info(f"Queued batch receipt job {job_id}")
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('receipt_job_status', job_id=job_id),
+            'message': f'{len(images)} receipts queued for processing'
+        }), 202
+        
+    except receipt_jobs.QueueFullError as queue_error:
+        app.logger.warning(str(queue_error))
+        return jsonify({'error': str(queue_error)}), 503
+    
+    except Exception as submit_error:
+        app.logger.error(f"Error queueing receipts: {str(submit_error)}")
+        app.logger.exception("Full traceback:")
+        return jsonify({
+            'error': 'Failed to queue receipts',
+            'details': str(submit_error)
+        }), 500
+
+@app.route('/api/receipt_jobs/<job_id>')
+@login_required
+def receipt_job_status(job_id):
+    """Report the status of a queued receipt job, with items once done."""
+    try:
+        job = receipt_job_queue.get(mongo.db, job_id, current_user.id)
+    except Exception as e:
+        app.logger.error(f"Error fetching receipt job {job_id}: {str(e)}")
+        return jsonify({'error': 'Invalid job id'}), 400
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response = {'job_id': job_id, 'status': job['status']}
+    if 'receipts' in job:
+        response['receipts'] = job['receipts']
+    if job['status'] == receipt_jobs.STATUS_DONE:
+        items = job.get('items', [])
+        if items:
+            response.update({
+                'success': True,
+                'items': items,
+                'message': f'Found {len(items)} items. Please review and confirm.'
+            })
+        else:
+            response.update({'success': False, 'error': 'No items found in receipt'})
+    elif job['status'] == receipt_jobs.STATUS_FAILED:
+        response.update({
+            'success': False,
+            'error': 'Failed to process receipt',
+            'details': job.get('error')
+        })
+    return jsonify(response)
 
 @app.route('/api/confirm_receipt_items', methods=['POST'])
 @login_required
@@ -587,29 +1039,54 @@ def confirm_receipt_items():
         
         app.logger.info(f"Processing {len(items)} confirmed items")
         
-        # Add confirmed items to inventory
-        for item in items:
+        # Validate every item first, then add the valid ones in one round trip
+        results = []
+        documents = []
+        document_indexes = []
+        now = datetime.utcnow()
+        for index, item in enumerate(items):
             try:
-                inventory_item = {
+                documents.append({
                     'user_id': ObjectId(current_user.id),
                     'name': item['name'],
                     'quantity': float(item['quantity']),
                     'unit': item['unit'],
-                    'date_added': datetime.utcnow()
-                }
-                
-                result = mongo.db.inventory.insert_one(inventory_item)
-                app.logger.info(f"Added item to inventory: {item['name']}")
-                
-            except Exception as item_error:
-                app.logger.error(f"Error adding item to inventory: {str(item_error)}")
-                continue
+                    'price': clean_price(item.get('price', 0)),
+                    'category': identify_category(item['name']),
+                    'date_added': now
+                })
+                document_indexes.append(index)
+                results.append(None)
+            except KeyError as item_error:
+                app.logger.error(f"Invalid item {item}: missing {item_error.args[0]}")
+                results.append({'index': index, 'status': 'error', 'error': f'Missing required field: {item_error.args[0]}'})
+            except (TypeError, ValueError) as item_error:
+                app.logger.error(f"Invalid item {item}: {str(item_error)}")
+                results.append({'index': index, 'status': 'error', 'error': f'Invalid item: {str(item_error)}'})
         
-        app.logger.info("Successfully processed all confirmed items")
-        return jsonify({
-            'success': True,
-            'message': f'Successfully added {len(items)} items to inventory'
-        }), 200
+        written = add_inventory_items(documents)
+        for index, result in zip(document_indexes, written):
+            result['index'] = index
+            results[index] = result
+        
+        added = sum(1 for result in results if result['status'] == 'inserted')
+        errors = [result for result in results if result['status'] == 'error']
+        app.logger.info(f"Added {added} of {len(items)} confirmed items")
+        if added:
+            inserted, updated = inventory_merge.changed_ids(written)
+            inventory_changed(current_user.id, inserted=inserted, updated=updated)
+        
+        response = {
+            'success': added > 0,
+            'added': added,
+            'results': results,
+            'errors': errors,
+            'message': f'Successfully added {added} of {len(items)} items to inventory'
+        }
+        if not added:
+            response['error'] = 'Failed to add any items to inventory'
+            return jsonify(response), 400 if len(documents) == 0 else 500
+        return jsonify(response), 200
         
     except Exception as e:
         app.logger.error(f"Error confirming receipt items: {str(e)}")
@@ -628,6 +1105,7 @@ def delete_item(item_id):
     })
     if result.deleted_count == 0:
         return jsonify({'error': 'Item not found'}), 404
+    inventory_changed(current_user.id, deleted=[item_id])
     return jsonify({'message': 'Item deleted successfully'})
 
 @app.route('/api/add_item', methods=['POST'])
@@ -670,17 +1148,23 @@ def add_item():
             'quantity': float(item_data['quantity']),
             'unit': item_data['unit'],
             'price': float(item_data['price']),
+            'category': identify_category(item_data['name']),
             'date_added': datetime.utcnow()
         }
         
         app.logger.info(f"Adding item to inventory: {inventory_item}")
-        result = mongo.db.inventory.insert_one(inventory_item)
-        app.logger.info(f"Successfully added item with ID: {result.inserted_id}")
+        results = add_inventory_items([inventory_item])
+        if results[0]['status'] != 'inserted':
+            raise RuntimeError(results[0]['error'])
+        app.logger.info(f"Successfully added item with ID: {results[0]['item_id']}")
+        inserted, updated = inventory_merge.changed_ids(results)
+        inventory_changed(current_user.id, inserted=inserted, updated=updated)
         
         return jsonify({
             'success': True,
             'message': 'Item added successfully',
-            'item_id': str(result.inserted_id)
+            'item_id': results[0]['item_id'],
+            'merged': results[0]['merged']
         }), 200
         
     except Exception as e:
@@ -691,70 +1175,88 @@ def add_item():
             'details': str(e)
         }), 500
 
-@app.route('/get_recipes')
-@login_required
-def get_recipes():
-    try:
-        inventory_items = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
-        app.logger.info(f"Found {len(inventory_items)} inventory items")
-        
-        if not inventory_items:
-            app.logger.warning("No inventory items found")
-            return jsonify({'recipes': [], 'message': 'No ingredients available'})
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-        # Get filters from request
-        filters = request.args.get('filters', '{}')
-        try:
-            filters = json.loads(filters)
-            app.logger.info(f"Received filters: {filters}")
-        except json.JSONDecodeError:
-            filters = {}
-            app.logger.warning("Failed to parse filters JSON")
+def sse_response(events):
+    """Stream an iterable of formatted events to the browser."""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-        # Format inventory items with clean units
-        ingredients_list = []
-        ingredients_summary = []
-        for item in inventory_items:
-            if item['quantity'] and item['unit']:
-                formatted_amount = clean_unit(item['quantity'], item['unit'])
-                ingredients_list.append(f"- {formatted_amount} of {item['name']}")
-                ingredients_summary.append(f"{formatted_amount} of {item['name']}")
+def replay_recipes(recipes, **done):
+    """Yield SSE events for recipes that are already generated."""
+    for recipe in recipes:
+        yield sse_event('recipe', recipe)
+    yield sse_event('done', dict(done, count=len(recipes)))
+
+def stream_recipes(user_id, messages, cache_key, filters, flight_key, fresh=False):
+    """Stream recipes as SSE 'recipe' events while the model generates them.
+
+    A duplicate of a request already in flight waits for its recipes and
+    replays them instead of starting another generation; with ``fresh``,
+    recipes from a flight that already finished are not replayed.
+    """
+    def generate():
+        flight = request_flights.join(mongo.db, flight_key, fresh)
+        if not flight.leader:
+            try:
+                recipes = flight.wait()
+            except single_flight.FlightAbandoned as e:
+                app.logger.info(f"Streaming uncoalesced: {str(e)}")
+                flight = None
+            except Exception as e:
+                app.logger.error(f"Error in coalesced recipe stream: {str(e)}")
+                yield sse_event('error', {'error': str(e)})
+                return
             else:
-                ingredients_list.append(f"- {item['name']}")
-                ingredients_summary.append(item['name'])
-
-        ingredients_text = "\n".join(ingredients_list)
-        app.logger.info(f"Formatted ingredients:\n{ingredients_text}")
-
-        # Get user's cooking methods and tools
-        cooking_methods = [COOKING_METHODS[method]['name'] for method in (current_user.cooking_methods or []) if method in COOKING_METHODS]
-        kitchen_tools = [KITCHEN_TOOLS[tool]['name'] for tool in (current_user.kitchen_tools or []) if tool in KITCHEN_TOOLS]
-        
-        app.logger.info(f"User cooking methods: {cooking_methods}")
-        app.logger.info(f"User kitchen tools: {kitchen_tools}")
+                app.logger.info(f"Replaying {len(recipes)} recipes from a coalesced request")
+                yield from replay_recipes(recipes, coalesced=True)
+                return
 
-        # Add filter constraints to the prompt
-        constraints = []
-        if filters.get('timeConstraint'):
-            constraints.append(f"- Must take less than {filters['timeConstraint']} minutes to prepare")
-        if filters.get('preferredMethod'):
-            method_name = COOKING_METHODS.get(filters['preferredMethod'], {}).get('name')
-            if method_name:
-                constraints.append(f"- Must use {method_name} as the primary cooking method")
-        if filters.get('dietary'):
-            constraints.extend([f"- Must be {pref}" for pref in filters['dietary']])
-        if filters.get('mustUseIngredients'):
-            must_use = [item['name'] for item in inventory_items if str(item['_id']) in filters['mustUseIngredients']]
-            if must_use:
-                constraints.append(f"- Must use these ingredients: {', '.join(must_use)}")
-        
-        constraints_text = "\n".join(constraints) if constraints else "No specific constraints"
-
-        # Always request 10 recipes initially
-        recipes_to_request = 10
-        app.logger.info(f"Requesting {recipes_to_request} recipes")
-
-        system_prompt = """You are a helpful cooking assistant. When suggesting recipes:
+        recipes = []
+        finished = False
+        try:
+            stream = llm.chat_stream(
+                'recipes',
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.8,
+                max_tokens=RECIPE_BATCH_MAX_TOKENS
+            )
+            chunks = (chunk.choices[0].delta.content or '' for chunk in stream if chunk.choices)
+            for recipe in recipe_parser.iter_recipes(chunks):
+                recipes.append(recipe)
+                yield sse_event('recipe', recipe)
+            app.logger.info(f"Streamed {len(recipes)} recipes")
+            if recipes:
+                remember_recipes(user_id, cache_key, filters, recipes)
+            if flight is not None:
+                flight.finish(recipes)
+            finished = True
+            yield sse_event('done', {'count': len(recipes)})
+        except Exception as e:
+            app.logger.error(f"Error streaming recipes: {str(e)}")
+            if flight is not None:
+                flight.fail(e)
+            finished = True
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            if flight is not None and not finished:
+                # The browser went away mid-stream; let followers generate their own
+                flight.fail(single_flight.FlightAbandoned('The leading recipe stream was closed'))
+    return sse_response(generate())
+
+# Recipes per dashboard load, and the token budget for that call
+RECIPE_BATCH_SIZE = 10
+RECIPE_BATCH_MAX_TOKENS = 4000
+# Replacing one card needs about a tenth of that
+SINGLE_RECIPE_MAX_TOKENS = 600
+
+RECIPE_SYSTEM_PROMPT = """You are a helpful cooking assistant. When suggesting recipes:
 1. Format each recipe clearly with sections for name, ingredients, and instructions
 2. Start each recipe with 'Recipe: ' followed by the name
 3. List ingredients with quantities and units (e.g., '2 cups of flour' not '2 cup flour')
@@ -768,7 +1270,61 @@ def get_recipes():
 11. Suggest creative but practical recipes based on the available ingredients
 12. Make sure each recipe is unique and different from the others"""
 
-        user_prompt = f"""Based on these available ingredients:
+def user_cooking_setup(user):
+    """Return the names of a user's cooking methods and kitchen tools."""
+    cooking_methods = [COOKING_METHODS[method]['name'] for method in (user.cooking_methods or []) if method in COOKING_METHODS]
+    kitchen_tools = [KITCHEN_TOOLS[tool]['name'] for tool in (user.kitchen_tools or []) if tool in KITCHEN_TOOLS]
+    return cooking_methods, kitchen_tools
+
+def inventory_prompt(inventory_items, must_use_ids=()):
+    """Format inventory items for a prompt: merged, ordered and within the token budget."""
+    text, stats = prompt_builder.build_inventory_prompt(
+        inventory_items,
+        app.config['PROMPT_INVENTORY_TOKENS'],
+        identify_category,
+        must_use_ids
+    )
+    app.logger.info(f"Inventory prompt: {stats['rows']} rows merged into {stats['items']} items, "
+                    f"{stats['included']} listed, {stats['omitted']} omitted, ~{stats['tokens']} tokens")
+    return text
+
+def build_recipe_messages(inventory_items, cooking_methods, kitchen_tools, filters, recipe_count, avoid_names=()):
+    """Build the chat messages asking for ``recipe_count`` recipes.
+
+    ``avoid_names`` are recipes the user already has on screen; the model
+    is asked not to repeat them.
+    """
+    ingredients_text = inventory_prompt(inventory_items, filters.get('mustUseIngredients', ()))
+
+    # Add filter constraints to the prompt
+    constraints = []
+    if filters.get('timeConstraint'):
+        constraints.append(f"- Must take less than {filters['timeConstraint']} minutes to prepare")
+    if filters.get('preferredMethod'):
+        method_name = COOKING_METHODS.get(filters['preferredMethod'], {}).get('name')
+        if method_name:
+            constraints.append(f"- Must use {method_name} as the primary cooking method")
+    if filters.get('dietary'):
+        constraints.extend([f"- Must be {pref}" for pref in filters['dietary']])
+    if filters.get('mustUseIngredients'):
+        must_use = [item['name'] for item in inventory_items if str(item['_id']) in filters['mustUseIngredients']]
+        if must_use:
+            constraints.append(f"- Must use these ingredients: {', '.join(must_use)}")
+    if avoid_names:
+        constraints.append(f"- Must be different from these recipes I already have: {', '.join(avoid_names)}")
+    
+    constraints_text = "\n".join(constraints) if constraints else "No specific constraints"
+
+    if recipe_count == 1:
+        request_text = """Please suggest 1 recipe that can be made using some or all of these ingredients. 
+The recipe must use at least 2 ingredients from my inventory.
+Include:"""
+    else:
+        request_text = f"""Please suggest {recipe_count} unique and different recipes that can be made using some or all of these ingredients. 
+Each recipe must use at least 2 ingredients from my inventory and should be distinctly different from the others.
+For each recipe, include:"""
+
+    user_prompt = f"""Based on these available ingredients:
 {ingredients_text}
 
 Using these cooking methods and tools:
@@ -778,27 +1334,90 @@ Kitchen Tools: {', '.join(kitchen_tools) if kitchen_tools else 'Basic kitchen to
 With these constraints:
 {constraints_text}
 
-Please suggest {recipes_to_request} unique and different recipes that can be made using some or all of these ingredients. 
-Each recipe must use at least 2 ingredients from my inventory and should be distinctly different from the others.
-For each recipe, include:
+{request_text}
 1. Recipe name (start with 'Recipe: ')
 2. Required ingredients from my inventory (with quantities)
 3. Additional ingredients needed (with quantities)
 4. Preparation time
-5. Clear cooking instructions that utilize the available cooking methods and tools
+5. Clear cooking instructions that utilize the available cooking methods and tools"""
 
-Available ingredients summary: {', '.join(ingredients_summary)}"""
+    return [
+        {"role": "system", "content": RECIPE_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
 
-        # Call OpenAI API
+@app.route('/get_recipes')
+@login_required
+def get_recipes():
+    """Generate recipe suggestions; ``?stream=1`` sends each one as an SSE event."""
+    streaming = request.args.get('stream') == '1'
+    try:
+        # Recipes depend on the inventory and the user's cooking setup; a
+        # client that already has the set for both versions keeps it
+        etag = inventory_version.etag(
+            'recipes', current_user.id, inventory_version.current(mongo.db, current_user.id), current_user.version
+        )
+        if not streaming and request.args.get('refresh') != '1':
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
+        inventory_items = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
+        app.logger.info(f"Found {len(inventory_items)} inventory items")
+        
+        if not inventory_items:
+            app.logger.warning("No inventory items found")
+            if streaming:
+                return sse_response(iter([sse_event('done', {'count': 0, 'message': 'No ingredients available'})]))
+            return jsonify({'recipes': [], 'message': 'No ingredients available'})
+
+        # Get filters from request
+        filters = request.args.get('filters', '{}')
         try:
-            completion = client.chat.completions.create(
+            filters = json.loads(filters)
+            app.logger.info(f"Received filters: {filters}")
+        except json.JSONDecodeError:
+            filters = {}
+            app.logger.warning("Failed to parse filters JSON")
+
+        cooking_methods, kitchen_tools = user_cooking_setup(current_user)
+        app.logger.info(f"User cooking methods: {cooking_methods}")
+        app.logger.info(f"User kitchen tools: {kitchen_tools}")
+
+        # Serve the last result for identical inputs unless a fresh set is asked for
+        cache_key = recipe_cache.fingerprint(inventory_items, cooking_methods, kitchen_tools, filters)
+        if request.args.get('refresh') != '1':
+            cached_recipes = recipe_results.get(current_user.id, cache_key)
+            if cached_recipes is None and not filters:
+                # The default set may have been prefetched, possibly by another worker
+                cached_recipes = recipe_prefetcher.pooled(mongo.db, current_user.id, cache_key)
+                if cached_recipes is not None:
+                    recipe_results.put(current_user.id, cache_key, cached_recipes)
+            if cached_recipes is not None:
+                app.logger.info(f"Serving {len(cached_recipes)} cached recipes")
+                if streaming:
+                    return sse_response(replay_recipes(cached_recipes, cached=True))
+                return with_etag(jsonify({'recipes': cached_recipes, 'cached': True}), etag)
+
+        app.logger.info(f"Requesting {RECIPE_BATCH_SIZE} recipes")
+        messages = build_recipe_messages(inventory_items, cooking_methods, kitchen_tools, filters, RECIPE_BATCH_SIZE)
+        # Streamed and plain requests for the same inputs share one
+        # generation. A refresh only shares one with other refreshes still
+        # in flight, never the recipes already on screen
+        refresh = request.args.get('refresh') == '1'
+        flight_key = single_flight.flight_key(current_user.id, 'get_recipes', cache_key, refresh)
+        if streaming:
+            return stream_recipes(current_user.id, messages, cache_key, filters, flight_key, fresh=refresh)
+
+        user_id = current_user.id
+
+        def generate():
+            completion = llm.chat(
+                'recipes',
                 model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.8,
-                max_tokens=4000
+                max_tokens=RECIPE_BATCH_MAX_TOKENS
             )
             app.logger.info("Successfully received OpenAI API response")
             
@@ -807,13 +1426,22 @@ Available ingredients summary: {', '.join(ingredients_summary)}"""
             
             recipes = parse_recipe_suggestions(response_text)
             app.logger.info(f"Parsed {len(recipes)} recipes")
-            
-            return jsonify({'recipes': recipes})
+            if recipes:
+                remember_recipes(user_id, cache_key, filters, recipes)
+            return recipes
+
+        # Call OpenAI API
+        try:
+            recipes = request_flights.do(mongo.db, flight_key, generate, fresh=refresh)
+            return with_etag(jsonify({'recipes': recipes}), etag)
 
         except Exception as api_error:
             app.logger.error(f"OpenAI API error: {str(api_error)}")
             raise
 
+    except llm_gateway.LLMUnavailableError as e:
+        app.logger.warning(f"Recipe generation rejected by LLM gateway: {str(e)}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error generating recipes: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -821,174 +1449,46 @@ Available ingredients summary: {', '.join(ingredients_summary)}"""
 @app.route('/get_single_recipe', methods=['POST'])
 @login_required
 def get_single_recipe():
-    """Generate a single new recipe to replace a removed one"""
+    """Generate one new recipe to replace a card the user removed.
+
+    Expects ``{"exclude": [names of recipes on screen], "filters": {...}}``
+    and asks the model for a single recipe that isn't one of them.
+    """
     try:
-        # Use the same logic as get_recipes but request only one recipe
-        request.args = dict(request.args)
-        request.args['current_count'] = '9'  # Pretend we have 9 recipes to get 1 more
-        response = get_recipes()
-        if response.status_code == 200:
-            data = response.get_json()
-            if data.get('recipes'):
-                return jsonify({'recipe': data['recipes'][0]})
+        data = request.get_json(silent=True) or {}
+        exclude = [name for name in data.get('exclude', []) if isinstance(name, str) and name.strip()]
+        filters = data.get('filters') or {}
+
+        inventory_items = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
+        if not inventory_items:
+            return jsonify({'error': 'No ingredients available'}), 400
+
+        cooking_methods, kitchen_tools = user_cooking_setup(current_user)
+        messages = build_recipe_messages(inventory_items, cooking_methods, kitchen_tools, filters, 1, avoid_names=exclude)
+        completion = llm.chat(
+            'single_recipe',
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.8,
+            max_tokens=SINGLE_RECIPE_MAX_TOKENS
+        )
+
+        on_screen = {name.strip().lower() for name in exclude}
+        for recipe in parse_recipe_suggestions(completion.choices[0].message.content):
+            if recipe['name'].lower() not in on_screen:
+                return jsonify({'recipe': recipe})
+        app.logger.warning("Single recipe generation returned no new recipe")
         return jsonify({'error': 'Failed to generate new recipe'}), 500
+    except llm_gateway.LLMUnavailableError as e:
+        app.logger.warning(f"Single recipe generation rejected by LLM gateway: {str(e)}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
+        app.logger.error(f"Error generating single recipe: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def clean_unit(unit, quantity=None):
-    """Clean and validate unit value."""
-    try:
-        # If quantity is provided, use the two-parameter version
-        if quantity is not None:
-            # Convert float to int if it's a whole number
-            if isinstance(quantity, (int, float)):
-                if quantity.is_integer():
-                    quantity = int(quantity)
-            
-            # Clean up unit names
-            unit_mapping = {
-                'pcs': 'piece',
-                'pc': 'piece',
-                'pieces': 'piece',
-                'g': 'grams',
-                'ml': 'milliliters',
-                'l': 'liters',
-                'oz': 'ounces',
-                'lb': 'pounds',
-                'tsp': 'teaspoon',
-                'tbsp': 'tablespoon',
-                'cup': 'cups',
-            }
-            
-            # Handle pluralization
-            if unit.lower() in unit_mapping:
-                base_unit = unit_mapping[unit.lower()]
-                if quantity == 1:
-                    return f"{quantity} {base_unit}"
-                else:
-                    # Handle special cases
-                    if base_unit == 'piece':
-                        return f"{quantity} pieces"
-                    return f"{quantity} {base_unit}s"
-            
-            return f"{quantity} {unit}"
-        
-        # Single parameter version - just clean the unit
-        unit = unit.lower().strip()
-        if not unit:
-            return 'piece'  # Default unit
-            
-        # Clean up unit names
-        unit_mapping = {
-            'pcs': 'piece',
-            'pc': 'piece',
-            'pieces': 'piece',
-            'g': 'grams',
-            'ml': 'milliliters',
-            'l': 'liters',
-            'oz': 'ounces',
-            'lb': 'pounds',
-            'tsp': 'teaspoon',
-            'tbsp': 'tablespoon',
-            'cup': 'cups',
-        }
-        
-        return unit_mapping.get(unit, unit)
-        
-    except Exception as e:
-        app.logger.error(f"Error cleaning unit: {str(e)}")
-        return 'piece'  # Default unit on error
-
 def parse_recipe_suggestions(response_text):
-    recipes = []
-    current_recipe = None
-    current_section = None
-    
-    # Split response into lines and process each line
-    lines = response_text.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Skip empty lines
-        if not line:
-            i += 1
-            continue
-        
-        # Start a new recipe when we see "Recipe:"
-        if line.lower().startswith('recipe:'):
-            if current_recipe:
-                if current_recipe.get('name') and current_recipe.get('instructions'):
-                    recipes.append(current_recipe)
-            
-            current_recipe = {
-                'name': line.replace('Recipe:', '').strip(),
-                'required_ingredients': [],
-                'additional_ingredients': [],
-                'preparation_time': 'Not specified',
-                'instructions': []
-            }
-            current_section = None
-            
-        # Process sections within a recipe
-        elif current_recipe:
-            lower_line = line.lower()
-            
-            # Check for section headers
-            if any(header in lower_line for header in ['required ingredients:', 'ingredients from inventory:', 'from your inventory:']):
-                current_section = 'required_ingredients'
-                
-            elif any(header in lower_line for header in ['additional ingredients:', 'extra ingredients:', 'other ingredients:']):
-                current_section = 'additional_ingredients'
-                
-            elif any(header in lower_line for header in ['preparation time:', 'prep time:', 'cooking time:', 'total time:']):
-                current_recipe['preparation_time'] = line.split(':', 1)[1].strip()
-                current_section = None
-                
-            elif any(header in lower_line for header in ['instructions:', 'steps:', 'directions:', 'method:']):
-                current_section = 'instructions'
-                
-            # Process content based on current section
-            elif current_section:
-                # Handle list items (both numbered and bulleted)
-                if line.startswith(('-', '•', '*')) or re.match(r'^\d+\.?\s', line):
-                    content = re.sub(r'^[-•*\d.]\s*', '', line).strip()
-                    
-                    if current_section == 'instructions':
-                        if content:
-                            current_recipe['instructions'].append(content)
-                    else:  # ingredients sections
-                        if content.lower() not in ['none', 'n/a', '-']:
-                            current_recipe[current_section].append(content)
-                
-                # Handle non-list items in instructions
-                elif current_section == 'instructions' and line:
-                    current_recipe['instructions'].append(line)
-        
-        i += 1
-    
-    # Add the last recipe if it exists
-    if current_recipe and current_recipe.get('name') and current_recipe.get('instructions'):
-        recipes.append(current_recipe)
-    
-    # Clean up recipes
-    for recipe in recipes:
-        # Remove duplicates while preserving order
-        for section in ['required_ingredients', 'additional_ingredients']:
-            seen = set()
-            recipe[section] = [x for x in recipe[section] if not (x.lower() in seen or seen.add(x.lower()))]
-        
-        # Clean up and number instructions
-        recipe['instructions'] = [
-            f"{i+1}. {instr.strip()}" 
-            for i, instr in enumerate(recipe['instructions']) 
-            if instr.strip()
-        ]
-        
-        # Ensure preparation time is set
-        if not recipe['preparation_time'] or recipe['preparation_time'] == 'Not specified':
-            recipe['preparation_time'] = '30-40 minutes'  # Default value
-    
+    """Parse a complete model response into recipe dicts (see recipe_parser)."""
+    recipes = recipe_parser.parse_recipes(response_text)
     app.logger.info(f"Parsed {len(recipes)} recipes: {[r['name'] for r in recipes]}")
     return recipes
 
@@ -997,6 +1497,7 @@ def parse_recipe_suggestions(response_text):
 def delete_all_inventory():
     try:
         result = mongo.db.inventory.delete_many({"user_id": ObjectId(current_user.id)})
+        inventory_changed(current_user.id, reset=True)
         if result.deleted_count >= 0:
             return jsonify({"message": f"Deleted {result.deleted_count} items"})
         else:
@@ -1018,13 +1519,21 @@ def add_test_items():
             {'name': 'Garlic', 'quantity': 5, 'unit': 'cloves'}
         ]
 
-        # Add items to inventory
+        # Add items to inventory in one round trip
+        now = datetime.utcnow()
         for item in test_items:
             item['user_id'] = ObjectId(current_user.id)
-            item['date_added'] = datetime.utcnow()
-            mongo.db.inventory.insert_one(item)
+            item['category'] = identify_category(item['name'])
+            item['date_added'] = now
+        results = add_inventory_items(test_items)
+        inserted, updated = inventory_merge.changed_ids(results)
+        inventory_changed(current_user.id, inserted=inserted, updated=updated)
         
-        return jsonify({'message': 'Test items added successfully'})
+        errors = [result for result in results if result['status'] == 'error']
+        if errors:
+            app.logger.error(f"Errors adding test items: {errors}")
+            return jsonify({'error': 'Failed to add some test items', 'results': results}), 500
+        return jsonify({'message': 'Test items added successfully', 'results': results})
     except Exception as e:
         app.logger.error(f"Error adding test items: {str(e)}")
         return jsonify({'error': 'Failed to add test items'}), 500
@@ -1039,25 +1548,13 @@ def rate_recipe():
     if not recipe_name:
         return jsonify({'error': 'Recipe name is required'}), 400
         
-    # Check if rating already exists
-    existing_rating = mongo.db.recipe_ratings.find_one({
-        'user_id': ObjectId(current_user.id),
-        'recipe_name': recipe_name
-    })
-    
-    if existing_rating:
-        mongo.db.recipe_ratings.update_one(
-            {'_id': existing_rating['_id']},
-            {'$set': {'rating': rating}}
-        )
-    else:
-        new_rating = {
-            'recipe_name': recipe_name,
-            'user_id': ObjectId(current_user.id),
-            'rating': rating,
-            'created_at': datetime.utcnow()
-        }
-        mongo.db.recipe_ratings.insert_one(new_rating)
+    # One rating per user and recipe; the upsert keeps concurrent clicks from
+    # inserting a second one
+    mongo.db.recipe_ratings.update_one(
+        {'user_id': ObjectId(current_user.id), 'recipe_name': recipe_name},
+        {'$set': {'rating': rating}, '$setOnInsert': {'created_at': datetime.utcnow()}},
+        upsert=True
+    )
     
     return jsonify({'message': 'Rating saved successfully'})
 
@@ -1073,7 +1570,7 @@ def chat():
 
         # Create the chat prompt
         inventory_items = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
-        ingredients_list = "\n".join([f"- {item['quantity']} {item['unit']} of {item['name']}" for item in inventory_items])
+        ingredients_list = inventory_prompt(inventory_items)
         
         system_prompt = """You are a helpful cooking assistant. When suggesting recipes:
 1. Format each recipe clearly with sections for name, ingredients, and instructions
@@ -1092,7 +1589,8 @@ User request: {user_message}
 Please provide recipe suggestions based on the request and available ingredients. If specific ingredients are missing, suggest alternatives or additional items needed."""
 
         # Call OpenAI API
-        response = client.chat.completions.create(
+        response = llm.chat(
+            'chat',
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -1122,6 +1620,9 @@ Please provide recipe suggestions based on the request and available ingredients
             'recipes': recipes
         })
 
+    except llm_gateway.LLMUnavailableError as e:
+        app.logger.warning(f"Chat rejected by LLM gateway: {str(e)}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.error(f"Chat error: {str(e)}")
         app.logger.exception("Full traceback:")
@@ -1132,15 +1633,15 @@ Please provide recipe suggestions based on the request and available ingredients
 
 @app.route('/refresh_recipe/<recipe_name>', methods=['POST'])
 @login_required
-def refresh_recipe():
+def refresh_recipe(recipe_name):
     try:
-        recipe_name = request.json.get('recipe_name')
+        recipe_name = (request.get_json(silent=True) or {}).get('recipe_name') or recipe_name
         if not recipe_name:
             return jsonify({'error': 'Recipe name is required'}), 400
 
         # Get user's inventory items
         inventory_items = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
-        ingredients_list = "\n".join([f"- {item['quantity']} {item['unit']} of {item['name']}" for item in inventory_items])
+        ingredients_list = inventory_prompt(inventory_items)
 
         # Create a specific prompt for the recipe
         prompt = f"""Based on these available ingredients:
@@ -1153,22 +1654,38 @@ Please provide a new variation of the recipe '{recipe_name}'. Include:
 4. Preparation time
 5. Clear cooking instructions"""
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful cooking assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=1000
+        def generate():
+            response = llm.chat(
+                'refresh_recipe',
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "You are a helpful cooking assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.8,
+                max_tokens=1000
+            )
+            recipes = parse_recipe_suggestions(response.choices[0].message.content)
+            return recipes[0] if recipes else None
+
+        # Repeated clicks on the same card share one variation
+        flight_key = single_flight.flight_key(
+            current_user.id,
+            'refresh_recipe',
+            recipe_name.strip().lower(),
+            recipe_cache.fingerprint(inventory_items, [], [], {})
         )
-
-        recipes = parse_recipe_suggestions(response.choices[0].message.content)
-        if recipes:
-            return jsonify({'recipe': recipes[0]})
+        # A refresh always wants a new variation: share a call still in
+        # flight, never a finished one
+        recipe = request_flights.do(mongo.db, flight_key, generate, fresh=True)
+        if recipe:
+            return jsonify({'recipe': recipe})
         else:
             return jsonify({'error': 'Could not generate a new recipe variation'}), 500
 
+    except llm_gateway.LLMUnavailableError as e:
+        app.logger.warning(f"Recipe refresh rejected by LLM gateway: {str(e)}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error refreshing recipe: {str(e)}")
         return jsonify({'error': 'Failed to refresh recipe'}), 500
@@ -1180,8 +1697,16 @@ def preferences():
         cooking_methods = request.form.getlist('cooking_methods')
         kitchen_tools = request.form.getlist('kitchen_tools')
         
-        current_user.cooking_methods = cooking_methods
-        current_user.kitchen_tools = kitchen_tools
+        user_data = mongo.db.users.find_one_and_update(
+            {'_id': ObjectId(current_user.id)},
+            {'$set': {'cooking_methods': cooking_methods, 'kitchen_tools': kitchen_tools}, '$inc': {'version': 1}},
+            projection=user_cache.USER_FIELDS,
+            return_document=ReturnDocument.AFTER
+        )
+        # Bumping the version makes every worker reload this user
+        users_cache.invalidate(current_user.id)
+        if user_data:
+            session['user_version'] = user_cache.user_version(user_data)
         
         flash('Preferences updated successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -1192,21 +1717,137 @@ def preferences():
                          user_cooking_methods=current_user.cooking_methods or [],
                          user_kitchen_tools=current_user.kitchen_tools or [])
 
+# Fields list endpoints may return; user_id is implied by the session
+INVENTORY_FIELDS = ('name', 'quantity', 'unit', 'price', 'category', 'date_added')
+RECEIPT_FIELDS = ('upload_date', 'filename', 'store', 'total', 'items')
+
+# Keyset orders for paginated lists, each ending in _id so they are total
+INVENTORY_SORTS = {
+    'newest': [('date_added', -1), ('_id', -1)],
+    'oldest': [('date_added', 1), ('_id', 1)],
+    'name': [('name', 1), ('_id', 1)],
+}
+RECEIPT_SORT = [('upload_date', -1), ('_id', -1)]
+
+def list_projection(fields_param, allowed_fields, sort):
+    """Return the projection for ``?fields=a,b``, always including the sort keys."""
+    fields = allowed_fields
+    if fields_param:
+        fields = [field for field in fields_param.split(',') if field in allowed_fields]
+        if not fields:
+            raise pagination.PaginationError(f"fields must be some of {', '.join(allowed_fields)}")
+    projection = {field: 1 for field in fields}
+    projection.update({field: 1 for field, _ in sort})
+    return projection
+
+def parse_date_param(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return parser.isoparse(value)
+    except ValueError:
+        raise pagination.PaginationError(f"{name} must be an ISO date")
+
+def inventory_query(user_id, args):
+    """Build the inventory filter from ``q`` (name prefix), ``category``,
+    ``added_after`` and ``added_before`` query parameters."""
+    query = {"user_id": ObjectId(user_id)}
+    name_prefix = (args.get('q') or '').strip()
+    if name_prefix:
+        query['name'] = {'$regex': f"^{re.escape(name_prefix)}", '$options': 'i'}
+    if args.get('category'):
+        query['category'] = args['category']
+    added = {}
+    added_after = parse_date_param(args, 'added_after')
+    if added_after:
+        added['$gte'] = added_after
+    added_before = parse_date_param(args, 'added_before')
+    if added_before:
+        added['$lt'] = added_before
+    if added:
+        query['date_added'] = added
+    return query
+
+def not_modified(etag):
+    """Return a 304 if the request's If-None-Match already has ``etag``, else None."""
+    if request.if_none_match.contains(etag):
+        return with_etag(Response(status=304), etag)
+    return None
+
+def with_etag(response, etag):
+    """Tag a response and make browsers revalidate it before reuse."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def serialize_row(row):
+    """Make a Mongo document JSON-friendly: ids as strings, dates as ISO text."""
+    for key, value in row.items():
+        if isinstance(value, ObjectId):
+            row[key] = str(value)
+        elif isinstance(value, datetime):
+            row[key] = value.isoformat()
+    return row
+
+@app.route('/api/receipts')
+@login_required
+def list_receipts():
+    """Return the user's receipts newest first, a page at a time."""
+    try:
+        receipts, next_cursor = pagination.fetch_page(
+            mongo.db.receipts,
+            {"user_id": ObjectId(current_user.id)},
+            'newest',
+            RECEIPT_SORT,
+            pagination.parse_limit(request.args.get('limit')),
+            list_projection(request.args.get('fields'), RECEIPT_FIELDS, RECEIPT_SORT),
+            request.args.get('cursor')
+        )
+        return jsonify({"receipts": [serialize_row(receipt) for receipt in receipts], "next_cursor": next_cursor})
+    except pagination.PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error listing receipts: {str(e)}")
+        return jsonify({"error": "Failed to list receipts"}), 500
+
 @app.route('/api/inventory', methods=['GET', 'POST'])
 @login_required
 def inventory():
     if request.method == 'GET':
         try:
-            # Get user's inventory
-            items = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
-            # Convert ObjectId to string for JSON serialization
-            for item in items:
-                item['_id'] = str(item['_id'])
-                item['user_id'] = str(item['user_id'])
-                # Convert any datetime objects to string if they exist
-                if 'added_date' in item:
-                    item['added_date'] = item['added_date'].isoformat()
-            return jsonify({"items": items})
+            # The version is read before the rows, see inventory_version
+            version = inventory_version.current(mongo.db, current_user.id)
+            etag = inventory_version.etag('inventory', current_user.id, version)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
+            sort_name = request.args.get('sort', 'newest')
+            sort = INVENTORY_SORTS.get(sort_name)
+            if sort is None:
+                return jsonify({"error": f"sort must be one of {', '.join(INVENTORY_SORTS)}"}), 400
+            query = inventory_query(current_user.id, request.args)
+            projection = list_projection(request.args.get('fields'), INVENTORY_FIELDS, sort)
+            items, next_cursor = pagination.fetch_page(
+                mongo.db.inventory,
+                query,
+                sort_name,
+                sort,
+                pagination.parse_limit(request.args.get('limit')),
+                projection,
+                request.args.get('cursor')
+            )
+            return with_etag(
+                jsonify({
+                    "items": [serialize_row(item) for item in items],
+                    "next_cursor": next_cursor,
+                    "version": version
+                }),
+                etag
+            )
+        except pagination.PaginationError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             app.logger.error(f"Error getting inventory: {str(e)}")
             return jsonify({"error": "Failed to get inventory"}), 500
@@ -1231,16 +1872,21 @@ def inventory():
                 "name": name,
                 "quantity": quantity,
                 "unit": unit,
-                "added_date": datetime.utcnow()
+                "category": identify_category(name),
+                "date_added": datetime.utcnow()
             }
             
-            result = mongo.db.inventory.insert_one(item)
+            result = add_inventory_items([item])[0]
             
-            if result.inserted_id:
+            if result['status'] == 'inserted':
+                inserted, updated = inventory_merge.changed_ids([result])
+                inventory_changed(current_user.id, inserted=inserted, updated=updated)
+                # 200 when the quantity was added to an existing row
                 return jsonify({
                     "message": "Item added successfully",
-                    "item_id": str(result.inserted_id)
-                }), 201
+                    "item_id": result['item_id'],
+                    "merged": result['merged']
+                }), 200 if result['merged'] else 201
             else:
                 return jsonify({"error": "Failed to add item"}), 500
                 
@@ -1273,18 +1919,11 @@ def analyze_receipt():
         if not allowed_file(file.filename):
             return jsonify({'success': False, 'error': 'Invalid file type. Please upload an image file.'}), 400
         
-        # Save the file temporarily
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        image_bytes = receipt_images.read_upload(file.stream)
         
         try:
             # Process the receipt using our vision-based function
-            items = process_receipt(filepath)
-            
-            # Clean up the uploaded file
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            items = process_receipt(image_bytes)
             
             return jsonify({
                 'success': True,
@@ -1292,9 +1931,6 @@ def analyze_receipt():
             })
             
         except Exception as e:
-            # Clean up the uploaded file in case of error
-            if os.path.exists(filepath):
-                os.remove(filepath)
             app.logger.error(f"Error processing receipt: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
             
@@ -1302,6 +1938,30 @@ def analyze_receipt():
         app.logger.error(f"Error analyzing receipt: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/receipt_cache/stats')
+@login_required
+def receipt_cache_stats():
+    """Report receipt extraction cache hits, misses and Vision time saved."""
+    return jsonify(receipt_cache.stats(mongo.db))
+
+@app.route('/api/recipe_cache/stats')
+@login_required
+def recipe_cache_stats():
+    """Report recipe cache hits, misses and evictions for this worker."""
+    return jsonify(recipe_results.stats())
+
+@app.route('/api/user_cache/stats')
+@login_required
+def user_cache_stats():
+    """Report user loader cache hits, misses and stale entries for this worker."""
+    return jsonify(users_cache.stats())
+
+@app.route('/api/llm/stats')
+@login_required
+def llm_stats():
+    """Report LLM call counts, retries, rejections, breaker state and request coalescing for this worker."""
+    return jsonify(dict(llm.stats(), single_flight=request_flights.stats()))
+
 @app.route('/api/suggested_recipes')
 @login_required
 def get_suggested_recipes():
@@ -1310,10 +1970,11 @@ def get_suggested_recipes():
         inventory = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
         
         # Format inventory items for the prompt
-        inventory_text = "\n".join([f"- {item['quantity']} {item['unit']} of {item['name']}" for item in inventory])
+        inventory_text = inventory_prompt(inventory)
         
         # Create the prompt for recipe generation
-        response = client.responses.create(
+        response = llm.respond(
+            'suggested_recipes',
             model="gpt-4o",
             input=[
                 {
@@ -1364,6 +2025,9 @@ def get_suggested_recipes():
             app.logger.error(f"JSON decode error: {str(e)}")
             return jsonify({"error": "Failed to generate recipes"}), 500
             
+    except llm_gateway.LLMUnavailableError as e:
+        app.logger.warning(f"Suggested recipes rejected by LLM gateway: {str(e)}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error generating recipes: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1378,10 +2042,11 @@ def chat_recipes():
 
         # Get user's inventory
         inventory = list(mongo.db.inventory.find({"user_id": ObjectId(current_user.id)}))
-        inventory_text = "\n".join([f"- {item['quantity']} {item['unit']} of {item['name']}" for item in inventory])
+        inventory_text = inventory_prompt(inventory)
 
         # Generate recipes based on query and inventory
-        response = client.responses.create(
+        response = llm.respond(
+            'chat_recipes',
             model="gpt-4o",
             input=[
                 {
@@ -1433,10 +2098,41 @@ def chat_recipes():
             app.logger.error(f"JSON decode error: {str(e)}")
             return jsonify({"error": "Failed to generate recipes"}), 500
 
+    except llm_gateway.LLMUnavailableError as e:
+        app.logger.warning(f"Chat recipes rejected by LLM gateway: {str(e)}")
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error in chat recipes: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/inventory/changes')
+@login_required
+def inventory_changes():
+    """Return the items inserted, updated and deleted since version ``since``.
+
+    Inserted and updated rows come back in full under ``items``. When
+    ``reset`` is true the client's version is too old to patch and it
+    should reload the list.
+    """
+    try:
+        since = int(request.args.get('since', ''))
+    except ValueError:
+        return jsonify({"error": "since must be a version number"}), 400
+    try:
+        version = inventory_version.current(mongo.db, current_user.id)
+        delta = inventory_version.changes_since(mongo.db, current_user.id, since, version)
+        changed_ids = [ObjectId(item_id) for item_id in delta['inserted'] + delta['updated']]
+        items = []
+        if changed_ids:
+            items = mongo.db.inventory.find(
+                {"_id": {"$in": changed_ids}, "user_id": ObjectId(current_user.id)},
+                {field: 1 for field in INVENTORY_FIELDS}
+            )
+        return jsonify(dict(delta, version=version, items=[serialize_row(item) for item in items]))
+    except Exception as e:
+        app.logger.error(f"Error getting inventory changes: {str(e)}")
+        return jsonify({"error": "Failed to get inventory changes"}), 500
+
 @app.route('/api/inventory/<item_id>', methods=['DELETE'])
 @login_required
 def delete_inventory_item(item_id):
@@ -1457,6 +2153,7 @@ def delete_inventory_item(item_id):
         })
         
         if result.deleted_count > 0:
+            inventory_changed(current_user.id, deleted=[item_id])
             return jsonify({"message": "Item deleted successfully"})
         else:
             return jsonify({"error": "Failed to delete item"}), 500
@@ -1465,6 +2162,63 @@ def delete_inventory_item(item_id):
         app.logger.error(f"Error deleting item: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Create all MongoDB indexes the app relies on."""
+    names, failures = db_indexes.ensure_indexes(mongo.db)
+    click.echo(f"Ensured {len(names)} indexes")
+    for failure in failures:
+        click.echo(failure, err=True)
+    if failures:
+        raise SystemExit(1)
+
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """Fail if an index is missing or any app query does a COLLSCAN."""
+    problems = db_indexes.check_indexes(mongo.db) + db_indexes.check_query_plans(mongo.db)
+    for problem in problems:
+        click.echo(problem, err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo(f"All indexes present and {len(db_indexes.QUERIES)} queries use an index")
+
+@app.cli.command('compact-inventory')
+def compact_inventory_command():
+    """Fold duplicate inventory rows into one row per item name and unit.
+
+    Run it again whenever the units registry changes which spellings
+    share a unit: rows are regrouped under the new keys. Since packs
+    ('pack', 'pkg') stopped counting as pieces, rows bought in packs get
+    their own 'pack' key; quantities already merged into a pieces row
+    cannot be split back out.
+    """
+    removed, user_ids = inventory_merge.compact(mongo.db)
+    for user_id in user_ids:
+        inventory_version.bump(mongo.db, user_id, reset=True)
+    click.echo(f"Removed {removed} duplicate inventory rows for {len(user_ids)} users")
+
+@app.cli.command('backfill-inventory')
+def backfill_inventory_command():
+    """Give older inventory rows the category and date_added fields list queries use."""
+    updates = []
+    user_ids = set()
+    for item in mongo.db.inventory.find(
+        {'$or': [{'category': {'$exists': False}}, {'date_added': {'$exists': False}}]},
+        {'user_id': 1, 'name': 1, 'category': 1, 'date_added': 1, 'added_date': 1}
+    ):
+        user_ids.add(item['user_id'])
+        fields = {}
+        if 'category' not in item:
+            fields['category'] = identify_category(item.get('name') or '')
+        if 'date_added' not in item:
+            fields['date_added'] = item.get('added_date') or item['_id'].generation_time.replace(tzinfo=None)
+        updates.append(UpdateOne({'_id': item['_id']}, {'$set': fields}))
+    for start in range(0, len(updates), 1000):
+        mongo.db.inventory.bulk_write(updates[start:start + 1000], ordered=False)
+    for user_id in user_ids:
+        inventory_version.bump(mongo.db, user_id, reset=True)
+    click.echo(f"Backfilled {len(updates)} inventory rows")
+
 if __name__ == '__main__':
     print("Starting server...")
     print("Access the app on your phone using these URLs:")
@@ -0,0 +1,88 @@
+"""Benchmark category and unit identification on 100k item names.
+
+Compares the old nested substring scans with the token-level keyword
+automata, reports names/second for single and batch calls, and shows how
+many answers changed (the substring scan matched 'g' and 'l' inside
+ordinary words).
+
+Usage:
+    python benchmarks/bench_keyword_index.py [name_count]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/benchmark')
+
+import app  # noqa: E402
+
+
+def legacy_identify_category(item_name):
+    item_name = item_name.lower()
+    for category, keywords in app.GROCERY_CATEGORIES.items():
+        if any(keyword in item_name for keyword in keywords):
+            return category
+    return 'other'
+
+
+def legacy_identify_unit(text):
+    text = text.lower()
+    for unit, patterns in app.UNIT_PATTERNS.items():
+        if any(pattern in text for pattern in patterns):
+            return unit
+    return 'pcs'
+
+
+WORDS = ['organic', 'great', 'value', 'whole', 'fresh', 'frozen', 'large', 'family', 'size',
+         'vanilla', 'greek', 'sliced', 'boneless', 'original', 'spicy', 'gluten', 'free']
+KEYWORDS = [keyword for keywords in app.GROCERY_CATEGORIES.values() for keyword in keywords]
+SIZES = ['', '', '12 oz', '500g', '2 lb', '1 l', '6 ct', '1 gallon', '16OZ']
+
+
+def synthetic_names(count, seed=7):
+    rng = random.Random(seed)
+    names = []
+    for _ in range(count):
+        words = rng.sample(WORDS, rng.randint(0, 3))
+        if rng.random() < 0.8:
+            words.insert(rng.randint(0, len(words)), rng.choice(KEYWORDS))
+        names.append(' '.join(words + [rng.choice(SIZES)]).strip())
+    return names
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    names = synthetic_names(count)
+    print(f"{count} synthetic item names")
+
+    cases = [
+        ('category', legacy_identify_category, app.identify_category, app.identify_categories),
+        ('unit', legacy_identify_unit, app.identify_unit, app.identify_units),
+    ]
+    for label, legacy, single, batch in cases:
+        before, before_time = timed(lambda: [legacy(name) for name in names])
+        after, after_time = timed(lambda: [single(name) for name in names])
+        batched, batch_time = timed(lambda: batch(names))
+        assert batched == after
+
+        changed = Counter((old, new) for old, new in zip(before, after) if old != new)
+        print(f"\n{label}")
+        print(f"  substring scan   {count / before_time:12,.0f} names/s")
+        print(f"  keyword index    {count / after_time:12,.0f} names/s")
+        print(f"  batch call       {count / batch_time:12,.0f} names/s")
+        print(f"  answers changed  {sum(changed.values())} "
+              f"(most common old->new: {changed.most_common(3)})")
+
+
+if __name__ == '__main__':
+    main()
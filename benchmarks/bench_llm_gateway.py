@@ -0,0 +1,155 @@
+"""Exercise the LLM gateway against the local fake OpenAI server.
+
+Checks retries with backoff, per-route timeouts, the circuit breaker,
+the in-flight semaphore and streaming, and reports what each scenario
+cost in wall time and upstream requests. No API key or network needed.
+
+Usage:
+    python benchmarks/bench_llm_gateway.py
+"""
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import openai  # noqa: E402
+
+import llm_gateway  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+MESSAGES = [{'role': 'user', 'content': 'Suggest recipes'}]
+
+
+def make_gateway(server, **options):
+    client = openai.OpenAI(api_key='fake', base_url=server.base_url)
+    options.setdefault('backoff_base', 0.05)
+    return llm_gateway.LLMGateway(client, **options)
+
+
+def scenario(name, fn):
+    started = time.perf_counter()
+    detail = fn()
+    print(f"{name:34} {time.perf_counter() - started:7.2f}s  {detail}")
+
+
+def check_retries(server):
+    server.reset_counters()
+    server.fail_next = 2
+    gateway = make_gateway(server, max_retries=2)
+    completion = gateway.chat('recipes', model='gpt-4o', messages=MESSAGES)
+    assert completion.choices[0].message.content.startswith('Here are')
+    assert server.requests == 3, server.requests
+    return f"2 failures retried, {server.requests} upstream requests, stats {gateway.stats()}"
+
+
+def check_timeout(server):
+    server.reset_counters()
+    server.latency = 0.5
+    gateway = make_gateway(server, max_retries=1, timeouts={'chat': 0.1})
+    try:
+        gateway.chat('chat', model='gpt-4o', messages=MESSAGES)
+        raise AssertionError('expected a timeout')
+    except openai.APITimeoutError:
+        pass
+    finally:
+        server.latency = 0.0
+    assert server.requests == 2, server.requests
+    return f"0.1s route timeout hit on {server.requests} attempts"
+
+
+def check_breaker(server):
+    server.reset_counters()
+    server.fail_rate = 1.0
+    gateway = make_gateway(server, max_retries=0, failure_threshold=3, reset_timeout=0.5)
+    failures = rejected = 0
+    for _ in range(10):
+        try:
+            gateway.chat('recipes', model='gpt-4o', messages=MESSAGES)
+        except openai.InternalServerError:
+            failures += 1
+        except llm_gateway.LLMUnavailableError:
+            rejected += 1
+    assert failures == 3 and rejected == 7, (failures, rejected)
+    assert gateway.breaker.state == llm_gateway.BREAKER_OPEN
+    upstream_while_open = server.requests
+
+    server.fail_rate = 0.0
+    time.sleep(0.6)
+    gateway.chat('recipes', model='gpt-4o', messages=MESSAGES)
+    assert gateway.breaker.state == llm_gateway.BREAKER_CLOSED
+    return (f"opened after {failures} failures, {rejected} calls rejected without "
+            f"an upstream request ({upstream_while_open} sent), closed after trial call")
+
+
+def check_semaphore(server):
+    server.reset_counters()
+    server.latency = 0.2
+    gateway = make_gateway(server, max_concurrency=4, queue_timeout=10)
+    threads = [
+        threading.Thread(target=gateway.chat, args=('recipes',), kwargs={'model': 'gpt-4o', 'messages': MESSAGES})
+        for _ in range(16)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.latency = 0.0
+    assert server.max_in_flight <= 4, server.max_in_flight
+    return f"16 callers, at most {server.max_in_flight} requests in flight upstream"
+
+
+def check_busy(server):
+    server.reset_counters()
+    server.latency = 0.5
+    gateway = make_gateway(server, max_concurrency=1, queue_timeout=0.05)
+    holder = threading.Thread(target=gateway.chat, args=('recipes',), kwargs={'model': 'gpt-4o', 'messages': MESSAGES})
+    holder.start()
+    time.sleep(0.1)
+    try:
+        gateway.chat('recipes', model='gpt-4o', messages=MESSAGES)
+        raise AssertionError('expected the second call to be rejected')
+    except llm_gateway.LLMUnavailableError:
+        pass
+    holder.join()
+    server.latency = 0.0
+    return "second caller rejected after 0.05s instead of queueing behind a slow call"
+
+
+def check_stream(server):
+    server.reset_counters()
+    gateway = make_gateway(server)
+    chunks = [chunk.choices[0].delta.content or '' for chunk in gateway.chat_stream('recipes', model='gpt-4o', messages=MESSAGES) if chunk.choices]
+    assert ''.join(chunks) == server.text
+    assert gateway.stats()['in_flight'] == 0
+    return f"{len(chunks)} chunks, slot released after the stream"
+
+
+def check_responses(server):
+    server.reset_counters()
+    gateway = make_gateway(server)
+    response = gateway.respond('suggested_recipes', model='gpt-4o', input='Suggest recipes')
+    assert response.output_text == '[]'
+    return "Responses API call passed through"
+
+
+def main():
+    server = FakeOpenAIServer().start()
+    print(f"Fake OpenAI API on {server.base_url}\n")
+    try:
+        scenario('retry with jittered backoff', lambda: check_retries(server))
+        scenario('per-route timeout', lambda: check_timeout(server))
+        scenario('circuit breaker', lambda: check_breaker(server))
+        scenario('in-flight semaphore', lambda: check_semaphore(server))
+        scenario('fail fast when busy', lambda: check_busy(server))
+        scenario('streamed completion', lambda: check_stream(server))
+        scenario('responses API', lambda: check_responses(server))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Compare the old and new inventory text sent to the model.
+
+Builds synthetic inventories of 50, 500 and 5000 rows, with the duplicate
+rows that repeated receipts produce, and reports the prompt tokens of the
+old format (one bullet per row plus a comma-separated summary of the same
+rows) against prompt_builder.build_inventory_prompt. Token counts are
+exact when tiktoken is installed and estimated (~4 chars/token) otherwise.
+
+Usage:
+    python benchmarks/bench_prompt_builder.py [--budget 1200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt_builder  # noqa: E402
+
+# (name, unit, category) of things that turn up on grocery receipts
+PRODUCTS = [
+    ('Milk', 'l', 'dairy'), ('Whole Milk', 'l', 'dairy'), ('Eggs', 'pcs', 'dairy'),
+    ('Butter', 'g', 'dairy'), ('Cheddar Cheese', 'g', 'dairy'), ('Greek Yogurt', 'g', 'dairy'),
+    ('Chicken Breast', 'kg', 'meat'), ('Ground Beef', 'kg', 'meat'), ('Bacon', 'g', 'meat'),
+    ('Salmon Fillet', 'g', 'meat'), ('Pork Chops', 'kg', 'meat'),
+    ('Tomatoes', 'kg', 'produce'), ('Onions', 'kg', 'produce'), ('Garlic', 'pcs', 'produce'),
+    ('Carrots', 'kg', 'produce'), ('Potatoes', 'kg', 'produce'), ('Spinach', 'g', 'produce'),
+    ('Bananas', 'pcs', 'produce'), ('Apples', 'pcs', 'produce'), ('Lemons', 'pcs', 'produce'),
+    ('Bell Pepper', 'pcs', 'produce'), ('Broccoli', 'g', 'produce'),
+    ('Rice', 'kg', 'pantry'), ('Pasta', 'g', 'pantry'), ('Flour', 'kg', 'pantry'),
+    ('Sugar', 'kg', 'pantry'), ('Olive Oil', 'ml', 'pantry'), ('Canned Tomatoes', 'g', 'pantry'),
+    ('Bread', 'pcs', 'pantry'), ('Oats', 'g', 'pantry'),
+    ('Potato Chips', 'g', 'snacks'), ('Orange Juice', 'l', 'beverages'), ('Coffee Beans', 'g', 'coffee'),
+    ('Dish Soap', 'ml', 'cleaning'), ('Paper Towels', 'pcs', 'cleaning'),
+]
+UNIT_SPELLINGS = {'pcs': ['pcs', 'piece', 'pieces'], 'g': ['g', 'grams'], 'kg': ['kg', 'kilo'],
+                  'l': ['l', 'liter'], 'ml': ['ml', 'milliliters']}
+CATEGORIES = {name: category for name, _, category in PRODUCTS}
+
+
+def make_inventory(rows, distinct, seed=0):
+    """Return ``rows`` inventory rows drawn from ``distinct`` products.
+
+    Beyond the base product list, extra products are brand variants
+    ('Brand 7 Pasta'), so larger inventories also have more distinct items.
+    """
+    rng = random.Random(seed)
+    products = []
+    for i in range(distinct):
+        name, unit, category = PRODUCTS[i % len(PRODUCTS)]
+        if i >= len(PRODUCTS):
+            name = f"Brand {i // len(PRODUCTS)} {name}"
+        products.append((name, unit))
+    start = datetime(2024, 1, 1)
+    inventory = []
+    for i in range(rows):
+        name, unit = products[rng.randrange(len(products))]
+        inventory.append({
+            '_id': f"{i:024x}",
+            'name': rng.choice([name, name.upper(), f" {name} "]),
+            'quantity': rng.choice([1, 2, 0.5, 1.5, 250, 500]),
+            'unit': rng.choice(UNIT_SPELLINGS.get(unit, [unit])),
+            'date_added': start + timedelta(hours=rng.randrange(24 * 365)),
+        })
+    return inventory
+
+
+def category_of(name):
+    for product, category in CATEGORIES.items():
+        if name.lower().endswith(product.lower()):
+            return category
+    return 'other'
+
+
+def old_prompt(inventory_items):
+    """The inventory text get_recipes used to send: bullets plus a summary."""
+    bullets = [f"- {item['quantity']} {item['unit']} of {item['name']}" for item in inventory_items]
+    summary = [f"{item['quantity']} {item['unit']} of {item['name']}" for item in inventory_items]
+    return "\n".join(bullets) + f"\n\nAvailable ingredients summary: {', '.join(summary)}"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--budget', type=int, default=prompt_builder.DEFAULT_TOKEN_BUDGET)
+    args = arg_parser.parse_args()
+
+    counting = 'tiktoken' if prompt_builder.tiktoken is not None else 'estimated, tiktoken not installed'
+    print(f"Token budget {args.budget} ({counting})\n")
+    print(f"{'rows':>6} {'old tokens':>11} {'new tokens':>11} {'saved':>7} "
+          f"{'items':>6} {'listed':>7} {'omitted':>8} {'build ms':>9}")
+    for rows, distinct in ((50, 30), (500, 120), (5000, 600)):
+        inventory = make_inventory(rows, distinct)
+        old_tokens = prompt_builder.estimate_tokens(old_prompt(inventory))
+        started = time.perf_counter()
+        _, stats = prompt_builder.build_inventory_prompt(inventory, args.budget, category_of)
+        elapsed = (time.perf_counter() - started) * 1000
+        saved = 1 - stats['tokens'] / old_tokens
+        print(f"{rows:>6} {old_tokens:>11} {stats['tokens']:>11} {saved:>6.0%} "
+              f"{stats['items']:>6} {stats['included']:>7} {stats['omitted']:>8} {elapsed:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark the receipt line helpers against their previous implementations.
+
+Runs should_ignore_line, clean_item_name and extract_quantity over
+thousands of synthetic receipt lines, checks the results match the old
+per-call pattern loops, and reports lines/second for both. extract_quantity
+is allowed to differ now that it is case-insensitive and skips product
+codes; the changed answers are counted instead.
+
+Usage:
+    python benchmarks/bench_receipt_lines.py [line_count]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/benchmark')
+
+import app  # noqa: E402
+
+
+def legacy_should_ignore_line(line):
+    line = line.lower().strip()
+    return any(re.search(pattern, line, re.IGNORECASE) for pattern in app.IGNORE_PATTERNS)
+
+
+def legacy_extract_quantity(text):
+    qty_patterns = [
+        r'(\d+(?:\.\d+)?)\s*(?:x|X|\*)',
+        r'(\d+(?:\.\d+)?)\s*(?:pc|pcs|piece|pieces|count|ct)',
+        r'(\d+(?:\.\d+)?)\s*(?:kg|g|l|ml|oz|lb|lbs)',
+        r'^(\d+(?:\.\d+)?)\s'
+    ]
+    for pattern in qty_patterns:
+        match = re.search(pattern, text)
+        if match:
+            return float(match.group(1))
+    return 1.0
+
+
+def legacy_clean_item_name(text):
+    code_match = re.search(r'(\d{12})', text)
+    if code_match and app.PRODUCT_NAMES.get(code_match.group(1)):
+        return app.PRODUCT_NAMES[code_match.group(1)]
+    artifacts = [
+        r'\d{12,}',
+        r'\d+\s*[xX]\s*',
+        r'\$\d+\.\d{2}',
+        r'\b(?:F|N)\b',
+        r'\b(?:pc|pcs|piece|pieces|count|ct)\b',
+        r'\b(?:kg|g|l|ml|oz|lb|lbs)\b',
+    ]
+    cleaned = text
+    for pattern in artifacts:
+        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    return ' '.join(cleaned.split()).strip()
+
+
+ITEM_WORDS = ['GV', 'PNT', 'BUTTR', 'CHNK', 'CHKN', 'MILK', 'EGGS', 'BREAD', 'ORG',
+              'BANANA', 'TORTILLA', 'SALSA', 'RICE', 'FROZEN', 'PIZZA', 'YOGURT']
+NOISE_LINES = [
+    'SUBTOTAL 46.04', 'TAX 1 7.000 % 0.26', 'TOTAL 46.30', 'DEBIT TEND 46.30',
+    'CHANGE DUE 0.00', 'EFT DEBIT PAY FROM PRIMARY', 'ACCOUNT : 5259',
+    'REF # 131000195280', 'NETWORK ID. 0071 APPR CODE 297664', '11/06/11 02:21:54',
+    '# ITEMS SOLD 13', 'Save money. Live better.', 'Manager COLLEEN BRICKEY',
+    '8885 N FLORIDA AVE', 'tampa, fl 33604', 'TEL: (813) 932-0562', '2.88',
+    'ST# 5221 OP# 00001061 TE# 06 TR# 05332', 'Walmart © 2011',
+]
+
+
+def synthetic_lines(count, seed=42):
+    rng = random.Random(seed)
+    codes = list(app.PRODUCT_NAMES) + ['%012d' % rng.randrange(10 ** 12) for _ in range(20)]
+    lines = []
+    for _ in range(count):
+        if rng.random() < 0.4:
+            lines.append(rng.choice(NOISE_LINES))
+            continue
+        name = ' '.join(rng.sample(ITEM_WORDS, rng.randint(1, 3)))
+        quantity = rng.choice(['', '2 X ', '3 x ', '12 CT ', '1.5 lb ', '500g ', '4 pcs '])
+        flag = rng.choice(['F', 'N', 'X', 'O', ''])
+        lines.append(f"{quantity}{name} {rng.choice(codes)} {flag} ${rng.uniform(0.5, 30):.2f} {rng.choice('NXO')}")
+    return lines
+
+
+def rate(fn, lines, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in lines:
+            fn(line)
+        best = min(best, time.perf_counter() - started)
+    return len(lines) / best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lines = synthetic_lines(count)
+
+    pairs = [
+        ('should_ignore_line', legacy_should_ignore_line, app.should_ignore_line, False),
+        ('clean_item_name', legacy_clean_item_name, app.clean_item_name, False),
+        ('extract_quantity', legacy_extract_quantity, app.extract_quantity, True),
+    ]
+    print(f"{count} synthetic receipt lines")
+    print(f"{'helper':20} {'before lines/s':>15} {'after lines/s':>15} {'speedup':>8}")
+    changed = {}
+    for name, legacy, current, may_change in pairs:
+        mismatches = [line for line in lines if legacy(line) != current(line)]
+        if may_change:
+            changed[name] = mismatches
+        elif mismatches:
+            raise SystemExit(f"{name} differs from the old implementation on: {mismatches[:3]}")
+        before, after = rate(legacy, lines), rate(current, lines)
+        print(f"{name:20} {before:15,.0f} {after:15,.0f} {after / before:7.1f}x")
+    for name, mismatches in changed.items():
+        print(f"{name}: {len(mismatches)} answers changed, e.g. {mismatches[:2]}")
+
+    labels = {}
+    for line in lines:
+        label = app.classify_receipt_line(line)
+        labels[label] = labels.get(label, 0) + 1
+    print(f"classify_receipt_line: {rate(app.classify_receipt_line, lines):,.0f} lines/s, labels {labels}")
+
+
+if __name__ == '__main__':
+    main()
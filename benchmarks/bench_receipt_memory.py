@@ -0,0 +1,117 @@
+"""Benchmark per-request memory of the receipt ingestion path.
+
+Compares the old flow (upload spooled by werkzeug, saved under the upload
+folder, read back into bytes, decoded at full size in colour) with the
+current flow (upload spooled as the app does it, read once into a
+memoryview via read_upload, decoded straight to grayscale). Each mode runs in a fresh
+interpreter so peak RSS is not shared between them.
+
+Usage:
+    python benchmarks/bench_receipt_memory.py [image]
+"""
+import base64
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import receipt_images  # noqa: E402
+
+# Werkzeug's default spool threshold before rolling an upload to a temp file
+SPOOL_MAX_SIZE = 500 * 1024
+# The app's UPLOAD_SPOOL_SIZE default
+APP_SPOOL_SIZE = 1024 * 1024
+
+
+def peak_rss_kib():
+    """Peak RSS of this process; VmHWM is reset on exec unlike ru_maxrss."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def disk_flow(payload):
+    # The old flow decoded the full-size colour image before converting
+    from PIL import JpegImagePlugin
+    JpegImagePlugin.JpegImageFile.draft = lambda self, mode, size: None
+
+    upload_dir = tempfile.mkdtemp()
+    try:
+        stream = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        stream.write(payload)
+        stream.seek(0)
+        filepath = os.path.join(upload_dir, 'receipt.jpg')
+        with open(filepath, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        with open(filepath, 'rb') as f:
+            image_bytes = f.read()
+        processed, _ = receipt_images.preprocess_receipt_image(image_bytes)
+        return base64.b64encode(processed).decode('utf-8')
+    finally:
+        shutil.rmtree(upload_dir)
+
+
+def memory_flow(payload):
+    stream = tempfile.SpooledTemporaryFile(max_size=APP_SPOOL_SIZE)
+    stream.write(payload)
+    stream.seek(0)
+    image_bytes = receipt_images.read_upload(stream)
+    processed, _ = receipt_images.preprocess_receipt_image(image_bytes)
+    encoded = base64.b64encode(processed).decode('utf-8')
+    image_bytes.release()
+    return encoded
+
+
+def run_mode(mode, payload_path):
+    with open(payload_path, 'rb') as f:
+        payload = f.read()
+    flow = disk_flow if mode == 'disk' else memory_flow
+
+    baseline_rss = peak_rss_kib()
+    tracemalloc.start()
+    started = time.perf_counter()
+    flow(payload)
+    elapsed = (time.perf_counter() - started) * 1000
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = peak_rss_kib() - baseline_rss
+
+    print(f"{mode:8} upload={len(payload) / 1024:8.0f} KiB  "
+          f"python_peak={python_peak / 1024:8.0f} KiB  "
+          f"rss_growth={rss_growth:8d} KiB  time={elapsed:7.1f} ms")
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], sys.argv[3])
+        return
+
+    if len(sys.argv) > 1:
+        image_path = sys.argv[1]
+    else:
+        image_path = os.path.join(ROOT, 'static', 'uploads', 'Screenshot_2025-03-31_at_5.14.59_PM.png')
+
+    from bench_receipt_preprocess import phone_photo
+
+    with tempfile.NamedTemporaryFile(suffix='.jpg') as payload_file:
+        payload_file.write(phone_photo(image_path))
+        payload_file.flush()
+        for mode in ('disk', 'memory'):
+            subprocess.run([sys.executable, __file__, '--mode', mode, payload_file.name], check=True)
+
+
+if __name__ == '__main__':
+    main()
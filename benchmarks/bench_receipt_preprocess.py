@@ -0,0 +1,96 @@
+"""Benchmark receipt image preprocessing.
+
+Reports payload size, estimated Vision image tokens and estimated upload
+time before and after preprocessing, plus the preprocessing latency itself.
+Fails if preprocessing raises the estimated token count of any sample.
+
+Usage:
+    python benchmarks/bench_receipt_preprocess.py [image ...]
+
+With no arguments it runs on the sample receipts in static/uploads and on a
+synthetic 12MP phone photo built from them.
+"""
+import base64
+import glob
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import receipt_images  # noqa: E402
+
+UPLINK_MBPS = 10
+RUNS = 5
+
+
+def phone_photo(receipt_path):
+    """Simulate a 12MP photo of a receipt lying on a dark counter."""
+    canvas = Image.new('RGB', (3024, 4032), (60, 50, 45))
+    with Image.open(receipt_path) as receipt:
+        receipt = receipt.convert('RGB')
+        scale = min(1800 / receipt.width, 3400 / receipt.height)
+        receipt = receipt.resize((int(receipt.width * scale), int(receipt.height * scale)))
+        canvas.paste(receipt, ((3024 - receipt.width) // 2, (4032 - receipt.height) // 2))
+    output = io.BytesIO()
+    canvas.save(output, format='JPEG', quality=95)
+    return output.getvalue()
+
+
+def describe(image_bytes):
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+    encoded = len(base64.b64encode(image_bytes))
+    return {
+        'bytes': len(image_bytes),
+        'base64': encoded,
+        'size': f"{width}x{height}",
+        'tokens': receipt_images.estimate_vision_tokens(width, height),
+        'upload_ms': encoded * 8 / (UPLINK_MBPS * 1000),
+    }
+
+
+def bench(label, image_bytes):
+    before = describe(image_bytes)
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        processed, mime_type = receipt_images.preprocess_receipt_image(image_bytes)
+        timings.append((time.perf_counter() - started) * 1000)
+    after = describe(processed)
+
+    print(f"\n{label} -> {mime_type}")
+    print(f"  {'':10} {'before':>12} {'after':>12}")
+    for key in ('size', 'bytes', 'base64', 'tokens', 'upload_ms'):
+        b, a = before[key], after[key]
+        if isinstance(b, float):
+            b, a = f"{b:.1f}", f"{a:.1f}"
+        print(f"  {key:10} {b:>12} {a:>12}")
+    print(f"  preprocess {min(timings):.1f} ms (best of {RUNS})")
+    assert after['tokens'] <= before['tokens'], \
+        f"{label}: preprocessing raised estimated tokens from {before['tokens']} to {after['tokens']}"
+
+
+def main():
+    paths = sys.argv[1:]
+    samples = []
+    if not paths:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = sorted(glob.glob(os.path.join(root, 'static', 'uploads', '*.png')) +
+                       glob.glob(os.path.join(root, 'static', 'uploads', '*.jp*g')))
+        samples = [(f"phone photo of {os.path.basename(p)}", phone_photo(p)) for p in paths]
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            samples.insert(0, (os.path.basename(path), f.read()))
+
+    print(f"Upload estimate assumes a {UPLINK_MBPS} Mbps uplink")
+    for label, image_bytes in samples:
+        bench(label, image_bytes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Check the incremental recipe parser against the old parser and time both.
+
+Every response in benchmarks/recipe_corpus is parsed by the original
+parse_recipe_suggestions, whole and fed in chunks of several sizes to
+recipe_parser, and the results must be identical. Then a large
+multi-recipe response built from the corpus is parsed repeatedly to
+compare throughput.
+
+Usage:
+    python benchmarks/bench_recipe_parser.py [copies]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCH_DIR, 'recipe_corpus')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import recipe_parser  # noqa: E402
+
+
+def legacy_parse_recipe_suggestions(response_text):
+    recipes = []
+    current_recipe = None
+    current_section = None
+
+    lines = response_text.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+
+        if not line:
+            i += 1
+            continue
+
+        if line.lower().startswith('recipe:'):
+            if current_recipe:
+                if current_recipe.get('name') and current_recipe.get('instructions'):
+                    recipes.append(current_recipe)
+
+            current_recipe = {
+                'name': line.replace('Recipe:', '').strip(),
+                'required_ingredients': [],
+                'additional_ingredients': [],
+                'preparation_time': 'Not specified',
+                'instructions': []
+            }
+            current_section = None
+
+        elif current_recipe:
+            lower_line = line.lower()
+
+            if any(header in lower_line for header in ['required ingredients:', 'ingredients from inventory:', 'from your inventory:']):
+                current_section = 'required_ingredients'
+
+            elif any(header in lower_line for header in ['additional ingredients:', 'extra ingredients:', 'other ingredients:']):
+                current_section = 'additional_ingredients'
+
+            elif any(header in lower_line for header in ['preparation time:', 'prep time:', 'cooking time:', 'total time:']):
+                current_recipe['preparation_time'] = line.split(':', 1)[1].strip()
+                current_section = None
+
+            elif any(header in lower_line for header in ['instructions:', 'steps:', 'directions:', 'method:']):
+                current_section = 'instructions'
+
+            elif current_section:
+                if line.startswith(('-', '•', '*')) or re.match(r'^\d+\.?\s', line):
+                    content = re.sub(r'^[-•*\d.]\s*', '', line).strip()
+
+                    if current_section == 'instructions':
+                        if content:
+                            current_recipe['instructions'].append(content)
+                    else:
+                        if content.lower() not in ['none', 'n/a', '-']:
+                            current_recipe[current_section].append(content)
+
+                elif current_section == 'instructions' and line:
+                    current_recipe['instructions'].append(line)
+
+        i += 1
+
+    if current_recipe and current_recipe.get('name') and current_recipe.get('instructions'):
+        recipes.append(current_recipe)
+
+    for recipe in recipes:
+        for section in ['required_ingredients', 'additional_ingredients']:
+            seen = set()
+            recipe[section] = [x for x in recipe[section] if not (x.lower() in seen or seen.add(x.lower()))]
+
+        recipe['instructions'] = [
+            f"{i+1}. {instr.strip()}"
+            for i, instr in enumerate(recipe['instructions'])
+            if instr.strip()
+        ]
+
+        if not recipe['preparation_time'] or recipe['preparation_time'] == 'Not specified':
+            recipe['preparation_time'] = '30-40 minutes'
+
+    return recipes
+
+
+def load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8', newline='') as f:
+            corpus[name] = f.read()
+    return corpus
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def random_chunks(text, rng):
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 40)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def check_corpus(corpus):
+    rng = random.Random(13)
+    for name, text in corpus.items():
+        expected = legacy_parse_recipe_suggestions(text)
+        variants = {'whole': recipe_parser.parse_recipes(text)}
+        for size in (1, 4, 64):
+            variants[f'{size}-char chunks'] = list(recipe_parser.iter_recipes(chunked(text, size)))
+        variants['random chunks'] = list(recipe_parser.iter_recipes(random_chunks(text, rng)))
+        for variant, recipes in variants.items():
+            if recipes != expected:
+                raise SystemExit(f"{name} ({variant}) differs from the old parser:\n{recipes}\n!=\n{expected}")
+        print(f"  {name:28} {len(expected):3} recipes  identical")
+
+
+def rate(fn, text, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        recipes = fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best, len(recipes)
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    corpus = load_corpus()
+    print(f"Regression corpus ({len(corpus)} responses):")
+    check_corpus(corpus)
+
+    text = '\n'.join(corpus.values()) * copies
+    megabytes = len(text.encode('utf-8')) / 1e6
+    print(f"\nLarge response: {megabytes:.1f} MB, {text.count(chr(10)):,} lines")
+    print(f"{'parser':28} {'seconds':>8} {'recipes':>8} {'MB/s':>8} {'speedup':>8}")
+    legacy_time, count = rate(legacy_parse_recipe_suggestions, text)
+    print(f"{'old parser':28} {legacy_time:8.3f} {count:8,} {megabytes / legacy_time:8.1f} {1:7.1f}x")
+    runs = [
+        ('recipe_parser, whole text', recipe_parser.parse_recipes),
+        ('recipe_parser, 16-char feed', lambda t: list(recipe_parser.iter_recipes(chunked(t, 16)))),
+    ]
+    for label, fn in runs:
+        elapsed, count = rate(fn, text)
+        print(f"{label:28} {elapsed:8.3f} {count:8,} {megabytes / elapsed:8.1f} {legacy_time / elapsed:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark converting a million inventory quantities to base units.
+
+Compares a per-item loop (normalize the unit string, look it up, scale
+the quantity, one item at a time) with the unit registry's batch
+conversions: from unit spellings, and from unit codes encoded once
+ahead of time. Both paths must agree on every value.
+
+Usage:
+    python benchmarks/bench_units.py [quantity_count]
+"""
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import units  # noqa: E402
+
+# Spellings as they turn up in inventory rows, including unconvertible ones
+SPELLINGS = ['g', 'G', 'grams', 'kg', 'Kg', 'lb', 'lbs', 'LBS.', 'oz', 'ounces', 'ml', 'l', 'L', 'liters',
+             'gallon', 'gal', 'cups', 'tbsp', 'tsp', 'fl oz', 'pcs', 'pc', 'pieces', 'each', 'ct', 'dozen',
+             'cloves', 'can', 'bunch', '']
+
+
+def legacy_to_base(quantities, unit_spellings):
+    """The per-item path: normalize, look up and scale one quantity at a time."""
+    base = []
+    dimensions = []
+    for quantity, unit in zip(quantities, unit_spellings):
+        symbol = units.REGISTRY.canonical(unit)
+        dimension, factor = units.UNITS.get(symbol, (None, None))[:2]
+        base.append(quantity * factor if factor else math.nan)
+        dimensions.append(dimension)
+    return base, dimensions
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(7)
+    unit_spellings = [rng.choice(SPELLINGS) for _ in range(count)]
+    quantities = np.round(np.random.default_rng(7).uniform(0.1, 20, count), 2)
+    quantity_list = quantities.tolist()
+    print(f"{count:,} quantities in {len(SPELLINGS)} unit spellings\n")
+
+    (before, before_dimensions), before_time = timed(lambda: legacy_to_base(quantity_list, unit_spellings))
+    (after, after_dimensions), after_time = timed(lambda: units.REGISTRY.to_base(quantities, unit_spellings))
+    codes, encode_time = timed(lambda: units.REGISTRY.encode(unit_spellings))
+    (coded, _), coded_time = timed(lambda: units.REGISTRY.to_base(quantities, codes))
+    grams, grams_time = timed(lambda: units.REGISTRY.convert(quantities, codes, 'g'))
+
+    assert np.allclose(before, after, equal_nan=True) and np.array_equal(after, coded, equal_nan=True)
+    assert [units.DIMENSIONS[code] if code != units.UNKNOWN else None for code in after_dimensions.tolist()] \
+        == before_dimensions
+
+    print(f"{'path':<28} {'seconds':>8} {'quantities/s':>14}")
+    for label, seconds in [
+        ('per-item loop', before_time),
+        ('batch from spellings', after_time),
+        ('encode spellings once', encode_time),
+        ('batch from codes', coded_time),
+        ('convert codes to grams', grams_time),
+    ]:
+        print(f"{label:<28} {seconds:>8.3f} {count / seconds:>14,.0f}")
+    print(f"\nbatch from spellings is {before_time / after_time:.1f}x the per-item loop, "
+          f"from codes {before_time / coded_time:.1f}x")
+    print(f"{int(np.isnan(after).sum()):,} quantities had no convertible unit; "
+          f"{int(np.isfinite(grams).sum()):,} were masses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Count Mongo calls per request under dashboard-style polling.
+
+Simulates users polling GET /api/inventory, with one preferences change
+part-way through, and counts every collection call the app makes. The
+run is repeated with the old user loader (an unprojected find_one on
+every request) and with the cached, projected loader, and reports calls
+per request and the user-document bytes read.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017/grocery_bench python benchmarks/bench_user_loader.py
+    python benchmarks/bench_user_loader.py --mongomock   # no server needed
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/benchmark')
+
+import app  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+
+class CountingDB:
+    """Wraps a database and counts calls per (collection, method)."""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = Counter()
+        self.user_bytes = 0
+
+    def __getattr__(self, name):
+        return CountingCollection(self, self._db[name], name)
+
+    __getitem__ = __getattr__
+
+
+class CountingCollection:
+    def __init__(self, counter, collection, name):
+        self._counter = counter
+        self._collection = collection
+        self._name = name
+
+    def __getattr__(self, method):
+        attr = getattr(self._collection, method)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._counter.calls[(self._name, method)] += 1
+            result = attr(*args, **kwargs)
+            if self._name == 'users' and method == 'find_one' and result:
+                self._counter.user_bytes += len(bson.encode(result))
+            return result
+        return call
+
+
+def legacy_load_user(user_id):
+    user_data = app.mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    if user_data:
+        return app.User(user_data)
+    return None
+
+
+def make_users(db, count):
+    user_ids = []
+    for i in range(count):
+        user_id = db.users.insert_one({
+            'username': f'bench-{i}-{time.time_ns()}',
+            'email': f'bench-{i}-{time.time_ns()}@example.com',
+            'password_hash': generate_password_hash('bench', method='pbkdf2:sha256'),
+            'cooking_methods': ['stovetop', 'oven', 'microwave'],
+            'kitchen_tools': ['knife', 'cutting_board', 'pot', 'pan', 'blender'],
+            'preferences': {'dietary': ['vegetarian'], 'spice': 'medium'},
+            'date_created': app.datetime.utcnow(),
+        }).inserted_id
+        db.inventory.insert_many([
+            {'user_id': user_id, 'name': f'Item {n}', 'quantity': 1, 'unit': 'pcs',
+             'category': 'pantry', 'date_added': app.datetime.utcnow()}
+            for n in range(20)
+        ])
+        user_ids.append(user_id)
+    return user_ids
+
+
+def poll(user_ids, polls):
+    """Poll the inventory as each user, changing one user's preferences halfway."""
+    clients = []
+    for user_id in user_ids:
+        client = app.app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session['_user_id'] = str(user_id)
+            flask_session['_fresh'] = True
+        clients.append(client)
+
+    requests = 0
+    for round_number in range(polls):
+        if round_number == polls // 2:
+            response = clients[0].post('/preferences', data={'cooking_methods': ['grill'], 'kitchen_tools': []})
+            assert response.status_code == 302, response.status_code
+            requests += 1
+        for client in clients:
+            response = client.get('/api/inventory')
+            assert response.status_code == 200, response.status_code
+            requests += 1
+    # The preference change must be visible to the next request
+    response = clients[0].get('/preferences')
+    checked = re.findall(rb'value="(\w+)"\s*checked', response.data)
+    assert checked == [b'grill'], checked
+    return requests + 1
+
+
+def run(label, db, user_ids, polls, loader):
+    counting = CountingDB(db)
+    app.mongo.db = counting
+    app.users_cache.clear()
+    app.login_manager.user_loader(loader)
+    try:
+        requests = poll(user_ids, polls)
+    finally:
+        app.mongo.db = db
+    total = sum(counting.calls.values())
+    user_calls = sum(count for (collection, _), count in counting.calls.items() if collection == 'users')
+    print(f"{label:>8} {requests:>9} {total / requests:>14.2f} {user_calls / requests:>15.2f} "
+          f"{counting.user_bytes / requests:>16.0f}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--users', type=int, default=20)
+    arg_parser.add_argument('--polls', type=int, default=50, help='inventory polls per user')
+    arg_parser.add_argument('--mongomock', action='store_true', help='use an in-memory mongomock database')
+    args = arg_parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        db = mongomock.MongoClient()['benchmark']
+    else:
+        db = app.mongo.db
+    user_ids = make_users(db, args.users)
+    cached_loader = app.load_user
+
+    print(f"{args.users} users polling /api/inventory {args.polls} times each\n")
+    print(f"{'loader':>8} {'requests':>9} {'mongo calls/req':>14} {'user reads/req':>15} {'user bytes/req':>16}")
+    try:
+        run('before', db, user_ids, args.polls, legacy_load_user)
+        run('after', db, user_ids, args.polls, cached_loader)
+    finally:
+        if not args.mongomock:
+            db.inventory.delete_many({'user_id': {'$in': user_ids}})
+            db.users.delete_many({'_id': {'$in': user_ids}})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Load test: how many LLM-bound requests one gunicorn worker holds at once.
+
+Starts the fake OpenAI server with a fixed latency, then runs the app
+under a single gunicorn worker twice, once with the sync worker class
+(the old deployment) and once with gevent (the current one). Each run
+registers a fresh user, adds an item and fires ``--concurrency``
+simultaneous POST /chat requests. The report shows how many model calls
+the worker had in flight at once, how many requests finished within the
+client timeout, and the throughput.
+
+Needs gunicorn, gevent and a reachable MongoDB (MONGO_URI, as for the
+app itself); no OpenAI key is used.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017/grocery_bench \\
+        python benchmarks/bench_worker_capacity.py --concurrency 200 --latency 2
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(worker_class, port, concurrency, server, wsgi_app):
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY='fake',
+        OPENAI_BASE_URL=server.base_url,
+        LLM_MAX_CONCURRENCY=str(concurrency),
+        LLM_QUEUE_TIMEOUT='60',
+        RECIPE_PREFETCH_ENABLED='false',
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--workers', '1',
+        '--worker-class', worker_class,
+        '--worker-connections', str(concurrency * 2),
+        '--timeout', '120',
+        '--bind', f'127.0.0.1:{port}',
+        '--log-level', 'warning',
+        wsgi_app,
+    ]
+    # Own process group, so stop_gunicorn can take the worker down with the master
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=5)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    stop_gunicorn(process)
+    raise RuntimeError(f'gunicorn ({worker_class}) did not start on port {port}')
+
+
+def stop_gunicorn(process):
+    os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+
+
+def login(base_url):
+    """Register a throwaway user (which logs it in) and give it an ingredient."""
+    session = requests.Session()
+    name = f'bench-{uuid.uuid4().hex[:12]}'
+    session.post(f'{base_url}/register', data={
+        'username': name, 'email': f'{name}@example.com', 'password': 'bench', 'cooking_methods': ['stovetop']
+    }, timeout=30)
+    response = session.post(f'{base_url}/api/add_item', json={
+        'name': 'Chicken Breast', 'quantity': 1, 'unit': 'kg', 'price': 5
+    }, timeout=30)
+    response.raise_for_status()
+    return session.cookies.get_dict()
+
+
+def fire(base_url, cookies, concurrency, client_timeout):
+    results = []
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def one():
+        start.wait()
+        started = time.perf_counter()
+        try:
+            response = requests.post(f'{base_url}/chat', json={'message': 'Something quick for dinner'},
+                                     cookies=cookies, timeout=client_timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        with lock:
+            results.append((ok, time.perf_counter() - started))
+
+    threads = [threading.Thread(target=one) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def run(worker_class, args, server):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process = start_gunicorn(worker_class, port, args.concurrency, server, args.wsgi)
+    try:
+        cookies = login(base_url)
+        server.reset_counters()
+        results, elapsed = fire(base_url, cookies, args.concurrency, args.client_timeout)
+    finally:
+        stop_gunicorn(process)
+    done = [latency for ok, latency in results if ok]
+    p50 = sorted(done)[len(done) // 2] if done else 0.0
+    print(f"{worker_class:>7} {server.max_in_flight:>10} {len(done):>6}/{args.concurrency:<6} "
+          f"{elapsed:>8.1f}s {len(done) / elapsed:>8.1f} {p50:>8.2f}s")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--concurrency', type=int, default=200, help='simultaneous /chat requests')
+    arg_parser.add_argument('--latency', type=float, default=2.0, help='seconds the fake model takes to answer')
+    arg_parser.add_argument('--client-timeout', type=float, default=None,
+                            help='seconds a client waits for /chat (default: 3x latency)')
+    arg_parser.add_argument('--wsgi', default='wsgi:app', help='gunicorn app to load')
+    args = arg_parser.parse_args()
+    if args.client_timeout is None:
+        args.client_timeout = args.latency * 3
+    if not os.getenv('MONGO_URI'):
+        arg_parser.error('set MONGO_URI to a MongoDB database the benchmark may write users to')
+
+    server = FakeOpenAIServer(latency=args.latency).start()
+    print(f"Fake OpenAI API on {server.base_url}, {args.latency}s per call, "
+          f"clients give up after {args.client_timeout}s\n")
+    print(f"{'worker':>7} {'in flight':>10} {'completed':>13} {'wall':>9} {'req/s':>8} {'p50':>9}")
+    try:
+        for worker_class in ('sync', 'gevent'):
+            run(worker_class, args, server)
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""A local fake of the OpenAI HTTP API for exercising the LLM gateway.
+
+Serves POST /v1/chat/completions (plain and streamed) and POST
+/v1/responses with canned recipe text from benchmarks/recipe_corpus. The
+latency and failure rate can be changed while it runs, and it records
+how many requests were in flight at once.
+
+Run it standalone and point the app at it:
+    python benchmarks/fake_openai.py --port 8099 --latency 2 --fail-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake flask run
+
+or start it in-process with FakeOpenAIServer (see bench_llm_gateway.py).
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recipe_corpus', 'get_recipes_plain.txt')
+
+
+class _Server(ThreadingHTTPServer):
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+
+class FakeOpenAIServer:
+    """Threaded fake API server; adjust ``latency``, ``fail_rate`` and ``fail_next`` at will."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, chunk_size=40):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        # Fail exactly this many upcoming requests with a 500
+        self.fail_next = 0
+        self.chunk_size = chunk_size
+        with open(CORPUS_FILE, encoding='utf-8') as f:
+            self.text = f.read()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._httpd = _Server((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.max_in_flight = 0
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+        return random.random() < self.fail_rate
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                fail = server._enter()
+                try:
+                    time.sleep(server.latency)
+                    if fail:
+                        self._send_json(500, {'error': {'message': 'fake upstream failure', 'type': 'server_error'}})
+                    elif self.path.endswith('/chat/completions'):
+                        if request.get('stream'):
+                            self._stream_chat(request)
+                        else:
+                            self._send_json(200, self._chat(request))
+                    elif self.path.endswith('/responses'):
+                        self._send_json(200, self._response(request))
+                    else:
+                        self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    server._leave()
+
+            def _chat(self, request):
+                return {
+                    'id': f'chatcmpl-{uuid.uuid4().hex}',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'gpt-4o'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': server.text},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {'prompt_tokens': 500, 'completion_tokens': 1500, 'total_tokens': 2000}
+                }
+
+            def _stream_chat(self, request):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+                text = server.text
+                for start in range(0, len(text), server.chunk_size):
+                    chunk = {
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'gpt-4o'),
+                        'choices': [{
+                            'index': 0,
+                            'delta': {'content': text[start:start + server.chunk_size]},
+                            'finish_reason': None
+                        }]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _response(self, request):
+                return {
+                    'id': f'resp_{uuid.uuid4().hex}',
+                    'object': 'response',
+                    'created_at': int(time.time()),
+                    'model': request.get('model', 'gpt-4o'),
+                    'status': 'completed',
+                    'output': [{
+                        'type': 'message',
+                        'id': f'msg_{uuid.uuid4().hex}',
+                        'role': 'assistant',
+                        'status': 'completed',
+                        'content': [{'type': 'output_text', 'text': '[]', 'annotations': []}]
+                    }],
+                    'parallel_tool_calls': False,
+                    'tool_choice': 'auto',
+                    'tools': []
+                }
+
+        return Handler
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8099)
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='seconds before each response')
+    arg_parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered with a 500')
+    args = arg_parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.fail_rate)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
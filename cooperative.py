@@ -0,0 +1,32 @@
+"""Support for serving the app from gevent workers.
+
+gunicorn's gevent worker monkey-patches sockets, locks and sleeps before
+the app is imported, so the OpenAI client, pymongo and the LLM gateway
+all yield to other requests while waiting on the network. A single
+process can then hold hundreds of model calls in flight instead of one
+per sync worker.
+
+What still blocks the event loop is CPU-bound work in C extensions, such
+as decoding and re-encoding receipt photos with Pillow; run_blocking
+moves that onto gevent's pool of real OS threads.
+"""
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:
+    gevent = None
+
+# In-flight LLM calls allowed per process when requests don't pin a thread
+COOPERATIVE_LLM_CONCURRENCY = 256
+
+
+def cooperative():
+    """Return True when running in a monkey-patched gevent worker."""
+    return gevent is not None and monkey.is_module_patched('socket')
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Call ``fn`` on a native thread under gevent, or directly otherwise."""
+    if cooperative():
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
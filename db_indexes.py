@@ -0,0 +1,217 @@
+"""MongoDB index bootstrap and query-plan checks.
+
+INDEXES declares every index the app's queries rely on. ensure_indexes
+creates them (it is idempotent and carries on past a collection whose
+indexes cannot be built, e.g. because of duplicate rows), check_indexes
+reports any that are
+missing, and check_query_plans runs explain() on each query in QUERIES and
+flags any that fall back to a collection scan. Run them with
+``flask ensure-indexes`` and ``flask check-indexes``.
+"""
+import logging
+
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+import inventory_version
+import receipt_cache
+import receipt_jobs
+import recipe_prefetch
+
+logger = logging.getLogger(__name__)
+
+# Indexes per collection: (keys, options). TTL indexes keep the names the
+# app used to create them with, so existing deployments match.
+INDEXES = {
+    'users': [
+        ([('username', ASCENDING)], {'name': 'username_unique', 'unique': True}),
+        ([('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+    ],
+    'inventory': [
+        # _id breaks ties so inventory pages can resume from a cursor
+        ([('user_id', ASCENDING), ('date_added', DESCENDING), ('_id', DESCENDING)], {'name': 'user_date_added_id'}),
+        ([('user_id', ASCENDING), ('name', ASCENDING), ('_id', ASCENDING)], {'name': 'user_name_id'}),
+        ([('user_id', ASCENDING), ('category', ASCENDING), ('date_added', DESCENDING), ('_id', DESCENDING)],
+         {'name': 'user_category_date_added_id'}),
+        # One row per item and unit; rows from before merge keys are left
+        # out until ``flask compact-inventory`` keys them
+        ([('user_id', ASCENDING), ('name_key', ASCENDING), ('unit_key', ASCENDING)],
+         {'name': 'user_name_unit_unique', 'unique': True,
+          'partialFilterExpression': {'name_key': {'$exists': True}}}),
+    ],
+    'inventory_changes': [
+        ([('user_id', ASCENDING), ('version', ASCENDING)], {'name': 'user_version_unique', 'unique': True}),
+        ([('created_at', ASCENDING)], {'name': 'created_at_1', 'expireAfterSeconds': inventory_version.CHANGES_TTL}),
+    ],
+    'receipts': [
+        ([('user_id', ASCENDING), ('upload_date', DESCENDING), ('_id', DESCENDING)], {'name': 'user_upload_date_id'}),
+    ],
+    'recipe_ratings': [
+        ([('user_id', ASCENDING), ('recipe_name', ASCENDING)], {'name': 'user_recipe_unique', 'unique': True}),
+    ],
+    'chat_messages': [
+        ([('user_id', ASCENDING), ('created_at', DESCENDING)], {'name': 'user_created_at'}),
+    ],
+    'receipt_jobs': [
+        ([('user_id', ASCENDING), ('created_at', DESCENDING)], {'name': 'user_created_at'}),
+        ([('created_at', ASCENDING)], {'name': 'created_at_1', 'expireAfterSeconds': receipt_jobs.JOB_TTL}),
+    ],
+    'receipt_cache': [
+        ([('created_at', ASCENDING)], {'name': 'created_at_1', 'expireAfterSeconds': receipt_cache.TTL}),
+    ],
+    'recipe_prefetch_usage': [
+        ([('created_at', ASCENDING)], {'name': 'created_at_1', 'expireAfterSeconds': recipe_prefetch.USAGE_TTL}),
+    ],
+    'request_leases': [
+        # Housekeeping only; lease expiry is also checked explicitly
+        ([('expires_at', ASCENDING)], {'name': 'expires_at_1', 'expireAfterSeconds': 0}),
+    ],
+}
+
+# A sample of every query shape the app issues, for explain():
+# (collection, filter, sort)
+SAMPLE_ID = ObjectId('000000000000000000000000')
+SAMPLE_DATE = datetime(2024, 1, 1)
+NEWEST = [('date_added', DESCENDING), ('_id', DESCENDING)]
+OLDEST = [('date_added', ASCENDING), ('_id', ASCENDING)]
+BY_NAME = [('name', ASCENDING), ('_id', ASCENDING)]
+QUERIES = [
+    ('users', {'_id': SAMPLE_ID}, None),
+    ('users', {'username': 'sample'}, None),
+    ('users', {'$or': [{'username': 'sample'}, {'email': 'sample@example.com'}]}, None),
+    ('inventory', {'user_id': SAMPLE_ID}, None),
+    ('inventory', {'user_id': SAMPLE_ID}, NEWEST),
+    ('inventory', {'user_id': SAMPLE_ID}, BY_NAME),
+    ('inventory', {'user_id': SAMPLE_ID, 'category': 'sample'}, NEWEST),
+    # Paginated inventory: every sort, the q prefix, the added_after /
+    # added_before range, and the keyset-cursor continuation of each sort
+    ('inventory', {'user_id': SAMPLE_ID}, OLDEST),
+    ('inventory', {'user_id': SAMPLE_ID, 'name': {'$regex': '^sample', '$options': 'i'}}, NEWEST),
+    ('inventory', {'user_id': SAMPLE_ID, 'name': {'$regex': '^sample', '$options': 'i'}}, BY_NAME),
+    ('inventory', {'user_id': SAMPLE_ID, 'date_added': {'$gte': SAMPLE_DATE, '$lt': SAMPLE_DATE}}, NEWEST),
+    ('inventory', {'user_id': SAMPLE_ID, 'date_added': {'$gte': SAMPLE_DATE, '$lt': SAMPLE_DATE}}, OLDEST),
+    ('inventory', {'$and': [{'user_id': SAMPLE_ID}, {'$or': [
+        {'date_added': {'$lt': SAMPLE_DATE}},
+        {'date_added': SAMPLE_DATE, '_id': {'$lt': SAMPLE_ID}},
+    ]}]}, NEWEST),
+    ('inventory', {'$and': [{'user_id': SAMPLE_ID}, {'$or': [
+        {'date_added': {'$gt': SAMPLE_DATE}},
+        {'date_added': SAMPLE_DATE, '_id': {'$gt': SAMPLE_ID}},
+    ]}]}, OLDEST),
+    ('inventory', {'$and': [{'user_id': SAMPLE_ID}, {'$or': [
+        {'name': {'$gt': 'sample'}},
+        {'name': 'sample', '_id': {'$gt': SAMPLE_ID}},
+    ]}]}, BY_NAME),
+    ('inventory', {'$and': [{'user_id': SAMPLE_ID, 'category': 'sample'}, {'$or': [
+        {'date_added': {'$lt': SAMPLE_DATE}},
+        {'date_added': SAMPLE_DATE, '_id': {'$lt': SAMPLE_ID}},
+    ]}]}, NEWEST),
+    ('inventory', {'_id': SAMPLE_ID, 'user_id': SAMPLE_ID}, None),
+    ('inventory', {'user_id': SAMPLE_ID, 'name_key': 'sample', 'unit_key': 'pcs'}, None),
+    ('inventory', {'user_id': {'$in': [SAMPLE_ID]}, 'name_key': {'$in': ['sample']}}, None),
+    ('receipts', {'user_id': SAMPLE_ID}, [('upload_date', DESCENDING), ('_id', DESCENDING)]),
+    ('receipts', {'$and': [{'user_id': SAMPLE_ID}, {'$or': [
+        {'upload_date': {'$lt': SAMPLE_DATE}},
+        {'upload_date': SAMPLE_DATE, '_id': {'$lt': SAMPLE_ID}},
+    ]}]}, [('upload_date', DESCENDING), ('_id', DESCENDING)]),
+    ('recipe_ratings', {'user_id': SAMPLE_ID, 'recipe_name': 'sample'}, None),
+    ('chat_messages', {'user_id': SAMPLE_ID}, [('created_at', DESCENDING)]),
+    ('receipt_jobs', {'_id': SAMPLE_ID, 'user_id': SAMPLE_ID}, None),
+    ('receipt_cache', {'_id': 'sample'}, None),
+    ('recipe_pool', {'_id': SAMPLE_ID, 'fingerprint': 'sample'}, None),
+    ('recipe_prefetch_usage', {'_id': 'sample'}, None),
+    ('request_leases', {'_id': 'sample'}, None),
+    ('inventory_versions', {'_id': SAMPLE_ID}, None),
+    ('inventory_changes', {'user_id': SAMPLE_ID, 'version': {'$gt': 0, '$lte': 1}}, [('version', ASCENDING)]),
+    ('inventory', {'_id': {'$in': [SAMPLE_ID]}, 'user_id': SAMPLE_ID}, None),
+]
+
+
+def remove_duplicate_ratings(db):
+    """Keep only the newest rating per user and recipe so the unique index
+    can be built. Returns the number of ratings removed."""
+    duplicates = db.recipe_ratings.aggregate([
+        {'$sort': {'_id': -1}},
+        {'$group': {'_id': {'user_id': '$user_id', 'recipe_name': '$recipe_name'},
+                    'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ])
+    stale = [rating_id for group in duplicates for rating_id in group['ids'][1:]]
+    if not stale:
+        return 0
+    removed = db.recipe_ratings.delete_many({'_id': {'$in': stale}}).deleted_count
+    logger.info(f"Removed {removed} duplicate recipe ratings")
+    return removed
+
+
+def ensure_indexes(db):
+    """Create every declared index.
+
+    Returns ``(names, failures)``: the names of the indexes ensured and one
+    message per collection whose indexes could not be built. Duplicate
+    ratings are removed first; duplicate users are left for an operator
+    to resolve and reported as a failure.
+    """
+    remove_duplicate_ratings(db)
+    created = []
+    failures = []
+    for collection, indexes in INDEXES.items():
+        models = [IndexModel(keys, **options) for keys, options in indexes]
+        try:
+            created.extend(db[collection].create_indexes(models))
+        except OperationFailure as e:
+            logger.error(f"Could not build indexes on {collection}: {e}")
+            failures.append(f"{collection}: {e}")
+            continue
+        logger.info(f"Ensured indexes on {collection}: {[options['name'] for _, options in indexes]}")
+    return created, failures
+
+
+def check_indexes(db):
+    """Return a list of problems with declared indexes (empty when all good)."""
+    problems = []
+    for collection, indexes in INDEXES.items():
+        existing = db[collection].index_information()
+        for keys, options in indexes:
+            info = existing.get(options['name'])
+            if info is None:
+                problems.append(f"{collection}: missing index {options['name']}")
+                continue
+            if [tuple(key) for key in info['key']] != [tuple(key) for key in keys]:
+                problems.append(f"{collection}: index {options['name']} has keys {info['key']}, expected {keys}")
+            if bool(info.get('unique')) != bool(options.get('unique')):
+                problems.append(f"{collection}: index {options['name']} unique={bool(info.get('unique'))}, "
+                                f"expected {bool(options.get('unique'))}")
+            if info.get('expireAfterSeconds') != options.get('expireAfterSeconds'):
+                problems.append(f"{collection}: index {options['name']} expireAfterSeconds="
+                                f"{info.get('expireAfterSeconds')}, expected {options.get('expireAfterSeconds')}")
+    return problems
+
+
+def _stages(plan):
+    """Yield every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def check_query_plans(db):
+    """Explain each query in QUERIES and return those that use a COLLSCAN."""
+    problems = []
+    for collection, query, sort in QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        stages = list(_stages(plan))
+        if 'COLLSCAN' in stages:
+            problems.append(f"{collection}: {query} sort={sort} uses a COLLSCAN ({' > '.join(stages)})")
+    return problems
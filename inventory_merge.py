@@ -0,0 +1,166 @@
+"""Upsert-merge writes for the inventory collection.
+
+Inventory rows are keyed on (user_id, name_key, unit_key). A write for an
+item the user already has adds to its quantity and price with ``$inc``
+instead of inserting a new document.
+
+``name_key`` is the name lowercased with whitespace collapsed and
+``unit_key`` is the unit's canonical symbol in the units registry
+('pieces' and 'pcs' are both 'pcs'); receipt batches are merged on the
+same key before review. Quantities are not converted, so 1 kg and 500 g
+of rice stay two rows. The first write's name, unit and category are
+kept for display. A unique index on the key makes concurrent upserts of
+a new item safe; ``flask compact-inventory`` folds unkeyed or duplicate
+rows.
+"""
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from units import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+def name_key(name):
+    """Return the merge key for an item name."""
+    return ' '.join(str(name).lower().split())
+
+
+def unit_key(unit):
+    """Return the merge key for a unit spelling: its canonical symbol."""
+    return REGISTRY.canonical(unit)
+
+
+def merge_update(document):
+    """Return the UpdateOne that adds ``document`` to the user's inventory."""
+    key = {
+        'user_id': document['user_id'],
+        'name_key': name_key(document['name']),
+        'unit_key': unit_key(document.get('unit')),
+    }
+    on_insert = {
+        field: value for field, value in document.items()
+        if field not in key and field not in ('_id', 'quantity', 'price', 'date_added')
+    }
+    update = {
+        '$inc': {'quantity': document.get('quantity', 0), 'price': document.get('price', 0)},
+        # The latest purchase brings the item back to the top of the list
+        '$max': {'date_added': document['date_added']},
+    }
+    if on_insert:
+        update['$setOnInsert'] = on_insert
+    return UpdateOne(key, update, upsert=True), key
+
+
+def upsert_items(db, documents):
+    """Merge inventory documents into the user's inventory with one bulk write.
+
+    Returns one result per document, in order: ``{'index', 'status':
+    'inserted', 'item_id', 'merged'}`` or ``{'index', 'status': 'error',
+    'error'}``. ``merged`` is true when the item was already in the
+    inventory (or earlier in ``documents``) and its quantity was added to.
+    """
+    if not documents:
+        return []
+
+    requests, keys = zip(*(merge_update(document) for document in documents))
+    results = [{'index': index, 'status': 'inserted', 'merged': True} for index in range(len(documents))]
+    pending = list(range(len(documents)))
+    # An upsert that loses a race to insert the same new item hits the
+    # unique index; by then the row exists, so one retry merges into it
+    for attempt in range(2):
+        try:
+            written = db.inventory.bulk_write([requests[index] for index in pending], ordered=False)
+            upserted = written.upserted_ids
+            retry = []
+        except BulkWriteError as e:
+            upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+            retry = []
+            for error in e.details.get('writeErrors', []):
+                index = pending[error['index']]
+                if error.get('code') == DUPLICATE_KEY and attempt == 0:
+                    retry.append(index)
+                else:
+                    results[index] = {'index': index, 'status': 'error', 'error': error.get('errmsg', 'Write failed')}
+        for position, item_id in upserted.items():
+            results[pending[position]].update(item_id=str(item_id), merged=False)
+        if not retry:
+            break
+        pending = retry
+
+    # Merged rows keep their existing _id; look them up in one query
+    missing = [index for index, result in enumerate(results) if result['status'] == 'inserted' and 'item_id' not in result]
+    if missing:
+        user_ids = {keys[index]['user_id'] for index in missing}
+        ids = {
+            (row['user_id'], row['name_key'], row['unit_key']): str(row['_id'])
+            for row in db.inventory.find(
+                {'user_id': {'$in': list(user_ids)}, 'name_key': {'$in': list({keys[index]['name_key'] for index in missing})}},
+                {'user_id': 1, 'name_key': 1, 'unit_key': 1}
+            )
+        }
+        for index in missing:
+            key = keys[index]
+            results[index]['item_id'] = ids.get((key['user_id'], key['name_key'], key['unit_key']))
+    return results
+
+
+def changed_ids(results):
+    """Split upsert results into (inserted ids, updated ids) for the change log."""
+    inserted = {result['item_id'] for result in results if result['status'] == 'inserted' and not result['merged']}
+    updated = {
+        result['item_id'] for result in results
+        if result['status'] == 'inserted' and result['merged'] and result['item_id'] not in inserted
+    }
+    return sorted(inserted), sorted(updated)
+
+
+def compact(db):
+    """Fold duplicate inventory rows into one row per merge key.
+
+    Rows written before merge keys existed get them; duplicates are summed
+    into the oldest row and deleted. Returns ``(rows_removed, user_ids)``
+    for the users whose inventory changed.
+    """
+    removed = 0
+    changed_users = set()
+    for user_id in db.inventory.distinct('user_id'):
+        groups = {}
+        for row in db.inventory.find(
+            {'user_id': user_id},
+            {'name': 1, 'unit': 1, 'quantity': 1, 'price': 1, 'date_added': 1, 'name_key': 1, 'unit_key': 1}
+        ).sort('_id', 1):
+            groups.setdefault((name_key(row.get('name') or ''), unit_key(row.get('unit'))), []).append(row)
+
+        updates = []
+        duplicates = []
+        for (item_name_key, item_unit_key), group in groups.items():
+            # Keep the row that already has the key, else the oldest
+            keeper = next((row for row in group if 'name_key' in row), group[0])
+            others = [row for row in group if row is not keeper]
+            fields = {'name_key': item_name_key, 'unit_key': item_unit_key}
+            if others:
+                fields['quantity'] = sum(row.get('quantity') or 0 for row in group)
+                fields['price'] = round(sum(row.get('price') or 0 for row in group), 2)
+                dates = [row['date_added'] for row in group if row.get('date_added')]
+                if dates:
+                    fields['date_added'] = max(dates)
+                duplicates.extend(row['_id'] for row in others)
+            elif keeper.get('name_key') == item_name_key and keeper.get('unit_key') == item_unit_key:
+                continue
+            updates.append(UpdateOne({'_id': keeper['_id']}, {'$set': fields}))
+
+        if not updates:
+            continue
+        # Delete duplicates before keying the keeper so the unique index never trips
+        if duplicates:
+            db.inventory.delete_many({'_id': {'$in': duplicates}})
+        db.inventory.bulk_write(updates, ordered=False)
+        removed += len(duplicates)
+        changed_users.add(user_id)
+        logger.info(f"Compacted inventory for user {user_id}: {len(duplicates)} duplicate rows folded")
+    return removed, changed_users
@@ -0,0 +1,125 @@
+"""Per-user inventory versions and change log.
+
+Every inventory mutation bumps the user's counter in the
+``inventory_versions`` collection with a single atomic ``$inc``. List and
+recipe responses carry an ETag built from the counter, so a client
+revalidating with If-None-Match can be answered 304 after one primary-key
+lookup, without running the inventory query.
+
+Each bump also appends an entry to ``inventory_changes`` naming the item
+ids inserted, updated and deleted at that version. A client holding
+version N asks for ``changes_since(N)`` and patches its list instead of
+refetching it. Entries expire through a TTL index; a client whose version
+is older than the log, or whose range has a gap, is told to reload.
+
+Read the version before querying the inventory: if a mutation lands in
+between, the response pairs new rows with the old tag and the next
+request simply refetches, never the other way round.
+"""
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Seconds a change log entry is kept
+CHANGES_TTL = 7 * 24 * 3600
+
+# Past this many changed ids a full reload is cheaper than the delta
+MAX_CHANGED_IDS = 500
+
+
+def current(db, user_id):
+    """Return the user's inventory version (0 before the first change)."""
+    counter = db.inventory_versions.find_one({'_id': ObjectId(user_id)}, {'version': 1})
+    return counter['version'] if counter else 0
+
+
+def bump(db, user_id, inserted=(), updated=(), deleted=(), reset=False):
+    """Record a change to the user's inventory and return the new version.
+
+    ``inserted``, ``updated`` and ``deleted`` are the item ids touched;
+    pass ``reset=True`` for bulk changes clients should reload for.
+    """
+    try:
+        counter = db.inventory_versions.find_one_and_update(
+            {'_id': ObjectId(user_id)},
+            {'$inc': {'version': 1}},
+            projection={'version': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except PyMongoError as e:
+        # A missed bump would let clients keep stale pages, so make it loud
+        logger.error(f"Could not bump inventory version for user {user_id}: {str(e)}")
+        raise
+    try:
+        db.inventory_changes.insert_one({
+            'user_id': ObjectId(user_id),
+            'version': counter['version'],
+            'inserted': [str(item_id) for item_id in inserted],
+            'updated': [str(item_id) for item_id in updated],
+            'deleted': [str(item_id) for item_id in deleted],
+            'reset': reset,
+            'created_at': datetime.utcnow()
+        })
+    except PyMongoError as e:
+        # The gap makes changes_since answer reset, so clients still converge
+        logger.warning(f"Could not log inventory change for user {user_id}: {str(e)}")
+    return counter['version']
+
+
+def changes_since(db, user_id, since, version):
+    """Return the net change to a user's inventory from ``since`` to ``version``.
+
+    The result is ``{'inserted', 'updated', 'deleted', 'reset'}`` with id
+    lists; an item added and removed within the range is left out. When
+    ``reset`` is true the lists are empty and the client must reload.
+    """
+    delta = {'inserted': [], 'updated': [], 'deleted': [], 'reset': False}
+    if since == version:
+        return delta
+    if since > version:
+        delta['reset'] = True
+        return delta
+
+    states = {}
+    expected = since + 1
+    for entry in db.inventory_changes.find(
+        {'user_id': ObjectId(user_id), 'version': {'$gt': since, '$lte': version}}
+    ).sort('version', 1):
+        # A missing version expired, failed to log or is still being written
+        if entry['version'] != expected or entry.get('reset'):
+            break
+        expected += 1
+        for item_id in entry['inserted']:
+            states[item_id] = 'updated' if states.get(item_id) == 'deleted' else 'inserted'
+        for item_id in entry['updated']:
+            if states.get(item_id) != 'inserted':
+                states[item_id] = 'updated'
+        for item_id in entry['deleted']:
+            if states.get(item_id) == 'inserted':
+                del states[item_id]
+            else:
+                states[item_id] = 'deleted'
+        if len(states) > MAX_CHANGED_IDS:
+            break
+
+    if expected != version + 1 or len(states) > MAX_CHANGED_IDS:
+        delta['reset'] = True
+        return delta
+    for item_id, state in states.items():
+        delta[state].append(item_id)
+    return delta
+
+
+def etag(kind, user_id, *versions):
+    """Return the ETag for a ``kind`` of response at the given versions.
+
+    The user id is part of the tag so a browser shared by two accounts
+    never revalidates one user's cached page as the other's.
+    """
+    return '-'.join([kind, str(user_id)] + [str(version) for version in versions])
@@ -0,0 +1,103 @@
+"""Token-level Aho-Corasick index for keyword tables.
+
+Used for tables such as GROCERY_CATEGORIES and UNIT_PATTERNS, which map a
+label to keywords that may span several words ('peanut butter',
+'pnt buttr'). Text is matched on whole tokens, not substrings, so the 'g'
+unit no longer matches every word containing a g. The automaton is built
+once, and a text is labelled in a single pass over its tokens.
+
+When several keywords match, the one with the most tokens wins, and ties
+go to the label listed first in the table.
+"""
+import re
+from functools import lru_cache
+
+TOKEN_REGEX = re.compile(r'[a-z]+|\d+')
+
+
+@lru_cache(maxsize=65536)
+def normalize_token(token):
+    """Fold simple plurals so 'tomatoes' matches 'tomato' and 'eggs' 'egg'."""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 4 and token.endswith('oes'):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Split text into normalized lowercase word and number tokens."""
+    return [normalize_token(token) for token in TOKEN_REGEX.findall(text.lower())]
+
+
+class KeywordIndex:
+    """Matches texts against a ``{label: [keyword, ...]}`` table."""
+
+    def __init__(self, table):
+        self._goto = [{}]
+        self._fail = [0]
+        # Best (rank, label) among keywords ending at each node, where a
+        # lower rank is better: more tokens first, then table order
+        self._output = [None]
+
+        priority = 0
+        for label, keywords in table.items():
+            for keyword in keywords:
+                tokens = tokenize(keyword)
+                if not tokens:
+                    continue
+                node = 0
+                for token in tokens:
+                    if token not in self._goto[node]:
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output.append(None)
+                        self._goto[node][token] = len(self._goto) - 1
+                    node = self._goto[node][token]
+                candidate = ((-len(tokens), priority), label)
+                if self._output[node] is None or candidate[0] < self._output[node][0]:
+                    self._output[node] = candidate
+                priority += 1
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        while queue:
+            next_queue = []
+            for node in queue:
+                for token, child in self._goto[node].items():
+                    fallback = self._fail[node]
+                    while fallback and token not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[child] = self._goto[fallback].get(token, 0)
+                    # Keywords ending at the failure node also end here
+                    inherited = self._output[self._fail[child]]
+                    if inherited and (self._output[child] is None or inherited[0] < self._output[child][0]):
+                        self._output[child] = inherited
+                    next_queue.append(child)
+            queue = next_queue
+
+    def match_tokens(self, tokens, default=None):
+        """Return the best label for an already tokenized text."""
+        best = None
+        node = 0
+        for token in tokens:
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            output = self._output[node]
+            if output and (best is None or output[0] < best[0]):
+                best = output
+        return best[1] if best else default
+
+    def match(self, text, default=None):
+        """Return the best label for a text, or ``default`` if nothing matches."""
+        return self.match_tokens(tokenize(text), default)
+
+    def match_many(self, texts, default=None):
+        """Label a batch of texts in one call."""
+        match_tokens = self.match_tokens
+        return [match_tokens(tokenize(text), default) for text in texts]
@@ -0,0 +1,228 @@
+"""Single entry point for every OpenAI call the app makes.
+
+All calls share one client, so they share its HTTP connection pool. Each
+call names its route, which selects a timeout from ROUTE_TIMEOUTS. The
+gateway then adds the same policy to every call:
+
+* a process-wide semaphore caps in-flight calls, so a slow upstream can
+  hold at most ``max_concurrency`` threads; callers that can't get a slot
+  within ``queue_timeout`` fail fast;
+* transient failures (timeouts, connection errors, 429s and 5xx) are
+  retried with jittered exponential backoff;
+* a circuit breaker opens after ``failure_threshold`` consecutive failed
+  calls and rejects calls for ``reset_timeout`` seconds, then lets one
+  trial call through before closing again.
+
+Rejected calls raise LLMUnavailableError, which routes turn into a 503.
+The client honours OPENAI_BASE_URL, so the gateway can be pointed at a
+local fake server (see benchmarks/fake_openai.py).
+"""
+import logging
+import random
+import threading
+import time
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a response, by route
+ROUTE_TIMEOUTS = {
+    'receipt': 60.0,
+    'recipes': 90.0,
+    'single_recipe': 30.0,
+    'recipe_prefetch': 120.0,
+    'chat': 45.0,
+    'refresh_recipe': 30.0,
+    'suggested_recipes': 45.0,
+    'chat_recipes': 45.0,
+}
+DEFAULT_TIMEOUT = 60.0
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_QUEUE_TIMEOUT = 5.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+class LLMUnavailableError(Exception):
+    """Raised when a call is rejected by the circuit breaker or the semaphore."""
+
+
+class CircuitBreaker:
+    """Counts consecutive upstream failures and short-circuits calls while open."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Return True if a call may go ahead now."""
+        with self._lock:
+            if self._state == BREAKER_OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = BREAKER_HALF_OPEN
+            if self._state == BREAKER_HALF_OPEN:
+                # Only one trial call at a time while half open
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != BREAKER_OPEN:
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that neither succeeded nor failed upstream."""
+        with self._lock:
+            self._trial_running = False
+
+
+class LLMGateway:
+    """Wraps an OpenAI client with timeouts, retries, a semaphore and a breaker."""
+
+    def __init__(self, client, max_concurrency=DEFAULT_MAX_CONCURRENCY, queue_timeout=DEFAULT_QUEUE_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, timeouts=None):
+        # Retries are done here, with jitter, rather than by the client
+        self.client = client.with_options(max_retries=0)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = dict(ROUTE_TIMEOUTS, **(timeouts or {}))
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'retries': 0, 'rejected': 0, 'in_flight': 0}
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            self._stats[field] += amount
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number ``attempt`` (starting at 1)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _acquire(self, route):
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise LLMUnavailableError('The recipe assistant is temporarily unavailable, please try again shortly')
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            self.breaker.release()
+            self._count('rejected')
+            logger.warning(f"LLM call for {route} rejected: {self.max_concurrency} calls already in flight")
+            raise LLMUnavailableError('The recipe assistant is busy, please try again shortly')
+        self._count('in_flight')
+
+    def _release(self):
+        self._count('in_flight', -1)
+        self._semaphore.release()
+
+    def _with_retries(self, route, fn):
+        """Run ``fn(client)``, retrying transient failures, and feed the breaker."""
+        client = self.client.with_options(timeout=self.timeouts.get(route, DEFAULT_TIMEOUT))
+        attempt = 0
+        while True:
+            self._count('calls')
+            started = time.perf_counter()
+            try:
+                result = fn(client)
+            except RETRYABLE_ERRORS as e:
+                self._count('failures')
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    logger.error(f"LLM call for {route} failed after {attempt + 1} attempts: {str(e)}")
+                    raise
+                attempt += 1
+                delay = self.backoff(attempt)
+                self._count('retries')
+                logger.warning(f"LLM call for {route} failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            except Exception:
+                # Bad requests etc. say nothing about upstream health
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            logger.info(f"LLM call for {route} answered in {time.perf_counter() - started:.2f}s")
+            return result
+
+    def _call(self, route, fn):
+        self._acquire(route)
+        try:
+            return self._with_retries(route, fn)
+        finally:
+            self._release()
+
+    def chat(self, route, **kwargs):
+        """Create a chat completion."""
+        return self._call(route, lambda client: client.chat.completions.create(**kwargs))
+
+    def respond(self, route, **kwargs):
+        """Create a response with the Responses API."""
+        return self._call(route, lambda client: client.responses.create(**kwargs))
+
+    def chat_stream(self, route, **kwargs):
+        """Yield the chunks of a streamed chat completion.
+
+        Opening the stream is retried like any other call; a failure after
+        chunks have been yielded is raised to the caller. The concurrency
+        slot is held until the stream is exhausted or closed.
+        """
+        self._acquire(route)
+        try:
+            stream = self._with_retries(route, lambda client: client.chat.completions.create(stream=True, **kwargs))
+            try:
+                yield from stream
+            except RETRYABLE_ERRORS:
+                self._count('failures')
+                self.breaker.record_failure()
+                raise
+        finally:
+            self._release()
+
+    def stats(self):
+        """Return call counters and the breaker state for this process."""
+        with self._lock:
+            return dict(self._stats, breaker=self.breaker.state, max_concurrency=self.max_concurrency)
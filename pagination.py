@@ -0,0 +1,83 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+A page is read with the sort keys of the previous page's last document:
+``(date_added, _id) < (last date, last id)`` for newest-first, and so on.
+Unlike skip/limit, every page is an index range scan, however deep the
+user has scrolled, and rows added meanwhile don't shift later pages.
+
+Cursors are opaque to clients: URL-safe base64 of the sort name and the
+last document's sort values, in MongoDB extended JSON so dates and
+ObjectIds survive the round trip.
+"""
+import base64
+import binascii
+import json
+
+from bson import json_util
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed cursor, limit or list filter; routes answer 400."""
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Return the page size requested in ``value``, capped at ``maximum``."""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be a number')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def encode_cursor(sort_name, sort, document):
+    """Return the cursor that continues after ``document``."""
+    values = [document.get(field) for field, _ in sort]
+    payload = json_util.dumps({'sort': sort_name, 'after': values})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_name):
+    """Return the sort values encoded in ``cursor``, which must be for ``sort_name``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError, json.JSONDecodeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(payload, dict) or payload.get('sort') != sort_name or not isinstance(payload.get('after'), list):
+        raise PaginationError('Cursor does not match the requested sort')
+    return payload['after']
+
+
+def after_filter(sort, values):
+    """Return a filter matching documents that sort after ``values``."""
+    if len(values) != len(sort):
+        raise PaginationError('Cursor does not match the requested sort')
+    branches = []
+    for index, (field, direction) in enumerate(sort):
+        branch = {sort[i][0]: values[i] for i in range(index)}
+        branch[field] = {'$gt' if direction > 0 else '$lt': values[index]}
+        branches.append(branch)
+    return {'$or': branches}
+
+
+def fetch_page(collection, query, sort_name, sort, limit, projection=None, cursor=None):
+    """Return ``(documents, next_cursor)`` for one page of ``query``.
+
+    ``sort`` is a list of ``(field, direction)`` ending with ``_id`` so the
+    order is total. ``next_cursor`` is None on the last page.
+    """
+    if cursor:
+        query = {'$and': [query, after_filter(sort, decode_cursor(cursor, sort_name))]}
+    # One extra document tells us whether there is a next page
+    documents = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(sort_name, sort, documents[-1])
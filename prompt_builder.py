@@ -0,0 +1,156 @@
+"""Compact inventory text for LLM prompts.
+
+build_inventory_prompt merges rows with the same normalized name and a
+compatible unit (500 g and 1 kg of rice are 1500 g), orders the result so
+the most useful ingredients (must-use items, then fresh food, then the
+most recently bought) come first, and stops adding items once the token
+budget is reached.
+"""
+import math
+from datetime import datetime
+
+from keyword_index import tokenize
+from units import REGISTRY, UNKNOWN
+
+try:
+    # Exact token counts when tiktoken is installed, otherwise ~4 chars/token
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_TOKEN_BUDGET = 1200
+
+# Lower sorts first; categories as returned by identify_category
+CATEGORY_PRIORITY = {
+    'meat': 0,
+    'produce': 0,
+    'dairy': 1,
+    'pantry': 2,
+    'other': 2,
+    'snacks': 3,
+    'beverages': 3,
+    'coffee': 4,
+}
+# Categories that are never ingredients
+NON_FOOD_CATEGORIES = {'cleaning'}
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Return the number of prompt tokens in text (estimated without tiktoken)."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.get_encoding('o200k_base')
+            except Exception:
+                _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def normalize_name(name):
+    tokens = tokenize(name or '')
+    return ' '.join(tokens) if tokens else (name or '').strip().lower()
+
+
+def merge_inventory(inventory_items):
+    """Merge rows with the same normalized name and unit dimension, summing quantities.
+
+    Quantities in convertible units are added up in base units and given
+    in the unit first seen for the item; other units merge only with
+    themselves. Returns dicts with ``name`` (as first seen), ``quantity``,
+    ``unit``, ``ids`` (the merged row ids) and ``last_added``.
+    """
+    units = [item.get('unit') for item in inventory_items]
+    codes = REGISTRY.encode(units)
+    base, dimension_codes = REGISTRY.to_base([item.get('quantity') or 0 for item in inventory_items], codes)
+
+    merged = {}
+    for item, unit, code, item_base, dimension_code in zip(
+            inventory_items, units, codes.tolist(), base.tolist(), dimension_codes.tolist()):
+        symbol = REGISTRY.symbol(code) or REGISTRY.canonical(unit)
+        key = (normalize_name(item.get('name')), dimension_code if dimension_code != UNKNOWN else symbol)
+        added = item.get('date_added') or item.get('added_date') or datetime.min
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = {
+                'name': (item.get('name') or '').strip(),
+                'quantity': item.get('quantity') or 0,
+                'unit': symbol,
+                'ids': {str(item.get('_id'))},
+                'last_added': added,
+                'base': item_base,
+            }
+            continue
+        entry['quantity'] += item.get('quantity') or 0
+        entry['base'] += item_base
+        entry['ids'].add(str(item.get('_id')))
+        entry['last_added'] = max(entry['last_added'], added)
+
+    items = list(merged.values())
+    # Sums of convertible quantities go back to each item's display unit
+    display_units = [item['unit'] for item in items]
+    quantities = REGISTRY.from_base([item.pop('base') for item in items], display_units)
+    for item, quantity, dimension_code in zip(items, quantities.tolist(), REGISTRY.dimensions(display_units).tolist()):
+        if dimension_code != UNKNOWN:
+            item['quantity'] = round(quantity, 3)
+    return items
+
+
+def format_item(item):
+    """Format a merged item as a compact prompt line."""
+    quantity = item['quantity']
+    if not quantity:
+        return f"- {item['name']}"
+    amount = f"{quantity:g}" if isinstance(quantity, float) else str(quantity)
+    if item['unit'] and item['unit'] != 'pcs':
+        amount = f"{amount} {item['unit']}"
+    return f"- {item['name']} ({amount})"
+
+
+def build_inventory_prompt(inventory_items, token_budget=DEFAULT_TOKEN_BUDGET, category_fn=None, must_use_ids=()):
+    """Return ``(text, stats)`` listing the inventory within a token budget.
+
+    ``category_fn`` maps an item name to a category, used to drop non-food
+    items and put fresh ingredients first. Items whose row ids are in
+    ``must_use_ids`` are always listed first. When the budget runs out the
+    remaining items are summarized in a final '...and N more' line.
+    """
+    must_use_ids = {str(item_id) for item_id in must_use_ids}
+    items = merge_inventory(inventory_items)
+
+    categories = {id(item): category_fn(item['name']) if category_fn else 'other' for item in items}
+    items = [item for item in items
+             if item['ids'] & must_use_ids or categories[id(item)] not in NON_FOOD_CATEGORIES]
+    # Stable sorts, least significant key first: name, then most recently
+    # bought, then category, then must-use items ahead of everything
+    items.sort(key=lambda item: item['name'].lower())
+    items.sort(key=lambda item: item['last_added'], reverse=True)
+    items.sort(key=lambda item: (0 if item['ids'] & must_use_ids else 1,
+                                 CATEGORY_PRIORITY.get(categories[id(item)], 2)))
+
+    lines = []
+    tokens = 0
+    for item in items:
+        line = format_item(item)
+        line_tokens = estimate_tokens(line + '\n')
+        if tokens + line_tokens > token_budget and lines:
+            break
+        lines.append(line)
+        tokens += line_tokens
+
+    omitted = len(items) - len(lines)
+    if omitted:
+        lines.append(f"- ...and {omitted} more items")
+    text = '\n'.join(lines)
+    stats = {
+        'rows': len(inventory_items),
+        'items': len(items),
+        'included': len(lines) - (1 if omitted else 0),
+        'omitted': omitted,
+        'tokens': estimate_tokens(text),
+    }
+    return text, stats
@@ -0,0 +1,99 @@
+"""Content-addressed cache for receipt extraction results.
+
+Receipts are keyed by the SHA-256 of the uploaded image bytes, so a photo
+that is re-uploaded (e.g. after the review modal timed out) returns the
+previously extracted item list without another Vision round trip. Entries
+live in the ``receipt_cache`` collection and expire after ``TTL`` seconds
+through a TTL index declared in db_indexes.
+"""
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Bump when the extraction prompt or item cleaning changes so stale
+# results are not served for the same image bytes.
+EXTRACTION_VERSION = 'v2'
+
+STATS_ID = 'receipt_extraction'
+
+TTL = 7 * 24 * 3600
+
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'saved_ms': 0.0, 'local_ocr': 0, 'vision': 0}
+
+
+def image_digest(image_bytes):
+    """Return the cache key for a receipt image."""
+    digest = hashlib.sha256(EXTRACTION_VERSION.encode('ascii'))
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+def _record(db, field, amount=1, saved_ms=0.0):
+    with _lock:
+        _counters[field] += amount
+        _counters['saved_ms'] += saved_ms
+    try:
+        db.cache_stats.update_one(
+            {'_id': STATS_ID},
+            {'$inc': {field: amount, 'saved_ms': saved_ms}},
+            upsert=True
+        )
+    except PyMongoError as e:
+        logger.warning(f"Could not update receipt cache stats: {str(e)}")
+
+
+def lookup(db, digest):
+    """Return the cached item list for a digest, or None on a miss."""
+    try:
+        entry = db.receipt_cache.find_one({'_id': digest}, {'items': 1, 'elapsed_ms': 1})
+    except PyMongoError as e:
+        logger.warning(f"Receipt cache lookup failed: {str(e)}")
+        entry = None
+
+    if entry is None:
+        _record(db, 'misses')
+        return None
+
+    _record(db, 'hits', saved_ms=entry.get('elapsed_ms', 0.0))
+    return entry['items']
+
+
+def store(db, digest, items, elapsed_ms):
+    """Cache the extracted items for a digest."""
+    try:
+        db.receipt_cache.replace_one(
+            {'_id': digest},
+            {
+                '_id': digest,
+                'items': items,
+                'elapsed_ms': elapsed_ms,
+                'created_at': datetime.utcnow()
+            },
+            upsert=True
+        )
+    except PyMongoError as e:
+        logger.warning(f"Receipt cache store failed: {str(e)}")
+
+
+def record_extraction(db, source):
+    """Count a cache-miss extraction by source ('local_ocr' or 'vision')."""
+    _record(db, source)
+
+
+def stats(db):
+    """Return hit/miss and extraction counters for this process and all workers."""
+    with _lock:
+        process_stats = dict(_counters)
+    try:
+        shared = db.cache_stats.find_one({'_id': STATS_ID}) or {}
+    except PyMongoError as e:
+        logger.warning(f"Could not read receipt cache stats: {str(e)}")
+        shared = {}
+    shared.pop('_id', None)
+    return {'process': process_stats, 'all_workers': shared}
@@ -0,0 +1,226 @@
+"""Receipt image preprocessing before the Vision API call.
+
+Phone photos of receipts are large, often rotated through EXIF metadata and
+mostly background. Shrinking them to a grayscale JPEG/WebP of bounded size
+cuts the request payload, the upload time to the API and the number of
+image tiles the model bills for, without hurting legibility of the text.
+"""
+import io
+import logging
+import math
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+try:
+    # HEIC/HEIF uploads from iPhones need the optional pillow-heif plugin
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+DEFAULT_LONG_EDGE = 2048
+DEFAULT_FORMAT = 'JPEG'
+DEFAULT_QUALITY = 80
+
+# The API rescales high-detail images so the short side is at most 768px;
+# anything sent above that is bytes on the wire the model never sees.
+API_SHORT_SIDE = 768
+
+# Pixels brighter than this are treated as receipt paper when cropping
+PAPER_THRESHOLD = 150
+# A row/column is part of the receipt if its paper share is at least this
+# fraction of the best-covered row/column
+PAPER_COVERAGE = 0.5
+CROP_PADDING = 0.02
+# Crop detection runs on a copy reduced to roughly this long edge
+ANALYSIS_EDGE = 1024
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'HEIF': 'image/heic',
+}
+
+
+def sniff_mime_type(image_bytes):
+    """Guess the MIME type of an image from its magic bytes."""
+    header = bytes(image_bytes[:12])
+    if header.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG'):
+        return 'image/png'
+    if header.startswith(b'GIF8'):
+        return 'image/gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header[4:8] == b'ftyp':
+        return 'image/heic'
+    return 'image/jpeg'
+
+
+def read_upload(stream, chunk_size=1 << 16):
+    """Return the contents of an upload stream as a memoryview.
+
+    In-memory streams expose their buffer directly, so no copy is made.
+    Other streams (e.g. a SpooledTemporaryFile) are read once, in place,
+    into a single preallocated buffer.
+    """
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer()
+
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    offset = 0
+    while offset < size:
+        read = stream.readinto(view[offset:offset + chunk_size])
+        if not read:
+            break
+        offset += read
+    return view[:offset]
+
+
+def _paper_span(profile, coverage):
+    """Return the first and last index of a 1-D brightness profile above coverage."""
+    cutoff = coverage * max(profile)
+    if cutoff == 0:
+        return None
+    indices = [i for i, value in enumerate(profile) if value >= cutoff]
+    if not indices:
+        return None
+    return indices[0], indices[-1] + 1
+
+
+def crop_to_receipt(image):
+    """Crop a grayscale image to the bright paper region of the receipt.
+
+    Row and column brightness profiles are computed by box-resizing a
+    thresholded mask of a reduced copy, so the scan is done in C rather
+    than per pixel. The original image is returned when no clear receipt
+    region is found.
+    """
+    width, height = image.size
+    factor = max(1, max(width, height) // ANALYSIS_EDGE)
+    analysis = image.reduce(factor) if factor > 1 else image
+    mask = analysis.point(lambda value: 255 if value >= PAPER_THRESHOLD else 0)
+    columns = list(mask.resize((mask.width, 1), Image.BOX).getdata())
+    rows = list(mask.resize((1, mask.height), Image.BOX).getdata())
+
+    column_span = _paper_span(columns, PAPER_COVERAGE)
+    row_span = _paper_span(rows, PAPER_COVERAGE)
+    if not column_span or not row_span:
+        return image
+    column_span = (column_span[0] * factor, column_span[1] * factor)
+    row_span = (row_span[0] * factor, row_span[1] * factor)
+
+    pad_x = int(width * CROP_PADDING)
+    pad_y = int(height * CROP_PADDING)
+    box = (
+        max(column_span[0] - pad_x, 0),
+        max(row_span[0] - pad_y, 0),
+        min(column_span[1] + pad_x, width),
+        min(row_span[1] + pad_y, height)
+    )
+    cropped_area = (box[2] - box[0]) * (box[3] - box[1])
+    # Ignore tiny regions (probably a glare spot) and no-op crops
+    if cropped_area < 0.2 * width * height or cropped_area > 0.95 * width * height:
+        return image
+    return image.crop(box)
+
+
+def load_receipt_image(image_bytes):
+    """Decode an upload into an upright grayscale image cropped to the receipt.
+
+    Raises UnidentifiedImageError, OSError or ValueError when the bytes
+    cannot be decoded.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # Let the JPEG decoder produce grayscale directly, and use DCT
+        # scaling on very large photos while keeping 2x headroom for the crop
+        width, height = image.size
+        draft_scale = min(1.0, 2 * API_SHORT_SIDE / min(width, height))
+        image.draft('L', (math.ceil(width * draft_scale), math.ceil(height * draft_scale)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('L')
+    return crop_to_receipt(image)
+
+
+def source_tokens(image_bytes):
+    """Estimate the Vision tokens of an upload as sent, from its header only."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return estimate_vision_tokens(*image.size)
+
+
+def fit_token_budget(width, height, max_tokens):
+    """Return the largest size with the same aspect ratio that the API
+    bills at most ``max_tokens`` for, stepping the long edge down one
+    512px tile at a time."""
+    while estimate_vision_tokens(width, height) > max_tokens and max(width, height) > 512:
+        long_side = max(width, height)
+        scale = (math.ceil(long_side / 512) - 1) * 512 / long_side
+        width, height = max(1, math.floor(width * scale)), max(1, math.floor(height * scale))
+    return width, height
+
+
+def encode_receipt_image(image, long_edge=DEFAULT_LONG_EDGE,
+                         image_format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY, max_tokens=None):
+    """Downscale and recompress a loaded receipt image for the Vision API.
+
+    The longest edge is capped at ``long_edge`` and the short edge at what
+    the API would keep. Cropping can leave a taller image that spans more
+    tiles than the upload did, so with ``max_tokens`` (usually the upload's
+    own estimate) it is shrunk further until it costs no more. Returns
+    ``(bytes, mime_type)``.
+    """
+    width, height = image.size
+    scale = min(1.0, long_edge / max(width, height), API_SHORT_SIDE / min(width, height))
+    size = (round(width * scale), round(height * scale))
+    if max_tokens is not None:
+        size = fit_token_budget(*size, max_tokens)
+    if size != (width, height):
+        image = image.resize(size, Image.LANCZOS)
+
+    output = io.BytesIO()
+    save_options = {'quality': quality}
+    if image_format == 'JPEG':
+        save_options['optimize'] = True
+    image.save(output, format=image_format, **save_options)
+    return output.getvalue(), MIME_TYPES.get(image_format, 'image/jpeg')
+
+
+def preprocess_receipt_image(image_bytes, long_edge=DEFAULT_LONG_EDGE,
+                             image_format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+    """Normalize a receipt image for the Vision API.
+
+    Applies EXIF rotation, converts to grayscale, crops to the receipt,
+    then downscales and recompresses it (see encode_receipt_image) without
+    raising the estimated token cost above the upload's. Returns
+    ``(bytes, mime_type)``; if the image cannot be decoded the original
+    bytes are returned unchanged.
+    """
+    try:
+        image = load_receipt_image(image_bytes)
+        return encode_receipt_image(image, long_edge, image_format, quality, source_tokens(image_bytes))
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning(f"Could not preprocess receipt image, sending original: {str(e)}")
+        return image_bytes, sniff_mime_type(image_bytes)
+
+
+def estimate_vision_tokens(width, height):
+    """Estimate the high-detail image token cost billed by gpt-4o.
+
+    Images are scaled to fit 2048x2048, then so the short side is at most
+    768px, and billed 170 tokens per 512px tile plus a flat 85.
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, API_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
@@ -0,0 +1,97 @@
+"""Background receipt-processing jobs.
+
+Uploads enqueue a job on a bounded thread pool and return immediately.
+Job state and results are kept in the ``receipt_jobs`` collection so any
+worker can answer status polls.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_PROCESSING = 'processing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# Seconds before a job document is removed, finished or not
+JOB_TTL = 24 * 3600
+
+
+class QueueFullError(Exception):
+    """Raised when too many receipt jobs are already waiting."""
+
+
+class ReceiptJobQueue:
+    """Runs ``process_fn(image_bytes)`` on a bounded pool of worker threads.
+
+    ``process_fn`` returns either an item list or a dict of result fields
+    (which must include ``items``) to store on the job document.
+    """
+
+    def __init__(self, process_fn, max_workers=4, max_pending=32):
+        self.process_fn = process_fn
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='receipt-job')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, db, user_id, image_bytes, process_fn=None):
+        """Queue a receipt image for extraction and return the job id.
+
+        ``process_fn`` overrides the queue's default for this job, e.g. to
+        extract a batch of images.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError('Receipt queue is full, please try again shortly')
+            self._pending += 1
+
+        try:
+            now = datetime.utcnow()
+            job_id = db.receipt_jobs.insert_one({
+                'user_id': ObjectId(user_id),
+                'status': STATUS_QUEUED,
+                'created_at': now,
+                'updated_at': now
+            }).inserted_id
+            self._executor.submit(self._run, db, job_id, process_fn or self.process_fn, image_bytes)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return str(job_id)
+
+    def _update(self, db, job_id, fields):
+        fields['updated_at'] = datetime.utcnow()
+        try:
+            db.receipt_jobs.update_one({'_id': job_id}, {'$set': fields})
+        except PyMongoError as e:
+            logger.error(f"Could not update receipt job {job_id}: {str(e)}")
+
+    def _run(self, db, job_id, process_fn, image_bytes):
+        try:
+            self._update(db, job_id, {'status': STATUS_PROCESSING})
+            result = process_fn(image_bytes)
+            fields = dict(result) if isinstance(result, dict) else {'items': result}
+            fields['status'] = STATUS_DONE
+            self._update(db, job_id, fields)
+            logger.info(f"Receipt job {job_id} finished with {len(fields['items'])} items")
+        except Exception as e:
+            logger.exception(f"Receipt job {job_id} failed")
+            self._update(db, job_id, {'status': STATUS_FAILED, 'error': str(e)})
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, db, job_id, user_id):
+        """Return the job document if it belongs to the user, else None."""
+        return db.receipt_jobs.find_one({
+            '_id': ObjectId(job_id),
+            'user_id': ObjectId(user_id)
+        })
@@ -0,0 +1,64 @@
+"""In-process cache for generated recipe suggestions.
+
+Recipe generation is a long gpt-4o call, but its inputs rarely change
+between dashboard loads. Results are keyed by a fingerprint of everything
+that goes into the prompt: the inventory, the user's cooking methods and
+kitchen tools, and the request filters. Entries are evicted LRU-first once
+the cache is full, and expire after a TTL.
+
+Any change to the inventory changes the fingerprint, so a worker never
+serves recipes for a stale inventory even if another worker handled the
+mutation. Mutation endpoints also call invalidate_user so the dead entries
+don't take up room until they expire.
+"""
+import hashlib
+import json
+
+from ttl_cache import TTLCache
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 3600
+
+
+def _canonical_items(inventory_items):
+    items = [
+        [str(item.get('_id')), item.get('name'), item.get('quantity'), item.get('unit')]
+        for item in inventory_items
+    ]
+    return sorted(items, key=lambda item: item[0])
+
+
+def fingerprint(inventory_items, cooking_methods, kitchen_tools, filters):
+    """Return a stable digest of the inputs to a recipe generation prompt."""
+    payload = {
+        'inventory': _canonical_items(inventory_items),
+        'cooking_methods': sorted(cooking_methods or []),
+        'kitchen_tools': sorted(kitchen_tools or []),
+        'filters': filters or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class RecipeCache:
+    """Thread-safe LRU cache of recipe lists with a per-entry TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self._cache = TTLCache(max_entries, ttl)
+
+    def get(self, user_id, digest):
+        """Return the cached recipes for a user and fingerprint, or None."""
+        return self._cache.get((str(user_id), digest))
+
+    def put(self, user_id, digest, recipes):
+        """Cache recipes, evicting the least recently used entries if full."""
+        self._cache.put((str(user_id), digest), recipes)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached entry for a user. Returns how many were dropped."""
+        user_id = str(user_id)
+        return self._cache.invalidate_where(lambda key: key[0] == user_id)
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        return self._cache.stats()
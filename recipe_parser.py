@@ -0,0 +1,159 @@
+"""Incremental parser for the plain-text recipes the model returns.
+
+Recipes start with a 'Recipe:' line, followed by section headers
+(required/additional ingredients, preparation time, instructions) and
+bulleted or numbered items. RecipeParser is fed the text in chunks of any
+size and hands back each recipe as soon as it is complete, i.e. when the
+next 'Recipe:' line starts or the text ends, so a streamed response can be
+shown recipe by recipe.
+
+The output is the same as the original line-by-line parser's: same
+headers, same list-marker handling, duplicate ingredients dropped,
+instructions numbered and a default preparation time.
+"""
+import re
+
+SECTION_HEADERS = [
+    ('required_ingredients', ['required ingredients:', 'ingredients from inventory:', 'from your inventory:']),
+    ('additional_ingredients', ['additional ingredients:', 'extra ingredients:', 'other ingredients:']),
+    ('preparation_time', ['preparation time:', 'prep time:', 'cooking time:', 'total time:']),
+    ('instructions', ['instructions:', 'steps:', 'directions:', 'method:']),
+]
+
+# One regex per section, tried in the order above so a line naming two
+# sections is labelled the way the original any() checks labelled it
+SECTION_REGEXES = [
+    (section, re.compile('|'.join(re.escape(header) for header in headers)))
+    for section, headers in SECTION_HEADERS
+]
+
+LIST_MARKERS = ('-', '•', '*')
+NUMBERED_ITEM_REGEX = re.compile(r'^\d+\.?\s')
+# Strips one leading marker character (and following whitespace) from a list item
+LIST_MARKER_REGEX = re.compile(r'^[-•*\d.]\s*')
+
+EMPTY_INGREDIENTS = {'none', 'n/a', '-'}
+DEFAULT_PREPARATION_TIME = '30-40 minutes'
+
+
+def _new_recipe(line):
+    return {
+        'name': line.replace('Recipe:', '').strip(),
+        'required_ingredients': [],
+        'additional_ingredients': [],
+        'preparation_time': 'Not specified',
+        'instructions': []
+    }
+
+
+def _finish_recipe(recipe):
+    """Dedupe ingredients, number instructions and default the prep time."""
+    for section in ('required_ingredients', 'additional_ingredients'):
+        seen = set()
+        recipe[section] = [x for x in recipe[section] if not (x.lower() in seen or seen.add(x.lower()))]
+
+    recipe['instructions'] = [
+        f"{i+1}. {instr.strip()}"
+        for i, instr in enumerate(recipe['instructions'])
+        if instr.strip()
+    ]
+
+    if not recipe['preparation_time'] or recipe['preparation_time'] == 'Not specified':
+        recipe['preparation_time'] = DEFAULT_PREPARATION_TIME
+    return recipe
+
+
+class RecipeParser:
+    """Parses recipe text fed in chunks, returning recipes as they complete."""
+
+    def __init__(self):
+        self._pending = ''
+        self._recipe = None
+        self._section = None
+
+    def feed(self, chunk):
+        """Add a chunk of text and return the recipes it completed."""
+        self._pending += chunk
+        if '\n' not in chunk:
+            return []
+        *lines, self._pending = self._pending.split('\n')
+        completed = []
+        for line in lines:
+            recipe = self._parse_line(line)
+            if recipe is not None:
+                completed.append(recipe)
+        return completed
+
+    def close(self):
+        """Parse any remaining text and return the last recipe, if complete."""
+        completed = []
+        recipe = self._parse_line(self._pending)
+        if recipe is not None:
+            completed.append(recipe)
+        self._pending = ''
+        recipe = self._take_recipe()
+        if recipe is not None:
+            completed.append(recipe)
+        return completed
+
+    def _take_recipe(self):
+        recipe, self._recipe = self._recipe, None
+        if recipe and recipe.get('name') and recipe.get('instructions'):
+            return _finish_recipe(recipe)
+        return None
+
+    def _parse_line(self, line):
+        """Parse one line; returns the previous recipe when a new one starts."""
+        line = line.strip()
+        if not line:
+            return None
+
+        if line[:7].lower() == 'recipe:':
+            finished = self._take_recipe()
+            self._recipe = _new_recipe(line)
+            self._section = None
+            return finished
+
+        recipe = self._recipe
+        if recipe is None:
+            return None
+
+        # Every header ends in a colon, so most lines skip the header checks
+        if ':' in line:
+            lower_line = line.lower()
+            for section, regex in SECTION_REGEXES:
+                if regex.search(lower_line):
+                    if section == 'preparation_time':
+                        recipe['preparation_time'] = line.split(':', 1)[1].strip()
+                        self._section = None
+                    else:
+                        self._section = section
+                    return None
+
+        section = self._section
+        if section is None:
+            return None
+
+        if line.startswith(LIST_MARKERS) or NUMBERED_ITEM_REGEX.match(line):
+            content = LIST_MARKER_REGEX.sub('', line).strip()
+            if section == 'instructions':
+                if content:
+                    recipe['instructions'].append(content)
+            elif content.lower() not in EMPTY_INGREDIENTS:
+                recipe[section].append(content)
+        elif section == 'instructions':
+            recipe['instructions'].append(line)
+        return None
+
+
+def iter_recipes(chunks):
+    """Yield recipes from an iterable of text chunks as each one completes."""
+    parser = RecipeParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def parse_recipes(text):
+    """Parse a complete response into a list of recipes."""
+    return list(iter_recipes([text]))
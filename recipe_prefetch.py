@@ -0,0 +1,194 @@
+"""Background prefetching of recipe suggestions after inventory changes.
+
+When a user's inventory changes, the default (unfiltered) recipe set is
+regenerated in the background and stored in the ``recipe_pool``
+collection, keyed by the user and the fingerprint of the inputs, so the
+next dashboard load can be served from the pool instead of waiting on the
+model.
+
+Changes are debounced per user: a burst of edits (confirming a receipt,
+deleting a few items) restarts the timer and results in a single
+generation. If the inventory changes again while a generation is running,
+one more run follows it. Generations run on a bounded thread pool.
+
+The debounce is per process, so several workers may fire for the same
+change. A run is skipped when the pool already holds the set for the
+current fingerprint, and runs for the same fingerprint share one model
+call through ``flights`` (a SingleFlight). Each user's token spend is
+capped per day in ``recipe_prefetch_usage``: a run reserves its tokens
+atomically before calling the model and settles the actual count after.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+import single_flight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELAY = 10.0
+DEFAULT_WORKERS = 2
+DEFAULT_DAILY_TOKENS = 40000
+# Reserved per run before the model call; about one batch generation
+DEFAULT_RESERVE_TOKENS = 4000
+# Seconds before a day's usage row is removed
+USAGE_TTL = 2 * 24 * 3600
+
+
+class RecipePrefetcher:
+    """Debounces inventory changes into background recipe generations.
+
+    ``prepare_fn(user_id)`` returns ``(fingerprint, generate)``, or None
+    when there is nothing to generate (e.g. an empty inventory);
+    ``generate()`` calls the model and returns ``{'recipes', 'tokens'}``.
+    """
+
+    def __init__(self, prepare_fn, delay=DEFAULT_DELAY, max_workers=DEFAULT_WORKERS,
+                 daily_tokens=DEFAULT_DAILY_TOKENS, reserve_tokens=DEFAULT_RESERVE_TOKENS,
+                 flights=None, enabled=True):
+        self.prepare_fn = prepare_fn
+        self.delay = delay
+        self.daily_tokens = daily_tokens
+        self.reserve_tokens = reserve_tokens
+        self.flights = flights
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recipe-prefetch')
+        self._lock = threading.Lock()
+        # user_id -> {'timer', 'generation', 'running', 'dirty'}
+        self._users = {}
+
+    def schedule(self, db, user_id):
+        """Note an inventory change; a prefetch runs once changes settle."""
+        if not self.enabled:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            state = self._users.setdefault(user_id, {'timer': None, 'generation': 0, 'running': False, 'dirty': False})
+            if state['timer'] is not None:
+                state['timer'].cancel()
+            state['generation'] += 1
+            timer = threading.Timer(self.delay, self._fire, args=(db, user_id, state['generation']))
+            timer.daemon = True
+            state['timer'] = timer
+            timer.start()
+
+    def _fire(self, db, user_id, generation):
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None or state['generation'] != generation:
+                # A later change restarted the timer after this one fired
+                return
+            state['timer'] = None
+            if state['running']:
+                # The running prefetch picks this change up when it finishes
+                state['dirty'] = True
+                return
+            state['running'] = True
+        self._executor.submit(self._run, db, user_id)
+
+    def _run(self, db, user_id):
+        while True:
+            with self._lock:
+                self._users[user_id]['dirty'] = False
+            try:
+                self._prefetch(db, user_id)
+            except Exception:
+                logger.exception(f"Recipe prefetch for user {user_id} failed")
+            with self._lock:
+                state = self._users[user_id]
+                if not state['dirty']:
+                    state['running'] = False
+                    if state['timer'] is None:
+                        del self._users[user_id]
+                    return
+
+    def _usage_id(self, user_id):
+        return f"{user_id}:{datetime.utcnow().strftime('%Y-%m-%d')}"
+
+    def tokens_used_today(self, db, user_id):
+        """Return the tokens spent on prefetching for a user today."""
+        usage = db.recipe_prefetch_usage.find_one({'_id': self._usage_id(user_id)}, {'tokens': 1})
+        return usage['tokens'] if usage else 0
+
+    def _reserve(self, db, user_id):
+        """Reserve ``reserve_tokens`` of today's budget; False if it would
+        go over the cap."""
+        if self.reserve_tokens > self.daily_tokens:
+            return False
+        try:
+            # One atomic check-and-add, so concurrent workers cannot all
+            # pass the check and overshoot the cap
+            usage = db.recipe_prefetch_usage.find_one_and_update(
+                {'_id': self._usage_id(user_id), 'tokens': {'$lte': self.daily_tokens - self.reserve_tokens}},
+                {
+                    '$inc': {'tokens': self.reserve_tokens},
+                    '$setOnInsert': {'user_id': ObjectId(user_id), 'runs': 0, 'created_at': datetime.utcnow()}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Today's row exists and did not match the $lt guard
+            return False
+        return usage is not None
+
+    def _settle(self, db, user_id, tokens, runs):
+        """Adjust today's usage by ``tokens`` (negative to refund)."""
+        db.recipe_prefetch_usage.update_one({'_id': self._usage_id(user_id)}, {'$inc': {'tokens': tokens, 'runs': runs}})
+
+    def _prefetch(self, db, user_id):
+        prepared = self.prepare_fn(user_id)
+        if prepared is None:
+            db.recipe_pool.delete_one({'_id': ObjectId(user_id)})
+            return
+        fingerprint, generate = prepared
+        if self.pooled(db, user_id, fingerprint) is not None:
+            logger.info(f"Skipping recipe prefetch for user {user_id}: already pooled")
+            return
+
+        def run():
+            if not self._reserve(db, user_id):
+                logger.info(f"Skipping recipe prefetch for user {user_id}: daily token budget spent")
+                return 0
+            try:
+                result = generate()
+            except Exception:
+                self._settle(db, user_id, -self.reserve_tokens, 0)
+                raise
+            self._settle(db, user_id, result['tokens'] - self.reserve_tokens, 1)
+            if result['recipes']:
+                self.store(db, user_id, fingerprint, result['recipes'])
+            logger.info(f"Prefetched {len(result['recipes'])} recipes for user {user_id} "
+                        f"using {result['tokens']} tokens")
+            return len(result['recipes'])
+
+        if self.flights is None:
+            return run()
+        # Workers whose timers fired for the same change share one call
+        key = single_flight.flight_key(user_id, 'recipe_prefetch', fingerprint)
+        return self.flights.do(db, key, run)
+
+    def store(self, db, user_id, fingerprint, recipes):
+        """Save the default recipe set for a user's current inputs."""
+        try:
+            db.recipe_pool.replace_one(
+                {'_id': ObjectId(user_id)},
+                {'fingerprint': fingerprint, 'recipes': recipes, 'created_at': datetime.utcnow()},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.warning(f"Could not store recipe pool for user {user_id}: {str(e)}")
+
+    def pooled(self, db, user_id, fingerprint):
+        """Return the pooled recipes if they were generated for these inputs."""
+        try:
+            pool = db.recipe_pool.find_one({'_id': ObjectId(user_id), 'fingerprint': fingerprint}, {'recipes': 1})
+        except PyMongoError as e:
+            logger.warning(f"Recipe pool lookup failed: {str(e)}")
+            return None
+        return pool['recipes'] if pool else None
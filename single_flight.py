@@ -0,0 +1,233 @@
+"""Coalesce duplicate in-flight requests, within and across workers.
+
+Double-clicks and impatient refreshes send the same recipe request two or
+three times at once. The first request for a key leads: it takes a lease
+in the ``request_leases`` collection and does the work. Duplicates in the
+same process wait on the leader directly; duplicates in other workers see
+the lease and poll it until the leader stores its result there.
+
+The stored result lingers for ``result_ttl`` seconds, so a duplicate that
+arrives just after the leader finished still reuses it; callers asking
+for a ``fresh`` result skip it and lead a new flight. A lease whose
+leader died is taken over once it expires. Followers whose leader fails
+on another worker, or who wait longer than ``wait_timeout``, get
+FlightAbandoned and should do the work themselves.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bson.errors import InvalidDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_TTL = 120.0
+DEFAULT_RESULT_TTL = 5.0
+DEFAULT_WAIT_TIMEOUT = 120.0
+DEFAULT_POLL_INTERVAL = 0.25
+
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+
+
+class FlightAbandoned(Exception):
+    """Raised to a follower when the leader went away without a result."""
+
+
+def flight_key(user_id, endpoint, *inputs):
+    """Return the key for a user's call to ``endpoint`` with normalized inputs."""
+    payload = json.dumps([str(user_id), endpoint, inputs], sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Flight:
+    """One caller's part in a coalesced request.
+
+    A leader must end the flight with ``finish(result)`` or ``fail(error)``;
+    a follower calls ``wait()`` for the leader's result. A follower of a
+    leader on another worker relays that result to the callers in this
+    process that are waiting on it.
+    """
+
+    def __init__(self, group, db, key, leader, shared=None, lease_id=None, relay=None):
+        self.group = group
+        self.db = db
+        self.key = key
+        self.leader = leader
+        self._shared = shared
+        self._lease_id = lease_id
+        self._relay = relay
+
+    def finish(self, result):
+        self.group._finish(self, result)
+
+    def fail(self, error):
+        self.group._fail(self, error)
+
+    def wait(self):
+        """Return the leader's result, or raise its error or FlightAbandoned."""
+        if self._shared is not None:
+            return self.group._wait_local(self)
+        return self.group._wait_remote(self)
+
+
+class _SharedFlight:
+    """State shared by a leader and its followers in this process."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Hands out Flights so only one caller per key does the work."""
+
+    def __init__(self, lease_ttl=DEFAULT_LEASE_TTL, result_ttl=DEFAULT_RESULT_TTL,
+                 wait_timeout=DEFAULT_WAIT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.lease_ttl = lease_ttl
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # key -> _SharedFlight for flights led by this process
+        self._flights = {}
+        self._stats = {'leaders': 0, 'local_followers': 0, 'remote_followers': 0, 'abandoned': 0}
+
+    def _count(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    def join(self, db, key, fresh=False):
+        """Return a Flight for ``key``; ``flight.leader`` says who does the work.
+
+        With ``fresh``, a finished result is never reused, only a flight
+        still in progress.
+        """
+        with self._lock:
+            shared = self._flights.get(key)
+            if shared is not None:
+                self._stats['local_followers'] += 1
+                return Flight(self, db, key, leader=False, shared=shared)
+            # Claim the key here before the lease round trip, which runs
+            # outside the lock; callers arriving meanwhile wait on this claim
+            shared = self._flights[key] = _SharedFlight()
+
+        lease_id = uuid.uuid4().hex
+        if not self._acquire_lease(db, key, lease_id, fresh):
+            self._count('remote_followers')
+            return Flight(self, db, key, leader=False, relay=shared)
+        self._count('leaders')
+        return Flight(self, db, key, leader=True, shared=shared, lease_id=lease_id)
+
+    def _acquire_lease(self, db, key, lease_id, fresh=False):
+        now = datetime.utcnow()
+        lease = {'owner': lease_id, 'state': STATE_RUNNING, 'expires_at': now + timedelta(seconds=self.lease_ttl)}
+        try:
+            db.request_leases.insert_one(dict(lease, _id=key))
+            return True
+        except DuplicateKeyError:
+            # Take over a lease whose leader died or whose result went stale
+            # (or is not wanted)
+            reusable = {'_id': key, 'expires_at': {'$lt': now}}
+            if fresh:
+                reusable = {'_id': key, '$or': [{'expires_at': {'$lt': now}}, {'state': STATE_DONE}]}
+            taken = db.request_leases.find_one_and_update(
+                reusable,
+                {'$set': lease, '$unset': {'result': ''}}
+            )
+            return taken is not None
+        except PyMongoError as e:
+            # Without Mongo, still coalesce within this process
+            logger.warning(f"Could not take request lease, coalescing in-process only: {str(e)}")
+            return True
+
+    def _end_local(self, key, shared, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is shared:
+                del self._flights[key]
+        shared.result = result
+        shared.error = error
+        shared.done.set()
+
+    def _finish(self, flight, result):
+        try:
+            flight.db.request_leases.update_one(
+                {'_id': flight.key, 'owner': flight._lease_id},
+                {'$set': {
+                    'state': STATE_DONE,
+                    'result': result,
+                    'expires_at': datetime.utcnow() + timedelta(seconds=self.result_ttl)
+                }}
+            )
+        except (PyMongoError, InvalidDocument) as e:
+            logger.warning(f"Could not publish coalesced result: {str(e)}")
+        self._end_local(flight.key, flight._shared, result=result)
+
+    def _fail(self, flight, error):
+        try:
+            flight.db.request_leases.delete_one({'_id': flight.key, 'owner': flight._lease_id})
+        except PyMongoError as e:
+            logger.warning(f"Could not release request lease: {str(e)}")
+        self._end_local(flight.key, flight._shared, error=error)
+
+    def _wait_local(self, flight):
+        shared = flight._shared
+        if not shared.done.wait(self.wait_timeout):
+            self._count('abandoned')
+            raise FlightAbandoned(f"Timed out after {self.wait_timeout}s waiting for the leading request")
+        if shared.error is not None:
+            raise shared.error
+        return shared.result
+
+    def _wait_remote(self, flight):
+        try:
+            result = self._poll_lease(flight)
+        except FlightAbandoned as e:
+            self._end_local(flight.key, flight._relay, error=e)
+            raise
+        self._end_local(flight.key, flight._relay, result=result)
+        return result
+
+    def _poll_lease(self, flight):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            try:
+                lease = flight.db.request_leases.find_one({'_id': flight.key})
+            except PyMongoError as e:
+                logger.warning(f"Could not poll request lease: {str(e)}")
+                break
+            if lease is None or (lease['state'] == STATE_RUNNING and lease['expires_at'] < datetime.utcnow()):
+                break
+            if lease['state'] == STATE_DONE:
+                return lease.get('result')
+            time.sleep(self.poll_interval)
+        self._count('abandoned')
+        raise FlightAbandoned('The leading request on another worker did not produce a result')
+
+    def do(self, db, key, fn, fresh=False):
+        """Return ``fn()``, sharing one call among concurrent callers with the same key."""
+        flight = self.join(db, key, fresh)
+        if not flight.leader:
+            try:
+                return flight.wait()
+            except FlightAbandoned as e:
+                logger.info(f"Running uncoalesced: {str(e)}")
+                return fn()
+        try:
+            result = fn()
+        except Exception as e:
+            flight.fail(e)
+            raise
+        flight.finish(result)
+        return result
+
+    def stats(self):
+        """Return how many calls led, followed or were abandoned in this process."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights))
@@ -41,7 +41,10 @@ async function uploadReceipt(file) {
             throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
+        const job = await response.json();
+        console.log('Receipt job queued:', job);
+
+        const data = await pollReceiptJob(job.status_url);
         console.log('Response data:', data);
         
         if (data.success) {
@@ -61,6 +64,95 @@ async function uploadReceipt(file) {
     }
 }
 
+// Upload several receipts in one request and review the merged items
+async function uploadReceipts(files) {
+    console.log(`Starting batch upload of ${files.length} receipts...`);
+
+    const formData = new FormData();
+    for (const file of files) {
+        formData.append('receipts', file);
+    }
+
+    // Show loading state
+    const uploadSection = document.querySelector('.upload-section');
+    const originalContent = uploadSection.innerHTML;
+    uploadSection.innerHTML = `
+        <div class="text-center">
+            <div class="spinner-border text-primary mb-3" role="status">
+                <span class="visually-hidden">Loading...</span>
+            </div>
+            <p class="mb-0">Analyzing ${files.length} receipts...</p>
+        </div>
+    `;
+
+    try {
+        const response = await fetch('/api/upload_receipts', {
+            method: 'POST',
+            body: formData
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json();
+            console.error('Error response:', errorData);
+            throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+        }
+
+        const job = await response.json();
+        console.log('Batch receipt job queued:', job);
+
+        const data = await pollReceiptJob(job.status_url);
+        console.log('Batch response data:', data);
+
+        if (data.success) {
+            const failed = (data.receipts || []).filter(receipt => receipt.error);
+            if (failed.length > 0) {
+                // One summary entry per uploaded file, indexed in upload order
+                const names = failed.map(receipt => files[receipt.index].name).join(', ');
+                alert(`${failed.length} of ${files.length} receipts could not be read: ${names}`);
+            }
+            displayExtractedItems(data.items);
+        } else {
+            throw new Error(data.error || 'Failed to process receipts');
+        }
+    } catch (error) {
+        console.error('Error in uploadReceipts:', error);
+        alert('Error uploading receipts: ' + error.message);
+    } finally {
+        // Restore original upload section content
+        uploadSection.innerHTML = originalContent;
+    }
+}
+
+// Upload one or several selected receipt files
+function handleReceiptFiles(files) {
+    if (files.length > 1) {
+        uploadReceipts(Array.from(files));
+    } else if (files.length === 1) {
+        uploadReceipt(files[0]);
+    }
+}
+
+// Poll a queued receipt job until it finishes
+async function pollReceiptJob(statusUrl, intervalMs = 1000, timeoutMs = 180000) {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+
+        const response = await fetch(statusUrl);
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+        }
+
+        const data = await response.json();
+        console.log('Receipt job status:', data.status);
+        if (data.status === 'done' || data.status === 'failed') {
+            return data;
+        }
+    }
+    throw new Error('Timed out waiting for receipt to be processed');
+}
+
 // Display extracted items in a table
 function displayExtractedItems(items) {
     const container = document.getElementById('extracted-items') || document.createElement('div');
@@ -126,33 +218,44 @@ async function addAllToInventory(items) {
             addAllButton.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Adding...';
         }
 
-        // Add each item sequentially with visual feedback
-        for (const item of items) {
-            // Find the row for this item
-            const row = document.querySelector(`tr:has(td:contains("${item.name}"))`);
-            if (row) {
-                // Add visual feedback class
-                row.classList.add('item-adding');
-                // Wait a brief moment to show the highlight
-                await new Promise(resolve => setTimeout(resolve, 100));
-            }
-
-            // Add the item
-            await addToInventory(item, false);
+        // Add all items in a single request
+        const response = await fetch('/api/confirm_receipt_items', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ items })
+        });
+        const data = await response.json();
+        console.log('Confirm response:', data);
 
+        // Highlight each row with its own result
+        const rows = document.querySelectorAll('#extracted-items tbody tr');
+        (data.results || []).forEach(result => {
+            const row = rows[result.index];
             if (row) {
-                // Show success state briefly
-                row.style.backgroundColor = 'rgba(40, 167, 69, 0.1)';
-                await new Promise(resolve => setTimeout(resolve, 300));
-                row.style.backgroundColor = '';
+                row.style.backgroundColor = result.status === 'inserted'
+                    ? 'rgba(40, 167, 69, 0.1)'
+                    : 'rgba(220, 53, 69, 0.1)';
             }
+        });
+
+        if (!response.ok && !data.results) {
+            throw new Error(data.error || `HTTP error! status: ${response.status}`);
         }
 
-        // Refresh inventory once at the end
-        await loadInventory();
+        // Patch the inventory once at the end
+        await syncInventory();
+
+        const errors = data.errors || [];
+        if (errors.length > 0) {
+            alert(`${data.message}. Failed items:\n` +
+                  errors.map(error => `${items[error.index].name}: ${error.error}`).join('\n'));
+            return;
+        }
 
         // Show success message
-        alert(`Successfully added ${items.length} items to inventory`);
+        alert(data.message);
 
         // Clear the extracted items section
         const extractedItems = document.getElementById('extracted-items');
@@ -198,8 +301,8 @@ async function addToInventory(item, shouldRefresh = true) {
         
         // Only refresh the inventory if shouldRefresh is true
         if (shouldRefresh) {
-            console.log('Refreshing inventory...'); // Debug log
-            await loadInventory();
+            console.log('Syncing inventory...'); // Debug log
+            await syncInventory();
             
             // Remove the individual row from the extracted items table
             const row = document.querySelector(`tr:has(button[onclick*="${item.name}"])`);
@@ -271,9 +374,9 @@ async function addItemToInventory() {
             document.getElementById('addItemForm').reset();
             console.log('Form reset'); // Debug log
             
-            // Refresh the inventory display
-            await loadInventory();
-            console.log('Inventory refreshed'); // Debug log
+            // Patch the inventory display
+            await syncInventory();
+            console.log('Inventory synced'); // Debug log
         } else {
             alert(data.error || 'Failed to add item');
         }
@@ -288,11 +391,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const fileInput = document.querySelector('input[type="file"]');
     if (fileInput) {
         fileInput.addEventListener('change', function(e) {
-            const file = e.target.files[0];
-            if (file) {
-                console.log('Selected file:', file.name); // Debug log
-                uploadReceipt(file);
-            }
+            console.log('Selected files:', e.target.files.length); // Debug log
+            handleReceiptFiles(e.target.files);
         });
     }
 
@@ -316,73 +416,147 @@ document.addEventListener('DOMContentLoaded', function() {
         e.stopPropagation();
         this.classList.remove('dragover');
         
-        const file = e.dataTransfer.files[0];
-        if (file) {
-            console.log('Dropped file:', file.name); // Debug log
-            uploadReceipt(file);
-        }
+        console.log('Dropped files:', e.dataTransfer.files.length); // Debug log
+        handleReceiptFiles(e.dataTransfer.files);
     });
 });
 
-// Load inventory items
+// Inventory is loaded a page at a time as the list scrolls
+const INVENTORY_PAGE_SIZE = 50;
+const inventoryState = {
+    cursor: null,
+    done: false,
+    loading: false,
+    generation: 0,
+    observer: null,
+    // Inventory version the rendered rows reflect, for delta sync
+    version: null,
+    sync: Promise.resolve()
+};
+
+function inventoryFilterParams() {
+    const params = new URLSearchParams({ limit: INVENTORY_PAGE_SIZE });
+    const search = document.getElementById('inventory-search');
+    const category = document.getElementById('inventory-category');
+    if (search && search.value.trim()) {
+        params.set('q', search.value.trim());
+    }
+    if (category && category.value) {
+        params.set('category', category.value);
+    }
+    return params;
+}
+
+function renderInventoryRow(item) {
+    const price = typeof item.price === 'number' ? item.price.toFixed(2) : '0.00';
+    return `
+        <tr data-item-id="${escapeHtml(item._id)}">
+            <td class="text-nowrap">${escapeHtml(item.name)}</td>
+            <td class="text-center">${escapeHtml(item.quantity)}</td>
+            <td class="text-center">${escapeHtml(item.unit)}</td>
+            <td class="text-end">$${price}</td>
+            <td class="text-end">
+                <button onclick="deleteItem('${item._id}')" class="btn btn-danger btn-sm">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </td>
+        </tr>
+    `;
+}
+
+// Load inventory items, starting again from the first page
 async function loadInventory() {
-    console.log('Loading inventory...'); // Debug log
-    try {
-        const response = await fetch('/api/inventory');
-        console.log('Inventory response status:', response.status); // Debug log
+    const inventoryList = document.getElementById('inventory-list');
+    if (!inventoryList) {
+        console.error('Inventory list element not found');
+        return;
+    }
+
+    inventoryState.generation += 1;
+    inventoryState.cursor = null;
+    inventoryState.done = false;
+    inventoryState.loading = false;
+    inventoryState.version = null;
+
+    inventoryList.innerHTML = `
+        <table class="table table-hover">
+            <thead>
+                <tr>
+                    <th>Item</th>
+                    <th class="text-center">Qty</th>
+                    <th class="text-center">Unit</th>
+                    <th class="text-end">Price</th>
+                    <th class="text-end">Action</th>
+                </tr>
+            </thead>
+            <tbody id="inventory-rows"></tbody>
+        </table>
+        <div id="inventory-more" class="text-center text-muted small p-2"></div>
+    `;
 
+    if (!inventoryState.observer) {
+        inventoryState.observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMoreInventory();
+            }
+        }, { root: inventoryList, rootMargin: '200px' });
+    }
+    inventoryState.observer.disconnect();
+    inventoryState.observer.observe(document.getElementById('inventory-more'));
+
+    await loadMoreInventory();
+}
+
+async function loadMoreInventory() {
+    if (inventoryState.loading || inventoryState.done) {
+        return;
+    }
+    const generation = inventoryState.generation;
+    inventoryState.loading = true;
+    const more = document.getElementById('inventory-more');
+    if (more) {
+        more.textContent = 'Loading...';
+    }
+
+    try {
+        const params = inventoryFilterParams();
+        if (inventoryState.cursor) {
+            params.set('cursor', inventoryState.cursor);
+        }
+        const response = await fetch(`/api/inventory?${params}`);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-
         const data = await response.json();
-        console.log('Inventory data:', data); // Debug log
-        
-        const inventoryList = document.getElementById('inventory-list');
-        if (!inventoryList) {
-            console.error('Inventory list element not found');
+        if (generation !== inventoryState.generation) {
+            // The list was reloaded while this page was in flight
             return;
         }
 
-        if (data.items && data.items.length > 0) {
-            inventoryList.innerHTML = `
-                <table class="table table-hover">
-                    <thead>
-                        <tr>
-                            <th>Item</th>
-                            <th class="text-center">Qty</th>
-                            <th class="text-center">Unit</th>
-                            <th class="text-end">Price</th>
-                            <th class="text-end">Action</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        ${data.items.map(item => `
-                            <tr>
-                                <td class="text-nowrap">${item.name}</td>
-                                <td class="text-center">${item.quantity}</td>
-                                <td class="text-center">${item.unit}</td>
-                                <td class="text-end">$${item.price.toFixed(2)}</td>
-                                <td class="text-end">
-                                    <button onclick="deleteItem('${item._id}')" class="btn btn-danger btn-sm">
-                                        <i class="fas fa-trash"></i>
-                                    </button>
-                                </td>
-                            </tr>
-                        `).join('')}
-                    </tbody>
-                </table>
-            `;
-        } else {
-            inventoryList.innerHTML = `
+        const rows = document.getElementById('inventory-rows');
+        const firstPage = !inventoryState.cursor;
+        inventoryState.cursor = data.next_cursor;
+        inventoryState.done = !data.next_cursor;
+        if (firstPage) {
+            inventoryState.version = data.version;
+        }
+
+        if (firstPage && data.items.length === 0) {
+            document.getElementById('inventory-list').innerHTML = `
                 <div class="text-center text-muted p-4">
                     <i class="fas fa-box-open fa-3x mb-3"></i>
                     <p class="mb-0">No items in inventory</p>
                 </div>
             `;
+            return;
         }
+        rows.insertAdjacentHTML('beforeend', data.items.map(renderInventoryRow).join(''));
+        more.textContent = '';
     } catch (error) {
         console.error('Error loading inventory:', error);
+        if (generation !== inventoryState.generation) {
+            return;
+        }
         const inventoryList = document.getElementById('inventory-list');
         if (inventoryList) {
             inventoryList.innerHTML = `
@@ -392,5 +566,234 @@ async function loadInventory() {
                 </div>
             `;
         }
+        inventoryState.done = true;
+    } finally {
+        if (generation === inventoryState.generation) {
+            inventoryState.loading = false;
+            fillInventoryViewport();
+        }
+    }
+}
+
+// Keep loading while the end of the list is still on screen
+function fillInventoryViewport() {
+    const inventoryList = document.getElementById('inventory-list');
+    const more = document.getElementById('inventory-more');
+    if (inventoryState.done || !inventoryList || !more) {
+        return;
+    }
+    if (more.getBoundingClientRect().top < inventoryList.getBoundingClientRect().bottom + 200) {
+        loadMoreInventory();
+    }
+}
+
+// Apply the changes made since the rendered version instead of reloading.
+// Syncs run one after another so each starts from the previous version.
+function syncInventory() {
+    inventoryState.sync = inventoryState.sync.then(applyInventoryChanges, applyInventoryChanges);
+    return inventoryState.sync;
+}
+
+async function applyInventoryChanges() {
+    const rows = document.getElementById('inventory-rows');
+    const params = inventoryFilterParams();
+    const filtered = params.has('q') || params.has('category');
+    // Filtered lists and the empty state are cheaper to reload than to patch
+    if (!rows || filtered || inventoryState.version === null) {
+        return loadInventory();
+    }
+
+    const generation = inventoryState.generation;
+    try {
+        const response = await fetch(`/api/inventory/changes?since=${inventoryState.version}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        if (generation !== inventoryState.generation) {
+            // The list was reloaded meanwhile and is already current
+            return;
+        }
+        if (data.reset) {
+            return loadInventory();
+        }
+
+        data.deleted.forEach(itemId => {
+            const row = rows.querySelector(`tr[data-item-id="${CSS.escape(itemId)}"]`);
+            if (row) {
+                row.remove();
+            }
+        });
+        const inserted = new Set(data.inserted);
+        const newItems = [];
+        data.items.forEach(item => {
+            const row = rows.querySelector(`tr[data-item-id="${CSS.escape(item._id)}"]`);
+            if (row) {
+                row.outerHTML = renderInventoryRow(item);
+            } else if (inserted.has(item._id)) {
+                newItems.push(item);
+            }
+        });
+        // Inserted rows are the newest, so they go on top, newest first
+        newItems.sort((a, b) => (b.date_added || '').localeCompare(a.date_added || ''));
+        rows.insertAdjacentHTML('afterbegin', newItems.map(renderInventoryRow).join(''));
+        inventoryState.version = data.version;
+
+        if (!rows.querySelector('tr')) {
+            return loadInventory();
+        }
+    } catch (error) {
+        console.error('Error syncing inventory:', error);
+        return loadInventory();
     }
-} 
\ No newline at end of file
+}
+
+let inventorySearchTimer = null;
+function searchInventory() {
+    clearTimeout(inventorySearchTimer);
+    inventorySearchTimer = setTimeout(loadInventory, 300);
+}
+
+// Escape text before inserting it into HTML
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+// Build the card for one recipe suggestion
+function renderRecipeCard(recipe) {
+    const column = document.createElement('div');
+    column.className = 'col-12 col-md-6 col-xl-4';
+    const listItems = items => items.map(item => `<li>${escapeHtml(item)}</li>`).join('');
+    column.innerHTML = `
+        <div class="card recipe-card">
+            <div class="card-body">
+                <h5 class="card-title">${escapeHtml(recipe.name)}</h5>
+                <p class="card-text"><i class="fas fa-clock me-1"></i> ${escapeHtml(recipe.preparation_time)}</p>
+                <h6>From your inventory</h6>
+                <ul>${listItems(recipe.required_ingredients)}</ul>
+                ${recipe.additional_ingredients.length ? `
+                    <h6>You'll also need</h6>
+                    <ul>${listItems(recipe.additional_ingredients)}</ul>
+                ` : ''}
+                <h6>Instructions</h6>
+                <ul class="list-unstyled">${listItems(recipe.instructions)}</ul>
+                <div class="recipe-actions">
+                    <button class="btn-like"><i class="fas fa-thumbs-up"></i></button>
+                    <button class="btn-dislike"><i class="fas fa-thumbs-down"></i></button>
+                    <button class="btn-new"><i class="fas fa-redo"></i> New</button>
+                </div>
+            </div>
+        </div>
+    `;
+    column.querySelector('.btn-like').addEventListener('click', () => rateRecipe(recipe.name, true));
+    column.querySelector('.btn-dislike').addEventListener('click', () => rateRecipe(recipe.name, false));
+    column.querySelector('.btn-new').addEventListener('click', () => replaceRecipe(column));
+    return column;
+}
+
+// Swap one card for a freshly generated recipe that isn't already shown
+async function replaceRecipe(column) {
+    const button = column.querySelector('.btn-new');
+    button.disabled = true;
+    const onScreen = Array.from(document.querySelectorAll('#recipe-suggestions .recipe-card .card-title'))
+        .map(title => title.textContent);
+    try {
+        const response = await fetch('/get_single_recipe', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({exclude: onScreen})
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP error! status: ${response.status}`);
+        }
+        column.replaceWith(renderRecipeCard(data.recipe));
+    } catch (error) {
+        console.error('Error replacing recipe:', error);
+        alert('Could not get a new recipe: ' + error.message);
+        button.disabled = false;
+    }
+}
+
+async function rateRecipe(recipeName, liked) {
+    try {
+        const response = await fetch('/rate_recipe', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({recipe_name: recipeName, rating: liked})
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+    } catch (error) {
+        console.error('Error rating recipe:', error);
+    }
+}
+
+// Stream recipe suggestions into the dashboard, rendering each as it arrives
+let recipeStream = null;
+
+function loadRecipes(refresh = false) {
+    const container = document.getElementById('recipe-suggestions');
+    if (!container) {
+        return;
+    }
+    if (recipeStream) {
+        recipeStream.close();
+    }
+
+    const loading = document.createElement('div');
+    loading.className = 'col-12 recipe-loading';
+    loading.innerHTML = `
+        <div class="spinner-border text-primary mb-3" role="status">
+            <span class="visually-hidden">Loading...</span>
+        </div>
+        <p class="mb-0">Finding recipes for your ingredients...</p>
+    `;
+    container.innerHTML = '';
+    container.appendChild(loading);
+
+    const params = new URLSearchParams({stream: '1'});
+    if (refresh) {
+        params.set('refresh', '1');
+    }
+    const startedAt = performance.now();
+    let count = 0;
+    const stream = new EventSource(`/get_recipes?${params}`);
+    recipeStream = stream;
+
+    const finish = message => {
+        stream.close();
+        loading.remove();
+        if (count === 0 && message) {
+            container.innerHTML = `<div class="col-12 text-center text-muted p-4">${escapeHtml(message)}</div>`;
+        }
+    };
+
+    stream.addEventListener('recipe', event => {
+        if (count === 0) {
+            console.log(`First recipe after ${Math.round(performance.now() - startedAt)}ms`);
+        }
+        count += 1;
+        container.insertBefore(renderRecipeCard(JSON.parse(event.data)), loading);
+    });
+    stream.addEventListener('done', event => {
+        const data = JSON.parse(event.data);
+        console.log(`Received ${data.count} recipes in ${Math.round(performance.now() - startedAt)}ms`);
+        finish(data.message || 'No recipes found');
+    });
+    // Fired both for 'error' events from the server and for dropped
+    // connections; close either way so the browser doesn't reconnect and
+    // start a new generation
+    stream.addEventListener('error', event => {
+        const data = event.data ? JSON.parse(event.data) : {};
+        console.error('Recipe stream error:', data.error || event);
+        finish(count === 0 ? 'Could not load recipes' : null);
+    });
+}
+
+function refreshRecipes() {
+    loadRecipes(true);
+}
@@ -0,0 +1,76 @@
+"""Thread-safe in-process LRU cache with a per-entry TTL.
+
+Shared by the recipe and user caches, which only differ in how they build
+keys and which entries they drop together.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """LRU cache whose entries also expire ``ttl`` seconds after being put."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, is_current=None):
+        """Return the cached value, or None if missing or expired.
+
+        An entry for which ``is_current(value)`` is false is dropped and
+        counted as stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            if is_current is not None and not is_current(entry[1]):
+                del self._entries[key]
+                self._stats['stale'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key):
+        """Drop one entry. Returns whether it was cached."""
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._stats['invalidations'] += 1
+            return True
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key matches ``predicate``. Returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self._stats['invalidations'] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        """Drop every entry without counting it as an invalidation."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=self.max_entries)
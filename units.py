@@ -0,0 +1,160 @@
+"""Unit registry with canonical units and vectorized conversion.
+
+UNITS is the one table of unit spellings. Each unit has a canonical
+symbol, a dimension (mass, volume or count) and its size in the
+dimension's base unit (grams, milliliters, pieces). Units such as
+'clove' or 'can' are known spellings but belong to no dimension: they
+are not convertible to anything else.
+
+Conversions work on whole arrays. Unit strings are first encoded to
+small integer codes, through a dict that remembers every spelling it has
+seen ('Lbs', 'lbs.', 'pounds'), so each distinct spelling is normalized
+once; the arithmetic is then a NumPy gather and multiply. Quantities in
+units that cannot be converted come back as NaN.
+"""
+import numpy as np
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+DIMENSIONS = (MASS, VOLUME, COUNT)
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'pcs'}
+
+DEFAULT_UNIT = 'pcs'
+
+# Code for spellings that are not in the registry
+UNKNOWN = -1
+
+# Remembered spellings; past this, new ones are normalized on every call
+MAX_SPELLINGS = 4096
+
+# symbol: (dimension, size in the base unit, singular name, plural name, other spellings)
+UNITS = {
+    'g': (MASS, 1.0, 'gram', 'grams', ['gram', 'grams']),
+    'kg': (MASS, 1000.0, 'kilogram', 'kilograms', ['kilo', 'kilos', 'kilogram', 'kilograms', 'kgs']),
+    'mg': (MASS, 0.001, 'milligram', 'milligrams', ['milligram', 'milligrams']),
+    'oz': (MASS, 28.349523125, 'ounce', 'ounces', ['ounce', 'ounces']),
+    'lb': (MASS, 453.59237, 'pound', 'pounds', ['lbs', 'pound', 'pounds']),
+    'ml': (VOLUME, 1.0, 'milliliter', 'milliliters', ['milliliter', 'milliliters', 'millilitre', 'millilitres']),
+    'l': (VOLUME, 1000.0, 'liter', 'liters', ['liter', 'liters', 'litre', 'litres', 'ltr']),
+    'fl oz': (VOLUME, 29.5735295625, 'fluid ounce', 'fluid ounces', ['floz', 'fluid ounce', 'fluid ounces']),
+    'tsp': (VOLUME, 4.92892159375, 'teaspoon', 'teaspoons', ['teaspoon', 'teaspoons']),
+    'tbsp': (VOLUME, 14.78676478125, 'tablespoon', 'tablespoons', ['tbs', 'tablespoon', 'tablespoons']),
+    'cup': (VOLUME, 236.5882365, 'cup', 'cups', ['cups']),
+    'pt': (VOLUME, 473.176473, 'pint', 'pints', ['pint', 'pints']),
+    'qt': (VOLUME, 946.352946, 'quart', 'quarts', ['quart', 'quarts']),
+    'gal': (VOLUME, 3785.411784, 'gallon', 'gallons', ['gallon', 'gallons']),
+    'pcs': (COUNT, 1.0, 'piece', 'pieces', ['pc', 'piece', 'pieces', 'count', 'ct', 'ea', 'each']),
+    'dozen': (COUNT, 12.0, 'dozen', 'dozen', ['dz', 'doz']),
+    # Counted on their own; a clove or a pack is not a number of pieces
+    'clove': (None, None, 'clove', 'cloves', ['cloves']),
+    'pack': (None, None, 'pack', 'packs', ['packs', 'pkg', 'pkgs']),
+    'can': (None, None, 'can', 'cans', ['cans']),
+    'bunch': (None, None, 'bunch', 'bunches', ['bunches']),
+    'slice': (None, None, 'slice', 'slices', ['slices']),
+}
+
+
+def normalize_spelling(unit):
+    """Lowercase a unit spelling, collapse whitespace and drop a trailing period."""
+    return ' '.join(str(unit or '').lower().split()).rstrip('.')
+
+
+class _SpellingCodes(dict):
+    """Unit code per raw spelling, filled in on first sight."""
+
+    def __init__(self, registry):
+        super().__init__()
+        self._registry = registry
+
+    def __missing__(self, unit):
+        code = self._registry._codes.get(self._registry.canonical(unit), UNKNOWN)
+        if len(self) < MAX_SPELLINGS:
+            self[unit] = code
+        return code
+
+
+class UnitRegistry:
+    """Canonical units and array conversions for a ``UNITS``-style table."""
+
+    def __init__(self, units):
+        self._symbols = list(units)
+        self._units = units
+        self._aliases = {}
+        for symbol, (_, _, singular, plural, spellings) in units.items():
+            for spelling in [symbol, singular, plural] + spellings:
+                self._aliases.setdefault(normalize_spelling(spelling), symbol)
+        self._codes = {symbol: code for code, symbol in enumerate(self._symbols)}
+        # One slot past the last symbol answers for UNKNOWN (-1)
+        self._dimension_codes = np.array(
+            [DIMENSIONS.index(units[symbol][0]) if units[symbol][0] else UNKNOWN for symbol in self._symbols] + [UNKNOWN],
+            dtype=np.int8
+        )
+        self._factors = np.array(
+            [units[symbol][1] if units[symbol][1] else np.nan for symbol in self._symbols] + [np.nan],
+            dtype=np.float64
+        )
+        self._spellings = _SpellingCodes(self)
+
+    def canonical(self, unit):
+        """Return the canonical symbol for a spelling, or the normalized
+        spelling itself if it is not in the registry."""
+        spelling = normalize_spelling(unit)
+        if not spelling:
+            return DEFAULT_UNIT
+        return self._aliases.get(spelling, spelling)
+
+    def dimension(self, unit):
+        """Return the dimension of a unit, or None if it is not convertible."""
+        symbol = self.canonical(unit)
+        return self._units[symbol][0] if symbol in self._units else None
+
+    def patterns(self, symbols):
+        """Return a ``{symbol: [spelling, ...]}`` table for a KeywordIndex."""
+        table = {symbol: [] for symbol in symbols}
+        for spelling, symbol in self._aliases.items():
+            if symbol in table:
+                table[symbol].append(spelling)
+        return table
+
+    def encode(self, units):
+        """Return an array of unit codes for a sequence of unit spellings.
+
+        Code arrays can be stored and passed to the conversions in place
+        of the spellings to skip this step.
+        """
+        if isinstance(units, np.ndarray) and units.dtype.kind == 'i':
+            return units
+        return np.fromiter(map(self._spellings.__getitem__, units), dtype=np.intp, count=len(units))
+
+    def symbol(self, code):
+        """Return the canonical symbol for a unit code (None for UNKNOWN)."""
+        return self._symbols[code] if code != UNKNOWN else None
+
+    def dimensions(self, units):
+        """Return the dimension index (into DIMENSIONS, UNKNOWN if none) per unit."""
+        return self._dimension_codes[self.encode(units)]
+
+    def to_base(self, quantities, units):
+        """Return ``(base_quantities, dimension_codes)`` for paired arrays.
+
+        Base quantities are in the base unit of each entry's dimension;
+        entries whose unit is not convertible are NaN with code UNKNOWN.
+        """
+        codes = self.encode(units)
+        return np.asarray(quantities, dtype=np.float64) * self._factors[codes], self._dimension_codes[codes]
+
+    def from_base(self, base_quantities, units):
+        """Express base-unit quantities in the given units (the inverse of to_base)."""
+        return np.asarray(base_quantities, dtype=np.float64) / self._factors[self.encode(units)]
+
+    def convert(self, quantities, units, to_unit):
+        """Convert quantities to ``to_unit``; NaN where the dimensions differ."""
+        target = self._codes.get(self.canonical(to_unit), UNKNOWN)
+        base, dimension_codes = self.to_base(quantities, units)
+        converted = base / self._factors[target]
+        converted[dimension_codes != self._dimension_codes[target]] = np.nan
+        return converted
+
+
+REGISTRY = UnitRegistry(UNITS)
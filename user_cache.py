@@ -0,0 +1,59 @@
+"""In-process cache for the Flask-Login user loader.
+
+Flask-Login loads the user on every authenticated request. Entries hold
+only USER_FIELDS (never the password hash) and expire after a short TTL.
+
+Users carry a ``version`` stamp that is bumped whenever their preferences
+change. The browser's session remembers the version it last saw, so a
+change made through any worker invalidates the cached entry on every
+other worker as soon as that browser's next request arrives, without an
+extra query. Other sessions of the same user pick it up within the TTL.
+"""
+from ttl_cache import TTLCache
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 60
+
+# Projection for the user loader
+USER_FIELDS = {
+    'username': 1,
+    'email': 1,
+    'cooking_methods': 1,
+    'kitchen_tools': 1,
+    'preferences': 1,
+    'version': 1,
+}
+
+
+def user_version(user_data):
+    """Return the version stamp of a user document (0 before the first bump)."""
+    return user_data.get('version', 0)
+
+
+class UserCache:
+    """Thread-safe LRU cache of projected user documents with a TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self._cache = TTLCache(max_entries, ttl)
+
+    def get(self, user_id, version=None):
+        """Return the cached user document, or None if missing, expired or
+        older than ``version``."""
+        is_current = None if version is None else (lambda user_data: user_version(user_data) == version)
+        return self._cache.get(str(user_id), is_current)
+
+    def put(self, user_id, user_data):
+        """Cache a user document, evicting the least recently used if full."""
+        self._cache.put(str(user_id), user_data)
+
+    def invalidate(self, user_id):
+        """Drop a user's cached document."""
+        self._cache.invalidate(str(user_id))
+
+    def clear(self):
+        """Drop every cached document."""
+        self._cache.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        return self._cache.stats()